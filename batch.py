@@ -0,0 +1,377 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the headless batch mode, which produces recommendation reports for many user
+profiles without any interactive prompts.
+
+The movie and review data is loaded once. The profiles are then rendered in parallel by a pool of
+worker processes, and every profile gets its own self-contained JSON and HTML artifacts.
+A summary manifest records the timing of every profile, and the memory used by every worker.
+
+The workers are forked once the data is loaded, its caches are built and it is frozen (see prefork.py), so that
+they share the memory pages of the loaded data instead of each ending up with its own copy.
+
+Usage:
+    python batch.py profiles.json output_directory --workers 4
+
+The profiles file is a JSON list of objects such as
+    {"name": "alice", "movie": "Inception", "genres": ["Action", "Sci-fi"]}
+where "movie" is a movie title (a "movie_id" from the movie dataset may be given instead).
+An optional "ranking" chooses one of main.RANKINGS, and an optional "filter" restricts the recommendations
+to the movies matching a movie_filters expression, such as "rating in PG,PG-13 and runtimeMinutes < 120".
+The 'recent' ranking also reads an optional "half_life" (in days) and "since" and "until" dates
+(see review_history.ReviewHistory.apply_options). An optional "score_quantile", such as 0.5, plots that
+quantile of the raw review scores of every movie in the quadrant plot instead of its average score.
+An optional "diversity" between 0 and 1 re-ranks the recommendations by genre diversity (see reranking.py).
+Optional "seeds", such as [{"movie": "Heat", "weight": 0.5}], add more favourite movies with their weights (the
+weight of "movie" is an optional "weight", 1 by default), whose similarities are aggregated by an optional
+"aggregation" of multi_seed.AGGREGATIONS (see multi_seed.py).
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import importlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from classes import WeightedGraph
+import critics
+import main
+from movie_filters import MovieMetadata
+import multi_seed
+import pagerank
+import prefork
+from review_history import get_history
+import visualization1
+import visualization2
+
+# The full graph, dict_list and genres_list shared by the worker processes.
+# With the 'fork' start method, the workers inherit the data already loaded by the parent process,
+# so the data is only read from disk once.
+_DATA: Optional[tuple[WeightedGraph, list[dict], list[str]]] = None
+
+# The metadata of the movies, only loaded if a profile has a filter.
+_METADATA: Optional[MovieMetadata] = None
+
+
+def load_base_data(reviews_file: str, movie_file: str, with_critics: bool = False,
+                   with_dates: bool = False) -> tuple[WeightedGraph, list[dict], list[str]]:
+    """Loads the movie and review datasets into a full graph that is not yet centred on any favourite movie.
+    If with_critics is True, the critics are loaded too, as needed by the 'critics' ranking, and if with_dates
+    is True, the review dates are kept, as needed by the 'recent' ranking.
+
+    Returns (graph, dict_list, genres_list), where dict_list and genres_list are as returned by
+    main.load_movie_columns.
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - movie_file is a path to a valid CSV file with movie data.
+    """
+    graph = WeightedGraph()
+    dict_list, genres_list = main.load_movie_columns(movie_file, graph)
+    main.load_review_columns(reviews_file, [graph], dict_list, with_critics, with_dates=with_dates)
+    return graph, dict_list, genres_list
+
+
+def read_profiles(profiles_file: str) -> list[dict[str, Any]]:
+    """Reads the list of user profiles from the given JSON file.
+
+    Profiles without a "name" are named after their position in the file.
+
+    Preconditions:
+        - profiles_file is a path to a JSON file containing a list of profile objects
+    """
+    with open(profiles_file, 'r', encoding="utf-8") as file:
+        profiles = json.load(file)
+
+    # give every profile a name that is safe to use in a file name
+    for i, profile in enumerate(profiles):
+        name = str(profile.get('name', f'profile{i}'))
+        profile['name'] = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
+
+    return profiles
+
+
+def find_favourite_movie(dict_list: list[dict], profile: dict[str, Any]) -> tuple[str, str]:
+    """Returns the (id, title) of the favourite movie of the given profile.
+
+    Raise a ValueError if the profile's movie is not in the movie dataset.
+
+    >>> find_favourite_movie([{}, {'m1': 'Inception', 'm2': 'Up'}], {'movie': 'Up'})
+    ('m2', 'Up')
+    >>> find_favourite_movie([{}, {'m1': 'Inception', 'm2': 'Up'}], {'movie_id': 'm1'})
+    ('m1', 'Inception')
+    """
+    # look the movie up by id first, then by title
+    if profile.get('movie_id') in dict_list[1]:
+        return profile['movie_id'], dict_list[1][profile['movie_id']]
+
+    for movie_id, title in dict_list[1].items():
+        if title == profile.get('movie'):
+            return movie_id, title
+
+    raise ValueError(f"Unknown movie: {profile.get('movie_id', profile.get('movie'))}")
+
+
+def find_favourite_genres(profile: dict[str, Any]) -> set[str]:
+    """Returns the capitalized favourite genres of the given profile.
+
+    Raise a ValueError if the profile's genres are not a list of strings.
+
+    >>> sorted(find_favourite_genres({'genres': [' action', 'Sci-fi']}))
+    ['Action', 'Sci-fi']
+    >>> find_favourite_genres({'genres': 'Drama'})
+    Traceback (most recent call last):
+    ...
+    ValueError: The genres must be a list of strings: 'Drama'
+    """
+    genres = profile.get('genres', [])
+    if not isinstance(genres, list) or not all(isinstance(genre, str) for genre in genres):
+        raise ValueError(f"The genres must be a list of strings: {genres!r}")
+    return {genre.strip().capitalize() for genre in genres}
+
+
+def find_seed_movies(dict_list: list[dict], profile: dict[str, Any]) -> dict[str, float]:
+    """Returns the titles of the favourite movies of the given profile mapped to their weights, if the profile has
+    "seeds" (see the module description), or an empty dict otherwise.
+
+    Raise a ValueError if a movie of the profile is not in the movie dataset.
+
+    >>> find_seed_movies([{}, {'m1': 'Inception', 'm2': 'Up'}], {'movie': 'Up', 'seeds': [{'movie_id': 'm1'}]})
+    {'Up': 1.0, 'Inception': 1.0}
+    >>> find_seed_movies([{}, {'m1': 'Inception', 'm2': 'Up'}], {'movie': 'Up'})
+    {}
+    """
+    if not profile.get('seeds'):
+        return {}
+
+    seeds = {find_favourite_movie(dict_list, profile)[1]: float(profile.get('weight', 1.0))}
+    for seed in profile['seeds']:
+        seeds[find_favourite_movie(dict_list, seed)[1]] = float(seed.get('weight', 1.0))
+    return seeds
+
+
+def recommendation_records(graph: WeightedGraph, limit: int, ranking: str = 'similarity',
+                           candidates: Optional[list[str]] = None, diversity: float = 0.0) -> list[dict[str, Any]]:
+    """Returns the recommendations of main.recommend_movies (restricted to candidates, if given, and diversified
+    by diversity) as JSON-serializable records, with the same details that main.print_recommended_movies prints.
+
+    Raise a ValueError if ranking is not in main.RANKINGS.
+
+    Preconditions:
+        - limit > 0
+        - graph.preferred_movie != ''
+        - 0 <= diversity <= 1
+    """
+    preferred_movie = graph.get_vertex(graph.preferred_movie)
+    return [{'rank': rank, 'title': movie.item, 'score': score,
+             'similarity': movie.overall_similarity_score(preferred_movie),
+             'average_score': movie.average_score(),
+             'num_reviews': movie.get_number_of_reviews()}
+            for rank, (movie, score) in enumerate(main.recommend_movies(graph, limit, ranking, candidates, diversity),
+                                                  start=1)]
+
+
+def _init_worker(reviews_file: str, movie_file: str, with_critics: bool, with_dates: bool,
+                 with_metadata: bool) -> None:
+    """Makes the loaded data (and the movie metadata, if with_metadata is True) available to a worker process.
+
+    Workers started with 'fork' already have the data, so they only load it when another start method is used.
+    Workers enable the garbage collector that was disabled while the data was loaded (see prefork.py).
+    """
+    global _DATA, _METADATA
+    prefork.resume_collection()
+    if _DATA is None:
+        _DATA = load_base_data(reviews_file, movie_file, with_critics, with_dates)
+    if with_metadata and _METADATA is None:
+        _METADATA = MovieMetadata.load(movie_file)
+
+
+def render_profile(profile: dict[str, Any], output_dir: str, threshold: float, limit: int) -> dict[str, Any]:
+    """Writes the recommendation report of one profile to output_dir and returns its manifest entry.
+
+    The report consists of three artifacts:
+        - <name>.recommendations.json: the ranked recommendations, both as data and as printed text
+        - <name>.quadrant.html: the quadrant plot of visualization2
+        - <name>.graph.html: the graph plot of visualization1
+
+    The worker's full graph is re-centred on the profile's favourite movie, without reloading any data.
+    If the profile has a filter, the recommendations and the quadrant plot only include the matching movies.
+
+    Preconditions:
+        - _DATA is not None
+        - _METADATA is not None or 'filter' not in profile
+        - threshold > 0
+        - limit > 0
+    """
+    graph, dict_list, _ = _DATA
+    name = profile['name']
+    entry = {'name': name, 'movie': profile.get('movie', profile.get('movie_id')), 'worker': os.getpid(),
+             'artifacts': {}, 'timings': {}}
+    start = time.perf_counter()
+
+    # centre the full graph and a fresh simplified graph on the profile's favourite movie
+    try:
+        list_fav = find_favourite_movie(dict_list, profile)
+        fav_genres = find_favourite_genres(profile)
+        seeds = find_seed_movies(dict_list, profile)
+        if profile.get('aggregation', 'weighted_mean') not in multi_seed.AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {profile['aggregation']}")
+        if profile.get('ranking', 'similarity') not in main.RANKINGS:
+            raise ValueError(f"Unknown ranking: {profile['ranking']}")
+        candidates = _METADATA.select(profile['filter'], graph) if 'filter' in profile else None
+        if profile.get('ranking') == 'recent':
+            get_history(graph).apply_options(profile)
+    except ValueError as error:
+        entry.update({'status': 'error', 'error': str(error)})
+        return entry
+    partial_graph = WeightedGraph()
+    main.connect_favourite_movie([graph, partial_graph], dict_list, list_fav, fav_genres, threshold, seeds,
+                                 profile.get('aggregation', 'weighted_mean'))
+    entry['timings']['connect'] = time.perf_counter() - start
+
+    # the ranked recommendations, together with the text printed by print_recommended_movies
+    stage_start = time.perf_counter()
+    ranking, diversity = profile.get('ranking', 'similarity'), profile.get('diversity', 0.0)
+    with contextlib.redirect_stdout(io.StringIO()) as text:
+        main.print_recommended_movies(graph, limit, True, ranking, candidates, diversity)
+    recommendations = recommendation_records(graph, limit, ranking, candidates, diversity)
+    entry['artifacts']['recommendations'] = os.path.join(output_dir, f'{name}.recommendations.json')
+    with open(entry['artifacts']['recommendations'], 'w', encoding="utf-8") as file:
+        json.dump({'profile': profile, 'preferred_movie': graph.preferred_movie, 'seed_movies': graph.seed_movies,
+                   'preferred_genres': sorted(graph.preferred_genres),
+                   'recommendations': recommendations, 'text': text.getvalue()}, file, indent=2)
+    entry['timings']['recommendations'] = time.perf_counter() - stage_start
+
+    # the quadrant plot of every movie
+    stage_start = time.perf_counter()
+    entry['artifacts']['quadrant'] = os.path.join(output_dir, f'{name}.quadrant.html')
+    df = visualization2.load_data_with_graph(graph, candidates, profile.get('score_quantile'))
+    visualization2.plot_movie_recommendations(df, 3, entry['artifacts']['quadrant'])
+    entry['timings']['quadrant'] = time.perf_counter() - stage_start
+
+    # the graph plot of the simplified graph
+    stage_start = time.perf_counter()
+    entry['artifacts']['graph'] = os.path.join(output_dir, f'{name}.graph.html')
+    visualization1.visualize_graph(partial_graph, max_vertices=5000, output_file=entry['artifacts']['graph'])
+    entry['timings']['graph'] = time.perf_counter() - stage_start
+
+    entry['status'] = 'ok'
+    entry['timings']['total'] = time.perf_counter() - start
+    entry['memory'] = prefork.memory_usage()
+    return entry
+
+
+def run_batch(reviews_file: str, movie_file: str, profiles_file: str, output_dir: str,
+              max_workers: int = 4, threshold: float = 0.7, limit: int = 10) -> dict[str, Any]:
+    """Renders the report of every profile in profiles_file into output_dir, using at most max_workers
+    processes at a time, and writes a summary manifest to output_dir/manifest.json.
+
+    The manifest also records the memory usage (see prefork.memory_usage) of the loading process and of every
+    worker after its last profile.
+
+    Returns the manifest.
+
+    Preconditions:
+        - max_workers > 0
+        - threshold > 0
+        - limit > 0
+    """
+    global _DATA, _METADATA
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    profiles = read_profiles(profiles_file)
+
+    # load the data once, before the worker processes are started, without collecting the garbage in between
+    prefork.pause_collection()
+    try:
+        # the critics and review dates are only loaded if a profile asks for the ranking that needs them
+        with_critics = any(profile.get('ranking') == 'critics' for profile in profiles)
+        with_dates = any(profile.get('ranking') == 'recent' for profile in profiles)
+        _DATA = load_base_data(reviews_file, movie_file, with_critics, with_dates)
+        with_metadata = any('filter' in profile for profile in profiles)
+        _METADATA = MovieMetadata.load(movie_file) if with_metadata else None
+
+        # build the caches of the rankings once, then freeze the loaded data so that the workers share its pages
+        if any(profile.get('ranking') == 'pagerank' for profile in profiles):
+            pagerank.get_ranker(_DATA[0])
+        if with_critics:
+            critics.get_scorer(_DATA[0])
+
+        # the visualization modules only import plotly and networkx when they first plot: import them before
+        # forking, so that the workers share them too instead of each importing them again
+        importlib.import_module('plotly.graph_objects')
+        importlib.import_module('networkx')
+        prefork.freeze_loaded_data()
+        manifest = {'reviews_file': reviews_file, 'movie_file': movie_file, 'workers': max_workers,
+                    'load_seconds': time.perf_counter() - start, 'memory': prefork.memory_usage(), 'profiles': []}
+
+        # prefer 'fork' so that the workers share the loaded data instead of loading it again
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(reviews_file, movie_file, with_critics, with_dates,
+                                           with_metadata)) as executor:
+            futures = [executor.submit(render_profile, profile, output_dir, threshold, limit) for profile in profiles]
+
+            # record the result of every profile, in the order of the profiles file
+            for profile, future in zip(profiles, futures):
+                if future.exception() is None:
+                    manifest['profiles'].append(future.result())
+                else:
+                    manifest['profiles'].append({'name': profile['name'], 'status': 'error',
+                                                 'error': repr(future.exception())})
+    finally:
+        prefork.resume_collection(unfreeze=True)
+
+    # the memory of every worker after its last profile
+    manifest['worker_memory'] = {entry['worker']: entry['memory']
+                                 for entry in manifest['profiles'] if 'memory' in entry}
+
+    manifest['total_seconds'] = time.perf_counter() - start
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render recommendation reports for many user profiles.")
+    parser.add_argument('profiles_file', help="JSON file containing the list of user profiles")
+    parser.add_argument('output_dir', help="directory that the reports and manifest are written to")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--workers', type=int, default=4, help="maximum number of profiles rendered at once")
+    parser.add_argument('--threshold', type=float, default=0.7)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    summary = run_batch(args.reviews, args.movies, args.profiles_file, args.output_dir,
+                        args.workers, args.threshold, args.limit)
+    for result in summary['profiles']:
+        print(f"{result['name']}: {result['status']} {round(result.get('timings', {}).get('total', 0), 2)} s")
+    print(f"Loading process: {prefork.format_memory(summary['memory'])}")
+    for worker, usage in summary['worker_memory'].items():
+        print(f"Worker {worker}: {prefork.format_memory(usage)}")
+    print(f"Total: {round(summary['total_seconds'], 2)} s")
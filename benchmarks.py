@@ -0,0 +1,270 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains benchmarks of the data loading code, comparing the original row-by-row readers
+of main.py with the faster alternatives, of the startup time of the headless print mode (recommend.py), and of
+the cluster index of cluster_index.py against scoring every movie.
+
+Usage:
+    python benchmarks.py ingest --reviews data/rotten_tomatoes_movie_reviews.csv --repeat 3
+    python benchmarks.py startup --movie Inception --genres Action Sci-fi
+    python benchmarks.py clusters --index index.npz --nprobe 1 2 4 8 16
+
+The ingest benchmark checks that the alternatives build the same graph before reporting their timings.
+The datasets may be compressed (see main.open_dataset), for example to compare the throughput of
+--reviews data/archive.zip/rotten_tomatoes_movie_reviews.csv with that of the extracted file.
+
+The startup benchmark runs new interpreters with python -X importtime, which reports the time spent importing
+every module. It reports how long importing the main modules takes, and how long recommend.py takes to print
+its first recommendation, compared to FIRST_RESULT_TARGET. It also reports any of INTERACTIVE_MODULES that were
+imported, since the headless modules must never import them.
+
+The clusters benchmark centres the graph on random favourite movies, and compares the recommendations of the
+'similarity' ranking of main.recommend_movies with those computed from the candidates of the cluster index for
+every nprobe: it reports their recall (the share of the recommendations from every movie that they find), the
+share of the movies they score, and their mean time, including the time to probe the index. The index is built
+from the loaded graph if no index file is given.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+from classes import WeightedGraph
+from cluster_index import ClusterIndex, build_index
+import main
+from movie_arrays import MovieArrays
+
+# The slow to import libraries that only the interactive mode of main.py needs, to prompt the user and plot.
+INTERACTIVE_MODULES = ('tkinter', 'plotly', 'networkx')
+
+# The modules whose import time the startup benchmark reports.
+STARTUP_MODULES = ('classes', 'main', 'batch', 'server', 'recommend')
+
+# The target time, in seconds, from starting recommend.py on the full datasets to its first printed recommendation.
+FIRST_RESULT_TARGET = 10.0
+
+
+def graph_summary(graph: WeightedGraph) -> dict[Any, tuple[str, Any, dict[Any, float]]]:
+    """Returns the kind, genres and weighted neighbours of every vertex of graph, for comparing graphs."""
+    return {v.item: (v.kind, v.genres, {u.item: weight for u, weight in v.neighbours.items()})
+            for v in graph.get_vertices()}
+
+
+def time_loader(loader: Callable[[WeightedGraph], Any], repeat: int) -> tuple[float, WeightedGraph]:
+    """Returns the best time of repeat calls to loader on a new graph, along with the graph of the last call.
+
+    Preconditions:
+        - repeat > 0
+    """
+    best, graph = float('inf'), WeightedGraph()
+    for _ in range(repeat):
+        graph = WeightedGraph()
+        gc.collect()
+        start = time.perf_counter()
+        loader(graph)
+        best = min(best, time.perf_counter() - start)
+    return best, graph
+
+
+def benchmark_ingest(reviews_file: str, movie_file: str, repeat: int = 1,
+                     with_critics: bool = False) -> dict[str, float]:
+    """Returns the best time, in seconds, that main.load_movie_data and main.load_review_data ('rows') and
+    main.load_movie_columns and main.load_review_columns ('columns') take to load the given datasets.
+
+    Raise a ValueError if the two readers do not build the same graph.
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - movie_file is a path to a valid CSV file with movie data.
+        - repeat > 0
+    """
+    def load_rows(graph: WeightedGraph) -> None:
+        """Loads the datasets with the row-by-row readers."""
+        dict_list, _ = main.load_movie_data(movie_file, graph)
+        main.load_review_data(reviews_file, [graph], dict_list, with_critics)
+
+    def load_columns(graph: WeightedGraph) -> None:
+        """Loads the datasets with the column readers."""
+        dict_list, _ = main.load_movie_columns(movie_file, graph)
+        main.load_review_columns(reviews_file, [graph], dict_list, with_critics)
+
+    rows_time, rows_graph = time_loader(load_rows, repeat)
+    columns_time, columns_graph = time_loader(load_columns, repeat)
+    if graph_summary(rows_graph) != graph_summary(columns_graph):
+        raise ValueError("The row and column readers built different graphs")
+
+    return {'rows': rows_time, 'columns': columns_time}
+
+
+def parse_import_times(report: str) -> dict[str, float]:
+    """Returns the cumulative import time, in seconds, of every module imported at the top level (that is, not
+    by another module) in report, the standard error output of python -X importtime.
+
+    >>> parse_import_times('import time: self [us] | cumulative | imported package\\n'
+    ...                    'import time:       500 |        500 |   numpy.linalg\\n'
+    ...                    'import time:       250 |       2000 | numpy\\n'
+    ...                    'Traceback (most recent call last):\\n')
+    {'numpy': 0.002}
+    """
+    times = {}
+    for line in report.splitlines():
+        fields = line.removeprefix('import time:').split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit() and not fields[2].startswith('  '):
+            times[fields[2].strip()] = int(fields[1]) / 1e6
+    return times
+
+
+def imported_modules(report: str) -> set[str]:
+    """Returns the name of every module imported in report, the standard error output of python -X importtime.
+
+    >>> sorted(imported_modules('import time:       500 |        500 |   numpy.linalg\\n'
+    ...                         'import time:       250 |       2000 | numpy\\n'))
+    ['numpy', 'numpy.linalg']
+    """
+    return {line.split('|')[2].strip() for line in report.splitlines()
+            if line.startswith('import time:') and line.count('|') == 2 and 'imported package' not in line}
+
+
+def benchmark_startup(arguments: list[str], repeat: int = 1) -> dict[str, Any]:
+    """Runs a new interpreter with python -X importtime and the given arguments (such as a script and its
+    arguments, or -c and a statement) repeat times, and returns the best times, in seconds:
+        - 'imports': the time spent importing modules
+        - 'first_result': the time until the first printed recommendation (a line starting with '#1 '),
+          or until the interpreter exits if it prints none
+        - 'total': the time until the interpreter exits
+    along with 'interactive_modules', the sorted names of INTERACTIVE_MODULES that were imported.
+
+    Raise a ValueError if the interpreter does not exit successfully.
+
+    Preconditions:
+        - repeat > 0
+    """
+    results = {'imports': float('inf'), 'first_result': float('inf'), 'total': float('inf'),
+               'interactive_modules': []}
+    for _ in range(repeat):
+        # the report of -X importtime is written to a file, so that it never blocks the interpreter
+        with tempfile.TemporaryFile('w+', encoding="utf-8") as report_file:
+            start, first_result = time.perf_counter(), None
+            with subprocess.Popen([sys.executable, '-u', '-X', 'importtime', *arguments], stdout=subprocess.PIPE,
+                                  stderr=report_file, text=True, encoding="utf-8") as process:
+                for line in process.stdout:
+                    if first_result is None and line.startswith('#1 '):
+                        first_result = time.perf_counter() - start
+            total = time.perf_counter() - start
+            report_file.seek(0)
+            report = report_file.read()
+
+        if process.returncode != 0:
+            raise ValueError(f"{' '.join(arguments)} exited with code {process.returncode}:\n{report[-2000:]}")
+
+        results['imports'] = min(results['imports'], sum(parse_import_times(report).values()))
+        results['first_result'] = min(results['first_result'], first_result or total)
+        results['total'] = min(results['total'], total)
+        results['interactive_modules'] = sorted({name.split('.')[0] for name in imported_modules(report)}
+                                                & set(INTERACTIVE_MODULES))
+    return results
+
+
+def benchmark_clusters(graph: WeightedGraph, index: ClusterIndex, nprobes: list[int], genres: set[str],
+                       limit: int = 10, num_queries: int = 20, seed: int = 0) -> dict[Any, dict[str, float]]:
+    """Returns the mean time, in seconds, of main.recommend_movies for num_queries random favourite movies of
+    index and the given genres ('exhaustive'), and for every nprobe in nprobes, the mean time of recommend_movies
+    with the candidates of index (including ClusterIndex.candidates), their mean recall of the recommendations of
+    'exhaustive' and the mean share of the movies of index that they score.
+
+    Preconditions:
+        - all(nprobe > 0 for nprobe in nprobes)
+        - limit > 0
+        - num_queries > 0
+        - all titles of index are movies of graph
+    """
+    movies = random.Random(seed).sample(index.titles.tolist(), min(num_queries, len(index.titles)))
+    results = {'exhaustive': {'seconds': 0.0}} | {nprobe: {'seconds': 0.0, 'recall': 0.0, 'scored': 0.0}
+                                                   for nprobe in nprobes}
+    for movie in movies:
+        graph.set_user_preferences(movie, genres)
+        gc.collect()
+        start = time.perf_counter()
+        expected = {vertex.item for vertex, _ in main.recommend_movies(graph, limit)}
+        results['exhaustive']['seconds'] += (time.perf_counter() - start) / len(movies)
+
+        for nprobe in nprobes:
+            start = time.perf_counter()
+            candidates = index.candidates(graph.get_vertex(movie).genres, genres, nprobe, limit)
+            found = {vertex.item for vertex, _ in main.recommend_movies(graph, limit, candidates=candidates)}
+            results[nprobe]['seconds'] += (time.perf_counter() - start) / len(movies)
+            results[nprobe]['recall'] += (len(found & expected) / len(expected) if expected else 1.0) / len(movies)
+            results[nprobe]['scored'] += len(candidates) / len(index.titles) / len(movies)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data loading code.")
+    parser.add_argument('benchmark', choices=['ingest', 'startup', 'clusters'])
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--critics', action='store_true', help="also load the critics")
+    parser.add_argument('--movie', default="Inception", help="favourite movie of the startup benchmark")
+    parser.add_argument('--genres', nargs='*', default=[],
+                        help="favourite genres of the startup and clusters benchmarks")
+    parser.add_argument('--index', default='', help=".npz cluster index saved by cluster_index.py")
+    parser.add_argument('--nprobe', nargs='+', type=int, default=[1, 2, 4, 8, 16],
+                        help="numbers of clusters probed by the clusters benchmark")
+    parser.add_argument('--queries', type=int, default=20, help="number of queries of the clusters benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark == 'ingest':
+        timings = benchmark_ingest(args.reviews, args.movies, args.repeat, args.critics)
+        for name, seconds in timings.items():
+            print(f"{name}: {round(seconds, 3)} s ({round(timings['rows'] / seconds, 2)}x)")
+    elif args.benchmark == 'clusters':
+        full_graph = WeightedGraph()
+        movie_dicts, _ = main.load_movie_columns(args.movies, full_graph)
+        main.load_review_columns(args.reviews, [full_graph], movie_dicts)
+        if args.index:
+            movie_index = ClusterIndex.load(args.index)
+        else:
+            build_start = time.perf_counter()
+            movie_index = build_index(MovieArrays(full_graph))
+            print(f"built {len(movie_index.modes)} clusters in {round(time.perf_counter() - build_start, 3)} s")
+
+        timings = benchmark_clusters(full_graph, movie_index, args.nprobe,
+                                     {genre.strip().capitalize() for genre in args.genres}, num_queries=args.queries)
+        exhaustive = timings.pop('exhaustive')['seconds']
+        print(f"exhaustive: {round(exhaustive * 1000, 3)} ms")
+        for nprobe, result in timings.items():
+            print(f"nprobe {nprobe}: {round(result['seconds'] * 1000, 3)} ms"
+                  f" ({round(exhaustive / result['seconds'], 2)}x), recall {round(result['recall'], 3)},"
+                  f" {round(result['scored'] * 100, 1)} % of the movies scored")
+    else:
+        for module in STARTUP_MODULES:
+            timings = benchmark_startup(['-c', f'import {module}'], args.repeat)
+            print(f"import {module}: {round(timings['imports'], 3)} s"
+                  f" (imports {', '.join(timings['interactive_modules']) or 'no interactive module'})")
+
+        timings = benchmark_startup(['recommend.py', args.movie, '--genres', *args.genres, '--reviews', args.reviews,
+                                     '--movies', args.movies], args.repeat)
+        met = 'met' if timings['first_result'] <= FIRST_RESULT_TARGET else 'missed'
+        print(f"print mode: first result after {round(timings['first_result'], 3)} s (target {FIRST_RESULT_TARGET} s"
+              f" {met}), {round(timings['imports'], 3)} s of imports, exited after {round(timings['total'], 3)} s"
+              f" (imports {', '.join(timings['interactive_modules']) or 'no interactive module'})")
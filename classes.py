@@ -17,9 +17,22 @@ expressly prohibited.
 This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
 """
 from __future__ import annotations
-from typing import Any, Union
-import networkx as nx
+import heapq
+import itertools
+import random
+from typing import TYPE_CHECKING, Any, Optional, Union
 
+from sketches import QuantileSketch
+
+# networkx is only imported by to_networkx, since it is slow to import and only needed to plot the graph
+if TYPE_CHECKING:
+    import networkx as nx
+
+# The number of score strata that WeightedGraph.ego_subgraph takes review vertices from in turn.
+SUBGRAPH_REVIEW_STRATA = 10
+
+# The number of neighbours WeightedGraph.ego_subgraph considers for every vertex it still has room for.
+SUBGRAPH_CANDIDATES_PER_VERTEX = 4
 
 ########################################################################################################################
 # _Vertex class
@@ -59,6 +72,76 @@ class _Vertex:
         self.neighbours = set()
 
 
+########################################################################################################################
+# Genre similarity
+########################################################################################################################
+def genre_similarity(genres1: Union[set[str], frozenset[str]], genres2: Union[set[str], frozenset[str]]) -> float:
+    """Returns the genre similarity of two sets of genres: the size of their intersection divided by
+    the size of their union, or 0 if both sets are empty.
+
+    >>> genre_similarity({'Action', 'Comedy'}, {'Action', 'Drama'})
+    0.3333333333333333
+    >>> genre_similarity(set(), set())
+    0
+    """
+    union = len(genres1.union(genres2))
+    if union == 0:
+        return 0
+
+    return len(genres1.intersection(genres2)) / union
+
+
+# @check_contracts
+class _GenrePreference:
+    """The genres preferred by the user, shared by all the movie vertices of a WeightedGraph.
+
+    The genre similarity of a movie to the preferred genres is only computed when it is needed, and is
+    remembered for every distinct set of movie genres until the preferred genres change. Many movies
+    share the same set of genres, so most lookups are answered from memory.
+
+    Instance Attributes:
+        - genres: The genres preferred by the user.
+
+    >>> preference = _GenrePreference()
+    >>> preference.set_genres({'Action', 'Sci-fi'})
+    True
+    >>> preference.similarity(frozenset({'Action'}))
+    0.5
+    >>> preference.set_genres({'Sci-fi', 'Action'})
+    False
+    """
+    # Private Instance Attributes:
+    #     - _similarities:
+    #         Maps each set of movie genres looked up since the last change of preferred genres
+    #         to its genre similarity to the preferred genres.
+    genres: frozenset[str]
+    _similarities: dict[frozenset[str], float]
+
+    def __init__(self) -> None:
+        """Initialize a preference with no preferred genres."""
+        self.genres = frozenset()
+        self._similarities = {}
+
+    def set_genres(self, genres: set[str]) -> bool:
+        """Changes the preferred genres, forgetting the remembered similarities only if the genres changed.
+
+        Returns whether the preferred genres changed.
+        """
+        if frozenset(genres) == self.genres:
+            return False
+
+        self.genres = frozenset(genres)
+        self._similarities = {}
+        return True
+
+    def similarity(self, genres: frozenset[str]) -> float:
+        """Returns the genre similarity of the given movie genres to the preferred genres."""
+        if genres not in self._similarities:
+            self._similarities[genres] = genre_similarity(genres, self.genres)
+
+        return self._similarities[genres]
+
+
 ########################################################################################################################
 # _WeightedVertex class
 ########################################################################################################################
@@ -73,6 +156,11 @@ class _WeightedVertex(_Vertex):
                       edge weights.
         - preferred: Indicates whether the vertex is marked as preferred by the user, affecting
                      the prioritization in the recommendation process.
+        - genres: The genres of this movie, or None if they are unknown (always None for a review).
+        - genre_preference: The genres preferred by the user of the graph containing this vertex, or None.
+                            Used together with genres to compute the genre similarity of this movie.
+        - score_sketch: The sketch of every raw review score of this movie (including repeated scores),
+                        or None if no score was added with WeightedGraph.add_review_scores.
 
     Representation Invariants:
         - self not in self.neighbours
@@ -84,18 +172,26 @@ class _WeightedVertex(_Vertex):
     kind: str
     neighbours: dict[_WeightedVertex, Union[int, float]]
     preferred: bool
+    genres: Optional[frozenset[str]]
+    genre_preference: Optional[_GenrePreference]
+    score_sketch: Optional[QuantileSketch]
 
-    def __init__(self, item: Any, kind: str) -> None:
-        """Initialize a new vertex with the given item and kind.
+    def __init__(self, item: Any, kind: str, genres: Optional[set[str]] = None,
+                 genre_preference: Optional[_GenrePreference] = None) -> None:
+        """Initialize a new vertex with the given item, kind and genres.
 
         This vertex is initialized with no neighbours.
 
         Preconditions:
             - kind in {'Review', 'Movie'}
+            - genres is None or kind == 'Movie'
         """
         super().__init__(item, kind)
         self.neighbours = {}
         self.preferred = False
+        self.genres = None if genres is None else frozenset(genres)
+        self.genre_preference = genre_preference
+        self.score_sketch = None
 
     def get_number_of_reviews(self) -> int:
         """Returns the number of reviews associated with this movie vertex.
@@ -234,9 +330,46 @@ class _WeightedVertex(_Vertex):
             # calculate and return the average score if the minimum number of reviews is met
             return sum(reviews) / len(reviews)
 
+    def score_quantile(self, q: float, min_number_of_reviews: int = 1) -> float:
+        """Returns the score that a proportion q of the raw review scores of this movie are at most (the median
+        if q == 0.5), computed from its score sketch. Unlike average_score, every review counts, even if another
+        review of this movie has the same score.
+
+        If a movie does NOT have at least min_number_of_reviews raw review scores, then return it as 0.
+
+        Preconditions:
+            - self.kind == 'Movie'
+            - 0 <= q <= 1
+            - min_number_of_reviews > 0
+
+        # test case: the median is not pulled by an outlier like the average is
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Cats", "Movie")
+        >>> g.add_review_scores("Cats", [0.8, 0.8, 0.7, 0.0])
+        >>> movie = g.get_vertex("Cats")
+        >>> movie.score_quantile(0.5)
+        0.7
+
+        # test case: movie does not have enough reviews
+        >>> movie.score_quantile(0.5, min_number_of_reviews=5)
+        0
+
+        # test case: movie has no reviews
+        >>> _WeightedVertex("Mickey Mouse", "Movie").score_quantile(0.5)
+        0
+        """
+        # not applicable for movies without enough raw review scores
+        if self.score_sketch is None or self.score_sketch.n < min_number_of_reviews:
+            return 0
+
+        return self.score_sketch.quantile(q)
+
     def average_similarity(self) -> float:
-        """Returns the average weight between a movie and its reviews.
-        This weight is the proportion of the movie's genre similarity to the user's preference.
+        """Returns the genre similarity of a movie to the user's preferred genres, or 0 if it has no reviews.
+
+        When the genres of the movie are known, the similarity is looked up from self.genre_preference,
+        so changing the preferred genres does not require rebuilding the graph. Otherwise, it is
+        the average weight between the movie and its reviews.
 
         Preconditions:
             - self.kind == 'Movie'
@@ -258,12 +391,26 @@ class _WeightedVertex(_Vertex):
         >>> review1 = _WeightedVertex(0.2, "Review")
         >>> review1.average_similarity()
         0
+
+        # test case: movie with known genres
+        >>> preference = _GenrePreference()
+        >>> _ = preference.set_genres({"Action", "Sci-fi"})
+        >>> movie = _WeightedVertex("The Matrix", "Movie", {"Action"}, preference)
+        >>> movie.neighbours = {review1: 1}
+        >>> movie.average_similarity()
+        0.5
         """
         # check if this vertex represents a movie and has review neighbours
         if len(self.neighbours) == 0 or self.kind == "Review":
 
             # not applicable for review vertices or movies without any reviews
             return 0
+        elif self.genres is not None:
+
+            # look up the genre similarity, if the movie has at least one review
+            if not any(review.kind == "Review" for review in self.neighbours):
+                return 0
+            return self._genre_similarity()
         else:
 
             # extract the similarity scores (edge weights) from the connected review vertices
@@ -278,6 +425,66 @@ class _WeightedVertex(_Vertex):
             # calculate and return the average similarity score
             return sum(reviews) / len(reviews)
 
+    def _genre_similarity(self) -> float:
+        """Returns the genre similarity of this movie to the user's preferred genres.
+
+        Preconditions:
+            - self.genres is not None
+        """
+        if self.genre_preference is None:
+            return genre_similarity(self.genres, set())
+
+        return self.genre_preference.similarity(self.genres)
+
+    def review_statistics(self) -> tuple[float, float]:
+        """Returns (self.average_score(), self.average_similarity()) computed in a single pass over the neighbours.
+
+        This is used when both values are needed for many movies at once, so that the neighbours of
+        each movie are only scanned one time instead of once per statistic.
+
+        Preconditions:
+            - self.kind == 'Movie'
+
+        # test case: movie with reviews
+        >>> movie = _WeightedVertex("The Matrix", "Movie")
+        >>> review1 = _WeightedVertex(0.6, "Review")
+        >>> review2 = _WeightedVertex(0.9, "Review")
+        >>> other_movie = _WeightedVertex("Inception", "Movie")
+        >>> movie.neighbours = {review1: 0.8, review2: 0.7, other_movie: 0.5}
+        >>> movie.review_statistics() == (movie.average_score(), movie.average_similarity())
+        True
+
+        # test case: movie without reviews
+        >>> movie = _WeightedVertex("Toy Story", "Movie")
+        >>> movie.review_statistics()
+        (0, 0)
+
+        # test case: review vertex (should not compute statistics)
+        >>> review1 = _WeightedVertex(0.2, "Review")
+        >>> review1.neighbours = {movie: 0.4}
+        >>> review1.review_statistics()
+        (0, 0)
+        """
+        # not applicable for review vertices or movies without any reviews
+        if len(self.neighbours) == 0 or self.kind == "Review":
+            return 0, 0
+
+        # collect the unique review scores and the unique similarity weights in the same loop
+        reviews, similarities = set(), set()
+        for review, weight in self.neighbours.items():
+            if review.kind == "Review":
+                reviews.add(review.item)
+                similarities.add(weight)
+
+        # return 0 for both if there are no connected reviews
+        if len(reviews) == 0:
+            return 0, 0
+
+        # calculate and return both averages, looking up the genre similarity when the genres are known
+        if self.genres is not None:
+            return sum(reviews) / len(reviews), self._genre_similarity()
+        return sum(reviews) / len(reviews), sum(similarities) / len(similarities)
+
     def overall_similarity_score(self, movie: _WeightedVertex, weight_for_movie: float = 0.5,
                                  weight_for_genres: float = 0.5) -> float:
         """Returns the overall similarity score: a score that represents how "similar"
@@ -285,7 +492,7 @@ class _WeightedVertex(_Vertex):
 
         The score is calculated as follows: 0.5 * {similarity to movie} + 0.5 * {similarity to genres}
         The similarity to movie is stored as a weight between the two movies.
-        The similarity to genres is calculated by computing the average weight in all reviews.
+        The similarity to genres is given by self.average_similarity().
 
         Preconditions:
             - self.kind == 'Movie'
@@ -335,10 +542,41 @@ class _WeightedVertex(_Vertex):
         movie_similarity = self.neighbours[movie] * weight_for_movie
 
         # calculate the average genre similarity from reviews
-        genre_similarity = self.average_similarity() * weight_for_genres
+        genre_part = self.average_similarity() * weight_for_genres
 
         # return the combined overall similarity score
-        return movie_similarity + genre_similarity
+        return movie_similarity + genre_part
+
+
+########################################################################################################################
+# _CriticVertex class
+########################################################################################################################
+# @check_contracts
+class _CriticVertex(_WeightedVertex):
+    """A vertex in a weighted movie review graph, used to represent a critic.
+
+    A critic is adjacent to every movie they reviewed, and the weight of each edge is the score
+    (a decimal proportion out of 1.0) the critic gave that movie.
+
+    Instance Attributes:
+        - item: The name of the critic.
+        - kind: Always 'Critic'.
+        - neighbours: The movies reviewed by this critic, and the scores the critic gave them.
+        - publications: The names of the publications the critic's reviews appeared in.
+        - top_critic: Whether Rotten Tomatoes considers this critic a top critic.
+
+    Representation Invariants:
+        - self.kind == 'Critic'
+        - all(u.kind in {'Movie', 'Chosen Movie'} for u in self.neighbours)
+    """
+    publications: set[str]
+    top_critic: bool
+
+    def __init__(self, item: Any, top_critic: bool = False) -> None:
+        """Initialize a new critic vertex with the given name, who has not reviewed any movie."""
+        super().__init__(item, 'Critic')
+        self.publications = set()
+        self.top_critic = top_critic
 
 
 ########################################################################################################################
@@ -442,15 +680,25 @@ class WeightedGraph(Graph):
     #     - preferred_movie:
     #         The title of the movie that the user prefers most. This is used as a reference
     #         point for calculating similarity scores between movies.
+    #     - seed_movies:
+    #         The favourite movies of the user and their weights, including the preferred movie.
+    #         It only holds the preferred movie (with weight 1), unless set_seed_movies was called.
+    #     - _genre_preference:
+    #         The preferred genres shared by every vertex of this graph, which computes and remembers
+    #         the genre similarity of the movies to preferred_genres.
     _vertices: dict[Any, _WeightedVertex]
     preferred_genres: set[str]
     preferred_movie: str
+    seed_movies: dict[str, float]
+    _genre_preference: _GenrePreference
 
     def __init__(self) -> None:
         """Initialize an empty graph (no vertices or edges)."""
         self._vertices = {}
         self.preferred_genres = set()
         self.preferred_movie = ''
+        self.seed_movies = {}
+        self._genre_preference = _GenrePreference()
         Graph.__init__(self)
 
     def __contains__(self, item: Any) -> bool:
@@ -458,17 +706,18 @@ class WeightedGraph(Graph):
         """
         return item in self._vertices
 
-    def add_vertex(self, item: Any, kind: str) -> None:
-        """Add a vertex with the given item and kind to this graph.
+    def add_vertex(self, item: Any, kind: str, genres: Optional[set[str]] = None) -> None:
+        """Add a vertex with the given item, kind and genres to this graph.
 
         The new vertex is not adjacent to any other vertices.
         Do nothing if the given item is already in this graph.
 
         Preconditions:
             - kind in {'Review', 'Movie'}
+            - genres is None or kind == 'Movie'
         """
         if item not in self._vertices:
-            self._vertices[item] = _WeightedVertex(item, kind)
+            self._vertices[item] = _WeightedVertex(item, kind, genres, self._genre_preference)
 
     def add_edge(self, item1: Any, item2: Any, weight: Union[int, float] = 1) -> None:
         """Add an edge between the two vertices with the given items in this graph,
@@ -487,6 +736,88 @@ class WeightedGraph(Graph):
         else:
             raise ValueError
 
+    def remove_edge(self, item1: Any, item2: Any) -> None:
+        """Remove the edge between the two vertices with the given items in this graph.
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph,
+        or if they are not adjacent.
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie")
+        >>> g.add_vertex(0.8, "Review")
+        >>> g.add_edge("Inception", 0.8, 0.5)
+        >>> g.remove_edge(0.8, "Inception")
+        >>> g.adjacent("Inception", 0.8)
+        False
+        >>> g.remove_edge("Inception", 0.8)
+        Traceback (most recent call last):
+        ...
+        ValueError
+        """
+        if item1 in self._vertices and item2 in self._vertices \
+                and self._vertices[item2] in self._vertices[item1].neighbours:
+            v1 = self._vertices[item1]
+            v2 = self._vertices[item2]
+            del v1.neighbours[v2]
+
+            # v1 and v2 are the same vertex when removing an edge from a vertex to itself
+            v2.neighbours.pop(v1, None)
+        else:
+            raise ValueError
+
+    def add_critic_review(self, critic: str, movie: str, score: float, publication: str = '',
+                          top_critic: bool = False) -> None:
+        """Record that the given critic gave the given score to the given movie, adding a critic vertex
+        for them if there is none yet.
+
+        If the critic already reviewed this movie, the new score replaces the previous one.
+        Raise a ValueError if movie does not appear as a vertex in this graph, or if critic appears
+        as a vertex that is not a critic.
+
+        Preconditions:
+            - 0 <= score <= 1
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie")
+        >>> g.add_critic_review("Roger Ebert", "Inception", 0.75, "Chicago Sun-Times", True)
+        >>> g.get_vertex("Roger Ebert").neighbours[g.get_vertex("Inception")]
+        0.75
+        >>> g.get_vertex("Roger Ebert").top_critic
+        True
+        """
+        if critic not in self._vertices:
+            self._vertices[critic] = _CriticVertex(critic, top_critic)
+
+        vertex = self._vertices[critic]
+        if not isinstance(vertex, _CriticVertex):
+            raise ValueError
+        self.add_edge(critic, movie, score)
+
+        # keep track of where the critic publishes, and whether they were ever a top critic
+        if publication != '':
+            vertex.publications.add(publication)
+        vertex.top_critic = vertex.top_critic or top_critic
+
+    def add_review_scores(self, movie: str, scores: list[float]) -> None:
+        """Add the given raw review scores of the given movie to the score sketch of its vertex, creating the
+        sketch the first time.
+
+        Raise a ValueError if movie does not appear as a vertex in this graph.
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie")
+        >>> g.add_review_scores("Inception", [0.9, 0.9])
+        >>> g.get_vertex("Inception").score_sketch.n
+        2
+        """
+        if movie not in self._vertices:
+            raise ValueError
+
+        vertex = self._vertices[movie]
+        if vertex.score_sketch is None:
+            vertex.score_sketch = QuantileSketch()
+        vertex.score_sketch.update_many(scores)
+
     def get_number_of_vertices(self) -> int:
         """Returns the number of vertices."""
         return len(self._vertices)
@@ -495,10 +826,38 @@ class WeightedGraph(Graph):
         """Gets the vertex in the graph based on its associated item."""
         return self._vertices[item]
 
+    def get_vertices(self, kind: str = '') -> list[_WeightedVertex]:
+        """Return a list of the vertices in this graph, in the order they were added.
+
+        If kind != '', only return the vertices of the given kind.
+
+        Note that the _WeightedVertex objects are returned, so that callers extracting data from many
+        vertices at once do not need to look every item up again.
+
+        Preconditions:
+            - kind in {'', 'Review', 'Movie', 'Chosen Movie', 'Critic'}
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie")
+        >>> g.add_vertex(0.8, "Review")
+        >>> [v.item for v in g.get_vertices("Review")]
+        [0.8]
+        """
+        if kind != '':
+            return [v for v in self._vertices.values() if v.kind == kind]
+        else:
+            return list(self._vertices.values())
+
     def set_user_preferences(self, movie: str, genres: set[str]) -> None:
         """Sets the preferred attribute to True for the vertex that matches the preferred film.
         The method marks the chosen movie vertex as preferred and updates the preferred genres.
 
+        Every other movie with known genres is connected to the chosen movie, with the genre similarity
+        of the two movies as the edge weight. Only what changed since the last call is recomputed:
+        the movie edges are only replaced if the preferred movie changed (or set_seed_movies changed
+        their weights), and the genre similarities are only forgotten if the preferred genres changed.
+        The reviews are never touched.
+
         Preconditions:
             - self._vertices[movie].kind == 'Movie'
             - genres is a set of strings, where each string represents a valid genre
@@ -522,49 +881,269 @@ class WeightedGraph(Graph):
         Traceback (most recent call last):
         ...
         ValueError
+
+        # test case: movies with known genres are connected to the preferred movie
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie", {"Action", "Sci-fi"})
+        >>> g.add_vertex("Dark Knight", "Movie", {"Action"})
+        >>> g.add_vertex("Up", "Movie", {"Animation"})
+        >>> g.set_user_preferences("Inception", {"Action"})
+        >>> g.get_vertex("Dark Knight").neighbours[g.get_vertex("Inception")]
+        0.5
+        >>> g.set_user_preferences("Up", {"Action"})
+        >>> g.adjacent("Dark Knight", "Inception")
+        False
+        >>> g.get_vertex("Inception").neighbours[g.get_vertex("Up")]
+        0.0
         """
         # check if the specified movie title exists as a vertex within the graph's vertices
         if movie in self._vertices:
 
-            # assign the user's chosen movie as the preferred movie for personalized recommendations
-            self.preferred_movie = movie
-            vertex = self._vertices[movie]
+            # only re-centre the graph if the chosen movie changed, or if the edges were weighted for several seeds
+            if movie != self.preferred_movie or len(self.seed_movies) > 1:
 
-            # mark the vertex corresponding to the chosen movie as preferred
-            vertex.preferred = True
+                # disconnect the previously chosen movie, if there is one
+                self._disconnect_preferred_movie()
 
-            # update the kind of the vertex to 'Chosen Movie' to distinguish it from other movie vertices
-            vertex.kind = 'Chosen Movie'
+                # assign the user's chosen movie as the preferred movie for personalized recommendations
+                self.preferred_movie = movie
+                self.seed_movies = {movie: 1.0}
+                vertex = self._vertices[movie]
+
+                # mark the vertex corresponding to the chosen movie as preferred
+                vertex.preferred = True
+
+                # update the kind of the vertex to 'Chosen Movie' to distinguish it from other movie vertices
+                vertex.kind = 'Chosen Movie'
+
+                # connect every other movie with known genres to the chosen movie, weighted by genre similarity
+                if vertex.genres is not None:
+                    for other in list(self._vertices.values()):
+                        if other is not vertex and other.genres is not None:
+                            self.add_edge(other.item, movie, genre_similarity(other.genres, vertex.genres))
 
             # update the set of preferred genres based on the user's input
+            # the genre similarities of the movies are recomputed lazily, only if the genres changed
             self.preferred_genres = genres
+            self._genre_preference.set_genres(genres)
         else:
 
             # if the specified movie is not found within the graph, an error is raised
             raise ValueError
 
-    def to_networkx(self, max_vertices: int = 5000) -> nx.Graph:
-        """Convert this graph into a networkx Graph.
+    def _disconnect_preferred_movie(self) -> None:
+        """Removes the edges that set_user_preferences added between the preferred movie and the other movies,
+        and turns the preferred movie back into a regular movie.
 
-        max_vertices specifies the maximum number of vertices that can appear in the graph.
-        (This is necessary to limit the visualization output for large graphs.)
+        Do nothing if there is no preferred movie.
         """
-        graph_nx = nx.Graph()
-        v_center = self._vertices[self.preferred_movie]
-        for v in self._vertices.values():
-            if v == v_center:
-                continue
-            graph_nx.add_node(v.item, kind=v.kind)
+        if self.preferred_movie in self._vertices:
+            vertex = self._vertices[self.preferred_movie]
+            if vertex.genres is not None:
+                for other in [u for u in vertex.neighbours if u.kind != "Review" and u.genres is not None]:
+                    self.remove_edge(self.preferred_movie, other.item)
+
+            vertex.preferred = False
+            vertex.kind = 'Movie'
+
+        # the other seeds are regular movies again too
+        for title in self.seed_movies:
+            if title in self._vertices:
+                self._vertices[title].preferred = False
+
+        self.preferred_movie = ''
+        self.seed_movies = {}
+
+    def set_seed_movies(self, seeds: dict[str, float], similarities: dict[str, float]) -> None:
+        """Records seeds as the favourite movies of the user, mapped to their weights, and replaces the weight of
+        the edge between the preferred movie and every movie in similarities adjacent to it with its similarity
+        (such as its similarity to all the seeds, see multi_seed.set_seed_preferences).
+
+        The seeds other than the preferred movie are marked as preferred, so they are never recommended.
+        Call set_user_preferences first: the preferred movie must be one of the seeds.
+
+        Raise a ValueError if the preferred movie is not in seeds, or if a seed is not in this graph.
+
+        >>> g = WeightedGraph()
+        >>> for title, genres in [("Alien", {"Sci-fi"}), ("Heat", {"Crime"}), ("Up", {"Animation"})]:
+        ...     g.add_vertex(title, "Movie", genres)
+        >>> g.set_user_preferences("Alien", set())
+        >>> g.set_seed_movies({"Alien": 2.0, "Heat": 1.0}, {"Heat": 1.0, "Up": 0.25})
+        >>> g.get_vertex("Up").neighbours[g.get_vertex("Alien")], g.get_vertex("Heat").preferred
+        (0.25, True)
+        >>> g.set_user_preferences("Alien", set())
+        >>> g.get_vertex("Up").neighbours[g.get_vertex("Alien")], g.get_vertex("Heat").preferred, g.seed_movies
+        (0.0, False, {'Alien': 1.0})
+        """
+        if self.preferred_movie not in seeds or any(title not in self._vertices for title in seeds):
+            raise ValueError
 
-            for u in v.neighbours.keys():
-                if graph_nx.number_of_nodes() < max_vertices:
-                    graph_nx.add_node(u.item, kind=u.kind)
+        # unmark the previous seeds, then mark the new ones
+        for title in self.seed_movies:
+            if title != self.preferred_movie:
+                self._vertices[title].preferred = False
+        for title in seeds:
+            self._vertices[title].preferred = True
+        self.seed_movies = dict(seeds)
+
+        # reweight the edges of the preferred movie
+        vertex = self._vertices[self.preferred_movie]
+        for title, similarity in similarities.items():
+            other = self._vertices[title]
+            if other in vertex.neighbours:
+                vertex.neighbours[other] = similarity
+                other.neighbours[vertex] = similarity
+
+    def clear_user_preferences(self) -> None:
+        """Undoes set_user_preferences: the preferred movie vertex goes back to being a regular movie
+        that is no longer connected to the other movies, and the preferred movie and genres are cleared.
 
-                if u.item in graph_nx.nodes:
-                    graph_nx.add_edge(v.item, u.item, weight=u.overall_similarity_score(v) + u.average_score())
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie")
+        >>> g.set_user_preferences("Inception", {"action"})
+        >>> g.clear_user_preferences()
+        >>> g.preferred_movie
+        ''
+        >>> g.get_vertex("Inception").kind
+        'Movie'
+        >>> g.get_vertex("Inception").preferred
+        False
+        """
+        # reset and disconnect the vertex of the preferred movie, if there is one
+        self._disconnect_preferred_movie()
 
-            if graph_nx.number_of_nodes() >= max_vertices:
+        # forget the user's preferred genres
+        self.preferred_genres = set()
+        self._genre_preference.set_genres(set())
+
+    def ego_subgraph(self, max_vertices: int, max_edges: Optional[int] = None, hops: int = 2,
+                     review_share: float = 0.25, seed: int = 0) \
+            -> tuple[list[_WeightedVertex], list[tuple[_WeightedVertex, _WeightedVertex]]]:
+        """Returns the vertices of a subgraph around the preferred movie, in the order they were chosen, and the
+        edges between them, where the first vertex of every edge is a movie (or the preferred movie).
+        The subgraph has at most max_vertices vertices and, if max_edges is given, at most max_edges edges.
+
+        The subgraph starts from the preferred movie and the other seed movies (see set_seed_movies), and grows
+        one hop at a time, up to hops hops away from them. The candidates of a hop
+        are the neighbours of the vertices chosen in the previous hop, but only a random sample of them (seeded
+        by seed) is considered when a vertex has more neighbours than the remaining budget calls for, so the work
+        depends on the budget rather than on the size of the graph. The candidate movies with the highest average
+        review scores are chosen first, while the candidate reviews are taken from every score stratum in turn
+        (see SUBGRAPH_REVIEW_STRATA), followed by the critics, and about review_share of every hop is left to them.
+        Once the edges between the chosen vertices exceed max_edges, the vertices chosen after the last edge that
+        fits are left out.
+
+        Raise a ValueError if there is no preferred movie.
+
+        Preconditions:
+            - max_vertices > 0
+            - max_edges is None or max_edges >= 0
+            - hops >= 0
+            - 0 < review_share < 1
+
+        >>> g = WeightedGraph()
+        >>> for title, genres in [("Inception", {"Sci-fi"}), ("Up", {"Animation"}), ("Heat", {"Crime"})]:
+        ...     g.add_vertex(title, "Movie", genres)
+        >>> g.add_vertex(0.9, "Review")
+        >>> g.add_vertex(0.2, "Review")
+        >>> g.add_edge("Inception", 0.9, 1.0)
+        >>> g.add_edge("Up", 0.9, 1.0)
+        >>> g.add_edge("Heat", 0.2, 1.0)
+        >>> g.set_user_preferences("Inception", set())
+        >>> vertices, edges = g.ego_subgraph(3, hops=1)
+        >>> [v.item for v in vertices]
+        ['Inception', 'Up', 0.9]
+        >>> [(u.item, v.item) for u, v in edges]
+        [('Up', 'Inception'), ('Up', 0.9), ('Inception', 0.9)]
+        >>> vertices, edges = g.ego_subgraph(3, max_edges=2, hops=1)
+        >>> [v.item for v in vertices], [(u.item, v.item) for u, v in edges]
+        (['Inception', 'Up'], [('Up', 'Inception')])
+        """
+        if self.preferred_movie not in self._vertices:
+            raise ValueError
+
+        rng = random.Random(seed)
+        centre = self._vertices[self.preferred_movie]
+
+        # the order in which every chosen vertex was chosen, starting with the seed movies
+        chosen = {centre: 0}
+        chosen.update((self._vertices[title], 0) for title in self.seed_movies if len(chosen) < max_vertices)
+        layer = list(chosen)
+        for _ in range(hops):
+            room = max_vertices - len(chosen)
+            if room <= 0 or not layer:
                 break
+
+            # gather the candidates of this hop, sampling the neighbours of the vertices with too many of them
+            per_vertex = max(1, SUBGRAPH_CANDIDATES_PER_VERTEX * room // len(layer))
+            candidates = {}
+            for v in layer:
+                neighbours = v.neighbours if len(v.neighbours) <= per_vertex \
+                    else rng.sample(list(v.neighbours), per_vertex)
+                candidates.update((u, None) for u in neighbours if u not in chosen)
+
+            # rank the movies by average review score, and interleave the reviews of every score stratum
+            movies = sorted((u for u in candidates if u.kind == 'Movie'), key=lambda u: -u.review_statistics()[0])
+            strata = {}
+            for u in candidates:
+                if u.kind == 'Review':
+                    stratum = min(int(u.item * SUBGRAPH_REVIEW_STRATA), SUBGRAPH_REVIEW_STRATA - 1)
+                    strata.setdefault(stratum, []).append(u)
+            others = [u for group in itertools.zip_longest(*(strata[s] for s in sorted(strata, reverse=True)))
+                      for u in group if u is not None]
+            others.extend(u for u in candidates if u.kind == 'Critic')
+
+            # spread the room of this hop between the movies and the other vertices
+            ranked = heapq.merge(((i / (1 - review_share), u) for i, u in enumerate(movies)),
+                                 ((i / review_share, u) for i, u in enumerate(others)), key=lambda pair: pair[0])
+            layer = [u for _, u in itertools.islice(ranked, room)]
+            chosen.update((u, len(chosen) + i) for i, u in enumerate(layer))
+
+        # collect the edges from the movie side, since reviews, critics and the preferred movie have many more
+        # neighbours, and order every edge by the later of its two vertices
+        edges = []
+        for v, order in chosen.items():
+            if v.kind == 'Movie':
+                edges.extend((max(order, chosen[u]), v, u) for u in v.neighbours
+                             if u in chosen and (u.kind != 'Movie' or chosen[u] < order))
+            elif v is not centre and v in centre.neighbours:
+                edges.append((order, centre, v))
+        edges.sort(key=lambda edge: edge[0])
+
+        # leave out the vertices chosen after the edge budget ran out
+        if max_edges is not None and len(edges) > max_edges:
+            cutoff = edges[max_edges][0]
+            chosen = {v: order for v, order in chosen.items() if order < cutoff}
+            edges = [edge for edge in edges if edge[0] < cutoff]
+
+        return list(chosen), [(v, u) for _, v, u in edges]
+
+    def to_networkx(self, max_vertices: int = 5000, max_edges: Optional[int] = None, hops: int = 2) -> nx.Graph:
+        """Convert the subgraph around the preferred movie chosen by ego_subgraph into a networkx Graph.
+
+        max_vertices and max_edges specify the maximum number of vertices and edges that can appear in the graph,
+        and hops how far from the preferred movie they can be.
+        (This is necessary to limit the visualization output for large graphs.)
+
+        The weight of an edge between a movie and another vertex is the overall similarity score of the movie
+        to that vertex plus the average review score of the movie.
+        """
+        import networkx as nx
+
+        vertices, edges = self.ego_subgraph(max_vertices, max_edges, hops)
+        graph_nx = nx.Graph()
+        for v in vertices:
+            # every seed movie is drawn like the preferred movie
+            graph_nx.add_node(v.item, kind='Chosen Movie' if v.preferred else v.kind)
+
+        # compute the review statistics of every movie only once
+        statistics = {}
+        for movie, u in edges:
+            if movie not in statistics:
+                statistics[movie] = movie.review_statistics()
+            average_score, average_similarity = statistics[movie]
+            graph_nx.add_edge(movie.item, u.item,
+                              weight=movie.neighbours[u] * 0.5 + average_similarity * 0.5 + average_score)
         return graph_nx
 
 
@@ -581,10 +1160,7 @@ if __name__ == "__main__":
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ["csv", "networkx", "typing", "io", "time", "tkinter",
-                          "visualization1", "visualization2", "classes",
-                          "plotly.graph_objs", "pandas", "plotly.graph_objects"],
-        'allowed-io': ["get_favourite_movie", "get_favourite_genres", "load_weighted_review_graph",
-                       "print_recommended_movies", "display_recommendations"],
+        'extra-imports': ["heapq", "itertools", "random", "typing", "sketches", "networkx"],
+        'allowed-io': [],
         'max-line-length': 120
     })
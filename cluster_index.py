@@ -0,0 +1,271 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains a coarse cluster index of the movies (an inverted-file index), which lets the 'similarity'
+ranking of main.recommend_movies score only the movies of a few clusters instead of every movie of the catalogue.
+
+The index is built offline: the movies are grouped into clusters with k-modes, where the distance between a movie
+and the centre of a cluster is the genre distance (1 - genre similarity) between their genre bitmasks plus the
+difference between their strict average scores. The centre of a cluster has the genres that most of its movies
+have, and their mean strict average score. The index stores the centre and the movies of every cluster, and is
+saved to a .npz file.
+
+At query time, the centre of every cluster is scored like a movie under the 'similarity' ranking, and only the
+movies of the nprobe clusters with the highest scoring centres are scored (see ClusterIndex.candidates).
+A larger nprobe finds more of the movies that scoring every movie would recommend (a higher recall), and a smaller
+one scores fewer movies (a lower latency); the 'clusters' benchmark of benchmarks.py measures both against scoring
+every movie.
+
+The centres use the average scores of the movies when the index was built, so the index should be built again when
+many reviews were added since, and it must be built again when movies are added to the movie dataset.
+
+Usage (building and saving an index):
+    python cluster_index.py index.npz --clusters 128 --iterations 10
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+
+from classes import WeightedGraph
+from movie_arrays import MovieArrays, genre_bitmask, genre_similarities, popcount, strict_averages
+
+# The number of clusters probed by a query, if it does not say otherwise.
+DEFAULT_NPROBE = 8
+
+# The number of movies whose distances to every cluster centre are computed at a time while clustering.
+_ASSIGN_CHUNK = 4096
+
+
+class ClusterIndex:
+    """An inverted-file index of the movies with known genres, grouped into clusters of movies with similar genres
+    and average scores.
+
+    Instance Attributes:
+        - titles: The title of every indexed movie.
+        - genre_names: The genre represented by each bit of the genre bitmasks of this index.
+        - modes: The genre bitmask of the centre of every cluster.
+        - centres: The strict average score of the centre of every cluster.
+        - offsets: The movies of cluster c are members[offsets[c]:offsets[c + 1]].
+        - members: The indices (into titles) of the movies of every cluster, one cluster after the other.
+
+    Representation Invariants:
+        - len(self.modes) == len(self.centres)
+        - len(self.offsets) == len(self.modes) + 1
+        - sorted(self.members.tolist()) == list(range(len(self.titles)))
+        - len(self.genre_names) <= 64
+    """
+    titles: np.ndarray
+    genre_names: list[str]
+    modes: np.ndarray
+    centres: np.ndarray
+    offsets: np.ndarray
+    members: np.ndarray
+
+    def __init__(self, titles: np.ndarray, genre_names: list[str], modes: np.ndarray, centres: np.ndarray,
+                 offsets: np.ndarray, members: np.ndarray) -> None:
+        """Initialize an index with the given clusters."""
+        self.titles = titles
+        self.genre_names = genre_names
+        self.modes = modes
+        self.centres = centres
+        self.offsets = offsets
+        self.members = members
+
+    def centre_scores(self, movie_genres: Iterable[str], genres: Iterable[str]) -> np.ndarray:
+        """Returns the score under the 'similarity' ranking (see movie_arrays.similarity_scores) of the centre of
+        every cluster, for a favourite movie with the given genres and the given preferred genres.
+        Genres that no indexed movie has are ignored.
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Alien", "Movie", {"Sci-fi", "Horror"})
+        >>> g.add_vertex("Up", "Movie", {"Animation"})
+        >>> for score in [0.6, 0.7, 0.8]:
+        ...     g.add_vertex(score, "Review")
+        ...     g.add_edge("Alien", score)
+        ...     g.add_edge("Up", score)
+        >>> index = build_index(MovieArrays(g), 2)
+        >>> [round(float(score), 2) for score in index.centre_scores({"Sci-fi"}, {"Sci-fi"})]
+        [0.35, 0.0]
+        """
+        movie_mask = genre_bitmask(self.genre_names, movie_genres)
+        genres_mask = genre_bitmask(self.genre_names, genres)
+        return self.centres * (genre_similarities(self.modes, movie_mask) * 0.5
+                               + genre_similarities(self.modes, genres_mask) * 0.5)
+
+    def probe(self, movie_genres: Iterable[str], genres: Iterable[str], nprobe: int = DEFAULT_NPROBE,
+              min_candidates: int = 0) -> np.ndarray:
+        """Returns the indices (into titles) of the movies of the nprobe clusters with the highest scoring centres
+        (see ClusterIndex.centre_scores) for a favourite movie with the given genres and the given preferred genres, in
+        increasing order. More clusters are probed, in the same order, until there are at least min_candidates.
+
+        Preconditions:
+            - nprobe > 0
+        """
+        sizes = np.diff(self.offsets)
+        order = np.argsort(-self.centre_scores(movie_genres, genres), kind='stable')
+
+        # the number of clusters to probe: nprobe, or more if they have fewer than min_candidates movies
+        needed = int(np.searchsorted(np.cumsum(sizes[order]), min_candidates)) + 1
+        probed = order[:max(nprobe, needed)]
+        return np.sort(np.concatenate([self.members[self.offsets[c]:self.offsets[c + 1]] for c in probed]
+                                      or [np.empty(0, dtype=np.intp)]))
+
+    def candidates(self, movie_genres: Iterable[str], genres: Iterable[str], nprobe: int = DEFAULT_NPROBE,
+                   min_candidates: int = 0) -> list[str]:
+        """Returns the titles of the movies that ClusterIndex.probe returns, to be given as the candidates of
+        main.recommend_movies.
+
+        Preconditions:
+            - nprobe > 0
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Alien", "Movie", {"Sci-fi", "Horror"})
+        >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+        >>> g.add_vertex("Up", "Movie", {"Animation"})
+        >>> index = build_index(MovieArrays(g), 2)
+        >>> index.candidates({"Sci-fi"}, set(), 1)
+        ['Alien', 'Aliens']
+        >>> len(index.candidates({"Sci-fi"}, set(), 1, min_candidates=3))
+        3
+        """
+        return self.titles[self.probe(movie_genres, genres, nprobe, min_candidates)].tolist()
+
+    def save(self, path: str) -> None:
+        """Save this index to the given .npz file."""
+        np.savez(path, titles=self.titles.astype(str), genre_names=np.array(self.genre_names, dtype=str),
+                 modes=self.modes, centres=self.centres, offsets=self.offsets, members=self.members)
+
+    @staticmethod
+    def load(path: str) -> ClusterIndex:
+        """Load an index saved by ClusterIndex.save."""
+        with np.load(path) as data:
+            return ClusterIndex(data['titles'].astype(object), data['genre_names'].tolist(), data['modes'],
+                                data['centres'], data['offsets'], data['members'])
+
+
+def build_index(arrays: MovieArrays, num_clusters: Optional[int] = None, iterations: int = 10,
+                score_weight: float = 1.0, min_number_of_reviews: int = 3, seed: int = 0) -> ClusterIndex:
+    """Returns the cluster index of the movies of arrays whose genres are known, clustered with at most iterations
+    iterations of k-modes into num_clusters clusters (the square root of the number of movies, if it is None).
+
+    The distance between a movie and the centre of a cluster is 1 - their genre similarity, plus score_weight
+    times the difference between their strict average scores (with min_number_of_reviews). Every iteration
+    assigns every movie to its closest centre, then moves the centre of every cluster to the genres that most
+    of its movies have and to their mean strict average score. The clusters left empty are not indexed.
+
+    Preconditions:
+        - num_clusters is None or num_clusters > 0
+        - iterations > 0
+        - score_weight >= 0
+        - min_number_of_reviews > 0
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Alien", "Movie", {"Sci-fi", "Horror"})
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex("Up", "Movie", {"Animation"})
+    >>> g.add_vertex("Lost", "Movie")
+    >>> index = build_index(MovieArrays(g), 2)
+    >>> [index.titles[index.members[start:end]].tolist() for start, end in zip(index.offsets, index.offsets[1:])]
+    [['Alien', 'Aliens'], ['Up']]
+    >>> [index.genre_names[bit] for bit in range(len(index.genre_names)) if int(index.modes[0]) >> bit & 1]
+    ['Sci-fi']
+    """
+    rows = np.flatnonzero(arrays.known_genres)
+    masks = arrays.genre_masks[rows]
+    averages = strict_averages(arrays, min_number_of_reviews)[rows]
+    if num_clusters is None:
+        num_clusters = max(1, round(math.sqrt(len(rows))))
+    num_clusters = min(num_clusters, len(rows))
+
+    # start from the movies of distinct random rows
+    rng = np.random.default_rng(seed)
+    start = rng.choice(len(rows), num_clusters, replace=False)
+    modes, centres = masks[start], averages[start]
+    labels = None
+    for _ in range(iterations):
+        new_labels = _closest_centres(masks, averages, modes, centres, score_weight)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        modes, centres = _cluster_modes(masks, averages, labels, modes, centres)
+
+    # list the movies cluster by cluster, leaving out the empty clusters
+    sizes = np.bincount(labels, minlength=num_clusters)
+    kept = np.flatnonzero(sizes > 0)
+    offsets = np.concatenate([[0], np.cumsum(sizes[kept])]).astype(np.intp)
+    titles = np.empty(len(rows), dtype=object)
+    titles[:] = arrays.titles[rows].tolist()
+    return ClusterIndex(titles, list(arrays.genre_names), modes[kept], centres[kept], offsets,
+                        np.argsort(labels, kind='stable').astype(np.intp))
+
+
+def _closest_centres(masks: np.ndarray, averages: np.ndarray, modes: np.ndarray, centres: np.ndarray,
+                     score_weight: float) -> np.ndarray:
+    """Returns the cluster of the closest centre (see build_index) to every movie with the given genre bitmask
+    and strict average score, computing the distances of _ASSIGN_CHUNK movies at a time.
+    """
+    labels = np.empty(len(masks), dtype=np.intp)
+    for start in range(0, len(masks), _ASSIGN_CHUNK):
+        chunk = slice(start, start + _ASSIGN_CHUNK)
+        intersection = popcount(masks[chunk, None] & modes[None, :])
+        union = popcount(masks[chunk, None] | modes[None, :])
+        similarity = np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
+        distances = 1 - similarity + score_weight * np.abs(averages[chunk, None] - centres[None, :])
+        labels[chunk] = np.argmin(distances, axis=1)
+    return labels
+
+
+def _cluster_modes(masks: np.ndarray, averages: np.ndarray, labels: np.ndarray, modes: np.ndarray,
+                   centres: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the genre bitmask and strict average score of the centre of every cluster: the genres that more than
+    half of its movies have, and their mean strict average score. Empty clusters keep their mode and centre.
+    """
+    num_clusters = len(modes)
+    sizes = np.bincount(labels, minlength=num_clusters)
+
+    # count the movies of every cluster that have each genre, as one bincount over the set bits
+    bits = np.unpackbits(masks.view(np.uint8), bitorder='little').reshape(len(masks), 64)
+    movies, genres = np.nonzero(bits)
+    counts = np.bincount(labels[movies] * 64 + genres, minlength=num_clusters * 64).reshape(num_clusters, 64)
+    new_modes = (counts * 2 > sizes[:, None]).astype(np.uint64) @ (np.uint64(1) << np.arange(64, dtype=np.uint64))
+
+    totals = np.bincount(labels, averages, minlength=num_clusters)
+    new_centres = np.divide(totals, sizes, out=np.zeros(num_clusters), where=sizes > 0)
+    return np.where(sizes > 0, new_modes, modes), np.where(sizes > 0, new_centres, centres)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and save a cluster index of the movies.")
+    parser.add_argument('output_file', help=".npz file that the index is saved to")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--clusters', type=int, default=None, help="number of clusters (default: sqrt of movies)")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--score-weight', type=float, default=1.0,
+                        help="weight of the average score difference in the distance to a cluster")
+    args = parser.parse_args()
+
+    import main
+
+    full_graph = WeightedGraph()
+    movie_dicts, _ = main.load_movie_columns(args.movies, full_graph)
+    main.load_review_columns(args.reviews, [full_graph], movie_dicts)
+    cluster_index = build_index(MovieArrays(full_graph), args.clusters, args.iterations, args.score_weight)
+    cluster_index.save(args.output_file)
+    print(f"Saved {len(cluster_index.modes)} clusters of {len(cluster_index.titles)} movies to {args.output_file}")
@@ -0,0 +1,407 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains collaborative filtering scorers based on the critics of a WeightedGraph
+("critics who liked your favourite movie also liked...").
+
+The scores given by critics form a sparse critic x movie matrix, stored as three NumPy arrays holding the
+critic, movie and score of every non-zero entry. Two scorers use it:
+    - CriticScorer.co_liked_scores: the critics who liked the favourite movie vote for the other movies
+      they rated above their own average score.
+    - Factorization: an alternating least squares factorization of the matrix, trained offline and saved
+      to a .npz file. Serving a query is then a single matrix-vector product against the movie factors.
+
+Usage (training and saving a factorization):
+    python critics.py factors.npz --factors 32 --iterations 10
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import weakref
+from typing import Any, Collection, Optional
+
+import numpy as np
+
+from classes import WeightedGraph, _CriticVertex, _WeightedVertex
+from movie_arrays import MovieArrays, restrict_scores, top_rows
+
+# The CriticScorer of every graph scored so far, so that its arrays are only built once per graph.
+_SCORERS = weakref.WeakKeyDictionary()
+
+
+class Factorization:
+    """A low-rank factorization of the critic x movie score matrix: the score a critic would give a movie
+    is approximated by mean + dot(critic factor, movie factor).
+
+    Instance Attributes:
+        - titles: The title of the movie of each row of movie_factors.
+        - critic_names: The name of the critic of each row of critic_factors.
+        - movie_factors: One row of factors per movie.
+        - critic_factors: One row of factors per critic.
+        - mean: The mean of all the scores.
+
+    Representation Invariants:
+        - len(self.titles) == len(self.movie_factors)
+        - len(self.critic_names) == len(self.critic_factors)
+        - self.movie_factors.shape[1] == self.critic_factors.shape[1]
+    """
+    # Private Instance Attributes:
+    #     - _normalized:
+    #         The movie factors scaled to unit length, so that their dot products are cosine similarities.
+    titles: np.ndarray
+    critic_names: np.ndarray
+    movie_factors: np.ndarray
+    critic_factors: np.ndarray
+    mean: float
+    _normalized: np.ndarray
+
+    def __init__(self, titles: np.ndarray, critic_names: np.ndarray, movie_factors: np.ndarray,
+                 critic_factors: np.ndarray, mean: float) -> None:
+        """Initialize a factorization with the given factors."""
+        self.titles = titles
+        self.critic_names = critic_names
+        self.movie_factors = movie_factors
+        self.critic_factors = critic_factors
+        self.mean = mean
+        lengths = np.linalg.norm(movie_factors, axis=1, keepdims=True)
+        self._normalized = np.divide(movie_factors, lengths, out=np.zeros_like(movie_factors), where=lengths > 0)
+
+    def similarities(self, title: Any) -> np.ndarray:
+        """Returns the cosine similarity of the factors of every movie (in row order) to those of the given movie.
+
+        Raise a ValueError if the movie was not part of the factorization.
+        """
+        rows = np.flatnonzero(self.titles == title)
+        if len(rows) == 0:
+            raise ValueError(f"{title} was not part of the factorization")
+        return self._normalized @ self._normalized[rows[0]]
+
+    def save(self, path: str) -> None:
+        """Save this factorization to the given .npz file."""
+        np.savez(path, titles=self.titles.astype(str), critic_names=self.critic_names.astype(str),
+                 movie_factors=self.movie_factors, critic_factors=self.critic_factors, mean=self.mean)
+
+    @staticmethod
+    def load(path: str) -> Factorization:
+        """Load a factorization saved by Factorization.save."""
+        with np.load(path) as data:
+            return Factorization(data['titles'].astype(object), data['critic_names'].astype(object),
+                                 data['movie_factors'], data['critic_factors'], float(data['mean']))
+
+
+class CriticScorer:
+    """Collaborative filtering scores for the movies of a WeightedGraph, based on the scores given by its critics.
+
+    Instance Attributes:
+        - arrays: The movies of the graph.
+        - critic_names: The name of each critic, indexed by critic number.
+        - top_critics: Whether each critic is a top critic.
+        - edge_critics: The critic number of every critic-movie edge.
+        - edge_movies: The movie row of every critic-movie edge.
+        - edge_scores: The score of every critic-movie edge.
+        - like_threshold: The minimum score for a critic to count as having liked a movie.
+        - top_critic_weight: How much more the vote of a top critic counts.
+        - factors: The factorization used by rank, or None to use co_liked_scores.
+
+    Representation Invariants:
+        - len(self.edge_critics) == len(self.edge_movies) == len(self.edge_scores)
+        - self.top_critic_weight > 0
+    """
+    # Private Instance Attributes:
+    #     - _critic_numbers:
+    #         Maps each critic name to its critic number.
+    #     - _critic_means:
+    #         The average score given by each critic.
+    #     - _movie_counts:
+    #         The number of critics who scored each movie.
+    arrays: MovieArrays
+    critic_names: np.ndarray
+    top_critics: np.ndarray
+    edge_critics: np.ndarray
+    edge_movies: np.ndarray
+    edge_scores: np.ndarray
+    like_threshold: float
+    top_critic_weight: float
+    factors: Optional[Factorization]
+    _critic_numbers: dict[Any, int]
+    _critic_means: np.ndarray
+    _movie_counts: np.ndarray
+
+    def __init__(self, graph: WeightedGraph, like_threshold: float = 0.7, top_critic_weight: float = 1.5) -> None:
+        """Extract the critic x movie score matrix of the given graph.
+
+        >>> g = WeightedGraph()
+        >>> for title in ["Alien", "Aliens", "Cats"]:
+        ...     g.add_vertex(title, "Movie")
+        >>> g.add_critic_review("Ann", "Alien", 0.9)
+        >>> g.add_critic_review("Ann", "Aliens", 0.8)
+        >>> g.add_critic_review("Ann", "Cats", 0.1)
+        >>> scorer = CriticScorer(g)
+        >>> scorer.edge_scores.tolist()
+        [0.9, 0.8, 0.1]
+        """
+        self.arrays = MovieArrays(graph)
+        self.like_threshold = like_threshold
+        self.top_critic_weight = top_critic_weight
+        self.factors = None
+
+        # list the critic-movie edges, in one pass over the critics
+        critics = graph.get_vertices('Critic')
+        self.critic_names = np.empty(len(critics), dtype=object)
+        self.critic_names[:] = [critic.item for critic in critics]
+        self.top_critics = np.array([critic.top_critic for critic in critics], dtype=bool)
+        edge_critics, edge_movies, edge_scores = [], [], []
+        for number, critic in enumerate(critics):
+            for movie, score in critic.neighbours.items():
+                edge_critics.append(number)
+                edge_movies.append(self.arrays.index[movie.item])
+                edge_scores.append(score)
+        self.edge_critics = np.array(edge_critics, dtype=np.intp)
+        self.edge_movies = np.array(edge_movies, dtype=np.intp)
+        self.edge_scores = np.array(edge_scores, dtype=float)
+        self._critic_numbers = {critic.item: number for number, critic in enumerate(critics)}
+        self._update_totals()
+
+    def _update_totals(self) -> None:
+        """Compute the average score of every critic and the number of critics of every movie."""
+        num_critics = len(self.critic_names)
+        counts = np.bincount(self.edge_critics, minlength=num_critics)
+        self._critic_means = np.divide(np.bincount(self.edge_critics, self.edge_scores, minlength=num_critics),
+                                       counts, out=np.zeros(num_critics), where=counts > 0)
+        self._movie_counts = np.bincount(self.edge_movies, minlength=len(self.arrays.movies))
+
+    def add_reviews(self, reviews: list[tuple[_CriticVertex, _WeightedVertex]]) -> None:
+        """Add the given (critic vertex, movie vertex) reviews, which were added to or changed in the graph after
+        this scorer was created. The score of every review is read from the graph, so a review that replaced an
+        earlier review of the same movie by the same critic replaces its score.
+
+        Preconditions:
+            - all(movie.item in self.arrays.index for _, movie in reviews)
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Up", "Movie")
+        >>> g.add_critic_review("Ann", "Up", 0.5)
+        >>> scorer = CriticScorer(g)
+        >>> g.add_critic_review("Ann", "Up", 0.9)
+        >>> g.add_critic_review("Bob", "Up", 0.7, top_critic=True)
+        >>> scorer.add_reviews([(g.get_vertex("Ann"), g.get_vertex("Up")), (g.get_vertex("Bob"), g.get_vertex("Up"))])
+        >>> scorer.edge_scores.tolist(), scorer.top_critics.tolist()
+        ([0.9, 0.7], [False, True])
+        """
+        # number the new critics, and update whether each critic is a top critic
+        for critic, _ in reviews:
+            self._critic_numbers.setdefault(critic.item, len(self._critic_numbers))
+        new_names = np.empty(len(self._critic_numbers) - len(self.critic_names), dtype=object)
+        new_names[:] = list(self._critic_numbers)[len(self.critic_names):]
+        self.critic_names = np.concatenate([self.critic_names, new_names])
+        self.top_critics = np.concatenate([self.top_critics, np.zeros(len(new_names), dtype=bool)])
+        for critic, _ in reviews:
+            self.top_critics[self._critic_numbers[critic.item]] = critic.top_critic
+
+        # identify every review by critic number and movie row, keeping the latest score of each
+        num_movies = len(self.arrays.movies)
+        scores = {self._critic_numbers[critic.item] * num_movies + self.arrays.index[movie.item]:
+                  critic.neighbours[movie] for critic, movie in reviews}
+        keys = np.fromiter(scores, dtype=np.int64, count=len(scores))
+
+        # replace the scores of the reviews that are already in the arrays, and append the others
+        edge_keys = self.edge_critics.astype(np.int64) * num_movies + self.edge_movies
+        replaced = np.flatnonzero(np.isin(edge_keys, keys))
+        self.edge_scores[replaced] = [scores[key] for key in edge_keys[replaced].tolist()]
+        added = keys[~np.isin(keys, edge_keys[replaced])]
+        self.edge_critics = np.concatenate([self.edge_critics, (added // num_movies).astype(np.intp)])
+        self.edge_movies = np.concatenate([self.edge_movies, (added % num_movies).astype(np.intp)])
+        self.edge_scores = np.concatenate([self.edge_scores, [scores[key] for key in added.tolist()]])
+        self._update_totals()
+
+    def co_liked_scores(self, movie: Any) -> np.ndarray:
+        """Returns the score of every movie (in row order): the critics who gave the given movie at least
+        like_threshold vote for every movie they scored, by how much more than their own average they scored it.
+
+        The votes of top critics are multiplied by top_critic_weight, and the total of each movie is divided
+        by the square root of its number of critics, so that widely reviewed movies do not win by volume alone.
+
+        Preconditions:
+            - movie in self.arrays.index
+
+        >>> g = WeightedGraph()
+        >>> for title in ["Alien", "Aliens", "Cats"]:
+        ...     g.add_vertex(title, "Movie")
+        >>> for critic, scores in [("Ann", [0.9, 0.8, 0.1]), ("Bob", [0.8, 0.9, 0.2]), ("Cy", [0.1, 0.2, 0.9])]:
+        ...     for title, score in zip(["Alien", "Aliens", "Cats"], scores):
+        ...         g.add_critic_review(critic, title, score)
+        >>> scores = CriticScorer(g).co_liked_scores("Alien")
+        >>> bool(scores[1] > 0 > scores[2])
+        True
+        """
+        row = self.arrays.index[movie]
+
+        # the weight of the vote of every critic: 0 unless they liked the movie
+        likes = (self.edge_movies == row) & (self.edge_scores >= self.like_threshold)
+        votes = np.zeros(len(self.critic_names))
+        votes[self.edge_critics[likes]] = np.where(self.top_critics[self.edge_critics[likes]],
+                                                   self.top_critic_weight, 1.0)
+
+        # add up the votes for every movie, as one sparse matrix-vector product
+        deviations = self.edge_scores - self._critic_means[self.edge_critics]
+        totals = np.bincount(self.edge_movies, votes[self.edge_critics] * deviations,
+                             minlength=len(self.arrays.movies))
+        return totals / np.sqrt(np.maximum(self._movie_counts, 1))
+
+    def factor_scores(self, movie: Any) -> np.ndarray:
+        """Returns the cosine similarity of the factors of every movie (in row order) to those of the given movie,
+        using self.factors. Movies that were not part of the factorization get 0.
+
+        Preconditions:
+            - self.factors is not None
+        """
+        similarities = self.factors.similarities(movie)
+
+        # the factorization may have been trained on a graph whose movies were in another order
+        scores = np.zeros(len(self.arrays.movies))
+        rows = np.array([self.arrays.index.get(title, -1) for title in self.factors.titles], dtype=np.intp)
+        scores[rows[rows >= 0]] = similarities[rows >= 0]
+        return scores
+
+    def train_als(self, num_factors: int = 32, regularization: float = 0.1, iterations: int = 10,
+                  seed: int = 0) -> Factorization:
+        """Trains, stores in self.factors and returns a factorization of the critic x movie score matrix,
+        using alternating least squares.
+
+        Every iteration fixes the movie factors and solves a regularized least squares problem for the
+        factors of every critic (all critics at once, as one batched solve), then does the same for the movies.
+
+        Preconditions:
+            - num_factors > 0
+            - regularization > 0
+            - iterations > 0
+
+        >>> g = WeightedGraph()
+        >>> for title in ["Alien", "Aliens", "Cats"]:
+        ...     g.add_vertex(title, "Movie")
+        >>> for critic, scores in [("Ann", [0.9, 0.8, 0.1]), ("Bob", [0.8, 0.9, 0.2]), ("Cy", [0.1, 0.2, 0.9])]:
+        ...     for title, score in zip(["Alien", "Aliens", "Cats"], scores):
+        ...         g.add_critic_review(critic, title, score)
+        >>> scorer = CriticScorer(g)
+        >>> similarities = scorer.train_als(num_factors=2).similarities("Alien")
+        >>> bool(similarities[1] > similarities[2])
+        True
+        """
+        rng = np.random.default_rng(seed)
+        num_critics, num_movies = len(self.critic_names), len(self.arrays.movies)
+        mean = float(self.edge_scores.mean()) if len(self.edge_scores) > 0 else 0.0
+        residuals = self.edge_scores - mean
+        critic_factors = rng.normal(0, 0.1, (num_critics, num_factors))
+        movie_factors = rng.normal(0, 0.1, (num_movies, num_factors))
+
+        for _ in range(iterations):
+            critic_factors = _least_squares(self.edge_critics, self.edge_movies, residuals, movie_factors,
+                                            num_critics, regularization)
+            movie_factors = _least_squares(self.edge_movies, self.edge_critics, residuals, critic_factors,
+                                           num_movies, regularization)
+
+        self.factors = Factorization(self.arrays.titles, self.critic_names, movie_factors, critic_factors, mean)
+        return self.factors
+
+    def rank(self, graph: WeightedGraph, limit: int,
+             candidates: Optional[Collection[str]] = None) -> list[tuple[_WeightedVertex, float]]:
+        """Returns the top limit movies for the preferred movie of graph, as (movie vertex, score) pairs sorted by
+        score in descending order, using factor_scores if self.factors is set and co_liked_scores otherwise.
+        The preferred movie itself is not included. If candidates is given, only the movies with these titles
+        are ranked (see movie_filters).
+
+        Preconditions:
+            - limit > 0
+            - graph.preferred_movie in self.arrays.index
+        """
+        if self.factors is not None:
+            scores = self.factor_scores(graph.preferred_movie)
+        else:
+            scores = self.co_liked_scores(graph.preferred_movie)
+        scores[self.arrays.index[graph.preferred_movie]] = -np.inf
+        if candidates is not None:
+            restrict_scores(scores, self.arrays.index, candidates)
+        return [(self.arrays.movies[row], float(scores[row])) for row in top_rows(scores, limit)]
+
+
+def _least_squares(rows: np.ndarray, columns: np.ndarray, values: np.ndarray, fixed: np.ndarray,
+                   num_rows: int, regularization: float) -> np.ndarray:
+    """Returns the factors x of every row that minimize the sum of (values - x[row] . fixed[column]) ** 2
+    over the entries of the row, plus regularization * |x[row]| ** 2.
+
+    The normal equations of all the rows are built entry by entry and solved as one batched system.
+    """
+    num_factors = fixed.shape[1]
+    grams = np.zeros((num_rows, num_factors, num_factors))
+    targets = np.zeros((num_rows, num_factors))
+
+    # add the outer product of the fixed factors of every entry to the normal equations of its row,
+    # in chunks sorted by row so that the sums are contiguous
+    order = np.argsort(rows, kind='stable')
+    for start in range(0, len(order), 65536):
+        chunk = order[start:start + 65536]
+        chunk_rows, first = np.unique(rows[chunk], return_index=True)
+        factors = fixed[columns[chunk]]
+        grams[chunk_rows] += np.add.reduceat(factors[:, :, None] * factors[:, None, :], first, axis=0)
+        targets[chunk_rows] += np.add.reduceat(factors * values[chunk][:, None], first, axis=0)
+
+    grams += regularization * np.eye(num_factors)
+    return np.linalg.solve(grams, targets[:, :, None])[:, :, 0]
+
+
+def update_scorer(graph: WeightedGraph, reviews: list[tuple[_CriticVertex, _WeightedVertex]]) -> None:
+    """Add the given new or changed (critic vertex, movie vertex) reviews of graph to its CriticScorer,
+    if it has one.
+    """
+    if graph in _SCORERS:
+        _SCORERS[graph].add_reviews(reviews)
+
+
+def get_scorer(graph: WeightedGraph) -> CriticScorer:
+    """Returns the CriticScorer of the given graph, creating it the first time the graph is scored.
+
+    Raise a ValueError if the graph has no critics (see main.load_review_columns).
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Up", "Movie")
+    >>> get_scorer(g)
+    Traceback (most recent call last):
+    ...
+    ValueError: The reviews were loaded without their critics
+    """
+    if graph not in _SCORERS:
+        if not graph.get_vertices('Critic'):
+            raise ValueError("The reviews were loaded without their critics")
+        _SCORERS[graph] = CriticScorer(graph)
+    return _SCORERS[graph]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and save a factorization of the critic x movie scores.")
+    parser.add_argument('output_file', help=".npz file that the factorization is saved to")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--factors', type=int, default=32)
+    parser.add_argument('--regularization', type=float, default=0.1)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    import main
+
+    full_graph = WeightedGraph()
+    movie_dicts, _ = main.load_movie_columns(args.movies, full_graph)
+    main.load_review_columns(args.reviews, [full_graph], movie_dicts, with_critics=True)
+    CriticScorer(full_graph).train_als(args.factors, args.regularization, args.iterations).save(args.output_file)
+    print(f"Saved the factorization to {args.output_file}")
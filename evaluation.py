@@ -0,0 +1,393 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the offline evaluation harness, which measures how well the rankings of
+main.recommend_movies recommend movies to held-out critics, next to the time each ranking takes per query.
+
+The profiles are built from the review dataset. Every sampled critic who liked (scored at least like_threshold)
+enough movies becomes a profile: its favourite movie is one of the movies the critic liked, its preferred genres
+are the genres of that movie, and its relevant movies are the other movies the critic liked. The reviews of the
+sampled critics are left out of the graph, so that no ranking can see them. Every ranker then recommends
+k movies to every profile, and the recommendations are scored by:
+    - hit rate@k: the proportion of profiles with at least one relevant movie in their top k
+    - NDCG@k: the normalized discounted cumulative gain of the top k, where every relevant movie has gain 1
+
+Usage:
+    python evaluation.py --profiles 500 --k 10 --workers 4 --rankers similarity pagerank critics \\
+        similarity:weight_for_movie=0.7,min_number_of_reviews=5
+
+A ranker is one of main.RANKINGS. The 'similarity' ranking also accepts the parameters of
+_WeightedVertex.overall_similarity_score and average_score_strict, as in the example above, and weight_for_genres
+defaults to 1 - weight_for_movie. Every 'similarity' ranker, with or without parameters, is scored with
+movie_arrays.similarity_scores, so that their times are comparable, rather than with the loop over the graph
+of main.recommend_movies; their rows of the report are labelled "(arrays)". Every ranking also
+accepts a diversity, such as pagerank:diversity=0.3, which re-ranks its top movies by genre diversity
+(see reranking.py), so that the cost of the re-ranking shows next to the time of the plain ranking.
+
+The profiles are evaluated in parallel by a pool of worker processes, which inherit the loaded graph
+as in batch.py. The report lists the quality of every ranker next to its mean, median and 95th percentile
+time per query, so that the trade-off between speed and quality is visible in one table.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from classes import WeightedGraph
+import critics
+import main
+from movie_arrays import MovieArrays, similarity_scores, top_rows
+import pagerank
+import reranking
+
+# The parameters that a 'similarity' ranker accepts, and their default values.
+SIMILARITY_PARAMETERS = {'weight_for_movie': 0.5, 'weight_for_genres': 0.5, 'min_number_of_reviews': 3}
+
+# The parameter that every ranker accepts: the diversity of main.recommend_movies.
+DIVERSITY_PARAMETER = 'diversity'
+
+# The full graph without the reviews of the held-out critics, and its MovieArrays, shared by the worker processes.
+# With the 'fork' start method, the workers inherit the data already loaded by the parent process.
+_DATA: Optional[tuple[WeightedGraph, MovieArrays]] = None
+
+
+def parse_ranker(spec: str) -> tuple[str, dict[str, float]]:
+    """Returns the (ranking, parameters) of the given ranker, such as 'pagerank' or
+    'similarity:weight_for_movie=0.7,min_number_of_reviews=5'. Every ranker accepts a diversity, but only
+    'similarity' rankers have other parameters, and the missing weight is 1 minus the given one.
+    The parameters of a 'similarity' ranker are always complete, with the defaults of SIMILARITY_PARAMETERS.
+
+    Raise a ValueError if the ranking is not in main.RANKINGS, or if a parameter is unknown or invalid.
+
+    >>> parse_ranker('pagerank')
+    ('pagerank', {})
+    >>> parse_ranker('similarity')
+    ('similarity', {'weight_for_movie': 0.5, 'weight_for_genres': 0.5, 'min_number_of_reviews': 3})
+    >>> parse_ranker('similarity:weight_for_movie=0.7,min_number_of_reviews=5')
+    ('similarity', {'weight_for_movie': 0.7, 'weight_for_genres': 0.30000000000000004, 'min_number_of_reviews': 5})
+    >>> parse_ranker('pagerank:diversity=0.3')
+    ('pagerank', {'diversity': 0.3})
+    >>> parse_ranker('pagerank:damping=0.5')
+    Traceback (most recent call last):
+    ...
+    ValueError: Only the 'similarity' ranking has parameters other than diversity: pagerank:damping=0.5
+    """
+    ranking, _, options = spec.partition(':')
+    if ranking not in main.RANKINGS:
+        raise ValueError(f"Unknown ranking: {ranking}")
+    if options == '':
+        return ranking, dict(SIMILARITY_PARAMETERS) if ranking == 'similarity' else {}
+
+    # read the name=value pairs
+    parameters = {}
+    for option in options.split(','):
+        name, _, value = option.partition('=')
+        if name != DIVERSITY_PARAMETER and ranking != 'similarity':
+            raise ValueError(f"Only the 'similarity' ranking has parameters other than diversity: {spec}")
+        if name not in SIMILARITY_PARAMETERS and name != DIVERSITY_PARAMETER:
+            raise ValueError(f"Unknown parameter: {name}")
+        try:
+            parameters[name] = int(value) if name == 'min_number_of_reviews' else float(value)
+        except ValueError:
+            raise ValueError(f"Invalid value of {name}: {value}") from None
+    if not 0 <= parameters.get(DIVERSITY_PARAMETER, 0) <= 1:
+        raise ValueError(f"Invalid value of {DIVERSITY_PARAMETER}: {parameters[DIVERSITY_PARAMETER]}")
+    if ranking != 'similarity':
+        return ranking, parameters
+
+    # complete the weights so that they sum to 1
+    if 'weight_for_genres' not in parameters:
+        parameters['weight_for_genres'] = 1 - parameters.get('weight_for_movie', 0.5)
+    if 'weight_for_movie' not in parameters:
+        parameters['weight_for_movie'] = 1 - parameters['weight_for_genres']
+    return ranking, {**SIMILARITY_PARAMETERS, **parameters}
+
+
+def ranking_metrics(recommended: list[str], relevant: set[str], k: int) -> tuple[float, float]:
+    """Returns the (hit rate, NDCG) of the first k recommended titles, where every title in relevant has gain 1.
+
+    Preconditions:
+        - k > 0
+        - relevant != set()
+
+    >>> ranking_metrics(['Up', 'Heat', 'Jaws'], {'Jaws', 'Alien'}, 3)
+    (1.0, 0.3065735963827292)
+    >>> ranking_metrics(['Up', 'Heat', 'Jaws'], {'Jaws'}, 2)
+    (0.0, 0.0)
+    """
+    gains = [1 / math.log2(rank + 2) for rank, title in enumerate(recommended[:k]) if title in relevant]
+    ideal = sum(1 / math.log2(rank + 2) for rank in range(min(k, len(relevant))))
+    return float(len(gains) > 0), sum(gains) / ideal
+
+
+def build_profiles(reviews_file: str, graph: WeightedGraph, dict_list: list[dict], num_profiles: int,
+                   like_threshold: float = 0.8, min_liked: int = 5, seed: int = 0) -> list[dict[str, Any]]:
+    """Returns num_profiles profiles (or fewer, if fewer critics qualify) of critics sampled from the review
+    dataset, among the critics who gave a score of at least like_threshold to at least min_liked + 1 movies.
+
+    Every profile is like the profiles of batch.py, with the critic's name, a favourite movie chosen at random
+    among the movies the critic liked (and whose genres are known), the genres of that movie, and the other
+    movies the critic liked as its "relevant" movies.
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - dict_list was returned by main.load_movie_columns, which added the movies to graph
+        - num_profiles >= 0
+        - min_liked > 0
+    """
+    # the movies liked by every critic, in file order
+    liked = {}
+    with main.open_dataset(reviews_file) as stream:
+        for chunk in pd.read_csv(stream, usecols=main.REVIEW_COLUMNS, dtype=str, na_filter=False, engine='c',
+                                 encoding="utf-8", chunksize=main.REVIEW_CHUNK_SIZE):
+            for title, score, critic, _, _, _ in main.review_records(chunk, dict_list):
+                if critic != '' and score >= like_threshold:
+                    liked.setdefault(critic, {})[title] = None
+
+    # sample the critics, and a favourite movie with known genres for each of them
+    eligible = sorted(critic for critic, titles in liked.items() if len(titles) > min_liked)
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for i in sorted(rng.choice(len(eligible), size=min(num_profiles, len(eligible)), replace=False).tolist()):
+        titles = list(liked[eligible[i]])
+        favourites = [title for title in titles if graph.get_vertex(title).genres is not None]
+        if favourites:
+            favourite = favourites[int(rng.integers(len(favourites)))]
+            profiles.append({'name': eligible[i], 'movie': favourite,
+                             'genres': sorted(graph.get_vertex(favourite).genres),
+                             'relevant': [title for title in titles if title != favourite]})
+
+    return profiles
+
+
+def load_held_out_data(reviews_file: str, movie_file: str, num_profiles: int, like_threshold: float = 0.8,
+                       min_liked: int = 5, seed: int = 0, with_critics: bool = False,
+                       with_dates: bool = False) -> tuple[WeightedGraph, list[dict[str, Any]]]:
+    """Returns the full graph of the given datasets without the reviews of the held-out critics, and the
+    profiles of these critics (see build_profiles). If with_critics is True, the other critics are loaded too,
+    and if with_dates is True, the review dates are kept (see main.load_review_columns).
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - movie_file is a path to a valid CSV file with movie data.
+        - num_profiles >= 0
+        - min_liked > 0
+    """
+    graph = WeightedGraph()
+    dict_list, _ = main.load_movie_columns(movie_file, graph)
+    profiles = build_profiles(reviews_file, graph, dict_list, num_profiles, like_threshold, min_liked, seed)
+
+    # read the reviews again, leaving out the held-out critics
+    held_out = {profile['name'] for profile in profiles}
+    columns = main.REVIEW_COLUMNS + ([main.DATE_COLUMN] if with_dates else [])
+    with main.open_dataset(reviews_file) as stream:
+        chunks = pd.read_csv(stream, usecols=columns, dtype=str, na_filter=False, engine='c', encoding="utf-8",
+                             chunksize=main.REVIEW_CHUNK_SIZE)
+        main.add_review_chunks(_without_critics(chunks, held_out), [graph], dict_list, with_critics, with_dates)
+
+    return graph, profiles
+
+
+def _without_critics(chunks: Iterator[pd.DataFrame], held_out: set[str]) -> Iterator[pd.DataFrame]:
+    """Yields the given chunks of the review dataset without the reviews of the critics in held_out."""
+    for chunk in chunks:
+        yield chunk[~chunk['criticName'].isin(held_out)]
+
+
+def recommend_titles(graph: WeightedGraph, arrays: MovieArrays, ranking: str, parameters: dict[str, float],
+                     k: int) -> list[str]:
+    """Returns the titles of the top k movies recommended for the preferences of graph by the given ranker
+    (see parse_ranker): movie_arrays.similarity_scores (re-ranked by reranking.mmr_rows, if the ranker has a
+    diversity) for every 'similarity' ranker, and main.recommend_movies otherwise.
+
+    Preconditions:
+        - k > 0
+        - graph.preferred_movie in arrays.index
+    """
+    diversity = parameters.get(DIVERSITY_PARAMETER, 0.0)
+    if ranking != 'similarity':
+        return [movie.item for movie, _ in main.recommend_movies(graph, k, ranking, diversity=diversity)]
+
+    row = arrays.index[graph.preferred_movie]
+    scores = similarity_scores(arrays, row, arrays.genre_mask(graph.preferred_genres),
+                               parameters['min_number_of_reviews'], weight_for_movie=parameters['weight_for_movie'],
+                               weight_for_genres=parameters['weight_for_genres'])
+    if diversity == 0:
+        return [arrays.titles[other] for other in top_rows(scores, k)]
+
+    # re-rank the top movies, whose genre bitmasks are already in the arrays
+    rows = np.array(top_rows(scores, max(k, reranking.MMR_CANDIDATES)), dtype=np.intp)
+    return [arrays.titles[rows[i]] for i in reranking.mmr_rows(scores[rows], arrays.genre_masks[rows], k, diversity)]
+
+
+def evaluate_profile(profile: dict[str, Any], rankers: list[str], k: int) -> dict[str, Any]:
+    """Returns the (hit rate, NDCG, seconds) of every ranker for the given profile, as a dict mapping
+    every ranker to a dict of 'hit_rate', 'ndcg' and 'seconds'.
+
+    The worker's full graph is re-centred on the profile's favourite movie, which is not timed;
+    the seconds are the time the ranker takes to recommend k movies.
+
+    Preconditions:
+        - _DATA is not None
+        - every ranker is valid (see parse_ranker)
+        - k > 0
+    """
+    graph, arrays = _DATA
+    graph.set_user_preferences(profile['movie'], set(profile['genres']))
+    relevant = set(profile['relevant'])
+
+    results = {}
+    for ranker in rankers:
+        ranking, parameters = parse_ranker(ranker)
+        start = time.perf_counter()
+        recommended = recommend_titles(graph, arrays, ranking, parameters, k)
+        seconds = time.perf_counter() - start
+        hit_rate, ndcg = ranking_metrics(recommended, relevant, k)
+        results[ranker] = {'hit_rate': hit_rate, 'ndcg': ndcg, 'seconds': seconds}
+
+    return {'name': profile['name'], 'movie': profile['movie'], 'results': results}
+
+
+def _init_worker(reviews_file: str, movie_file: str, settings: dict[str, Any]) -> None:
+    """Makes the held-out graph available to a worker process.
+
+    Workers started with 'fork' already have the data, so they only load it when another start method is used.
+    settings holds the keyword arguments that the parent process gave load_held_out_data.
+    """
+    global _DATA
+    if _DATA is None:
+        graph, _ = load_held_out_data(reviews_file, movie_file, **settings)
+        _DATA = (graph, MovieArrays(graph))
+
+
+def run_evaluation(reviews_file: str, movie_file: str, rankers: list[str], num_profiles: int = 200, k: int = 10,
+                   max_workers: int = 4, like_threshold: float = 0.8, min_liked: int = 5,
+                   seed: int = 0) -> dict[str, Any]:
+    """Returns the evaluation report of the given rankers on num_profiles held-out critics, using at most
+    max_workers processes at a time.
+
+    The report maps 'rankers' to the mean hit rate and NDCG of every ranker and the mean, median and 95th
+    percentile of its time per query in milliseconds, and 'profiles' to the results of every profile.
+
+    Raise a ValueError if a ranker is not valid (see parse_ranker).
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - movie_file is a path to a valid CSV file with movie data.
+        - num_profiles > 0
+        - k > 0
+        - max_workers > 0
+    """
+    global _DATA
+    rankings = [parse_ranker(ranker)[0] for ranker in rankers]
+    start = time.perf_counter()
+
+    # load the data once, before the worker processes are started
+    # the critics and review dates are only loaded if a ranker needs them
+    settings = {'num_profiles': num_profiles, 'like_threshold': like_threshold, 'min_liked': min_liked,
+                'seed': seed, 'with_critics': 'critics' in rankings, 'with_dates': 'recent' in rankings}
+    graph, profiles = load_held_out_data(reviews_file, movie_file, **settings)
+    _DATA = (graph, MovieArrays(graph))
+
+    # build the PageRank transitions and the critic votes once, so that the workers inherit them
+    if 'pagerank' in rankings:
+        pagerank.get_ranker(graph)
+    if 'critics' in rankings:
+        critics.get_scorer(graph)
+    report = {'reviews_file': reviews_file, 'movie_file': movie_file, 'k': k, 'workers': max_workers,
+              'load_seconds': time.perf_counter() - start, 'rankers': {}, 'profiles': []}
+
+    # prefer 'fork' so that the workers share the loaded data instead of loading it again
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                             initargs=(reviews_file, movie_file, settings)) as executor:
+        report['profiles'] = list(executor.map(evaluate_profile, profiles, [rankers] * len(profiles),
+                                               [k] * len(profiles)))
+
+    # summarize every ranker over the profiles
+    for ranker in rankers:
+        results = [profile['results'][ranker] for profile in report['profiles']]
+        milliseconds = np.array([result['seconds'] * 1000 for result in results])
+        report['rankers'][ranker] = {
+            'hit_rate': float(np.mean([result['hit_rate'] for result in results])) if results else 0.0,
+            'ndcg': float(np.mean([result['ndcg'] for result in results])) if results else 0.0,
+            'mean_ms': float(milliseconds.mean()) if results else 0.0,
+            'p50_ms': float(np.percentile(milliseconds, 50)) if results else 0.0,
+            'p95_ms': float(np.percentile(milliseconds, 95)) if results else 0.0
+        }
+
+    report['total_seconds'] = time.perf_counter() - start
+    return report
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Returns the summary of the given evaluation report as a table with one row per ranker.
+
+    The 'similarity' rankers are labelled "(arrays)", since they are timed with movie_arrays.similarity_scores
+    rather than with main.recommend_movies (see recommend_titles).
+
+    >>> summary = {'hit_rate': 0.5, 'ndcg': 0.25, 'mean_ms': 1.5, 'p50_ms': 1.25, 'p95_ms': 3.0}
+    >>> print(format_report({'k': 10, 'profiles': [{}], 'rankers': {'pagerank': summary, 'similarity': summary}}))
+    ranker               hit@10  ndcg@10  mean ms  p50 ms  p95 ms
+    pagerank             0.5000   0.2500    1.500   1.250   3.000
+    similarity (arrays)  0.5000   0.2500    1.500   1.250   3.000
+    (1 profiles)
+    """
+    k = report['k']
+    labels = {ranker: f"{ranker} (arrays)" if ranker.partition(':')[0] == 'similarity' else ranker
+              for ranker in report['rankers']}
+    width = max([len('ranker')] + [len(label) for label in labels.values()])
+    header = f"{'ranker':<{width}}  {f'hit@{k}':>6}  {f'ndcg@{k}':>7}  {'mean ms':>7}  {'p50 ms':>6}  {'p95 ms':>6}"
+    lines = [header]
+    for ranker, summary in report['rankers'].items():
+        lines.append(f"{labels[ranker]:<{width}}  {summary['hit_rate']:>6.4f}  {summary['ndcg']:>7.4f}  "
+                     f"{summary['mean_ms']:>7.3f}  {summary['p50_ms']:>6.3f}  {summary['p95_ms']:>6.3f}")
+    lines.append(f"({len(report['profiles'])} profiles)")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the rankings on held-out critics.")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--rankers', nargs='+', default=['similarity', 'pagerank'],
+                        help="rankings of main.RANKINGS, or similarity:name=value,... with other parameters")
+    parser.add_argument('--profiles', type=int, default=200, help="number of held-out critics")
+    parser.add_argument('--k', type=int, default=10, help="number of recommendations scored per profile")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--like-threshold', type=float, default=0.8, help="lowest score of a liked movie")
+    parser.add_argument('--min-liked', type=int, default=5, help="fewest relevant movies of a profile")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='', help="JSON file that the full report is written to")
+    args = parser.parse_args()
+
+    evaluation = run_evaluation(args.reviews, args.movies, args.rankers, args.profiles, args.k, args.workers,
+                                args.like_threshold, args.min_liked, args.seed)
+    print(format_report(evaluation))
+    if args.output != '':
+        with open(args.output, 'w', encoding="utf-8") as file:
+            json.dump(evaluation, file, indent=2)
@@ -0,0 +1,278 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the export of the scores of every movie for one favourite movie and set of genres, for
+systems that need the whole catalogue rather than the top recommendations printed by main.print_recommended_movies.
+
+Every movie that the 'similarity' ranking of main.recommend_movies considers gets one row, with its title, its
+score under that ranking, its overall similarity score to the favourite movie, its average review score and its
+number of reviews. The rows are computed from the columns of a MovieArrays in batches of a fixed number of movies,
+and every batch is written before the next one is computed, so only one batch of rows is in memory at a time.
+The rows are written as NDJSON (one JSON object per line) or CSV, depending on the extension of the output file,
+and compressed with gzip if the output file ends with .gz.
+
+The rows are written in row order, or sorted by score with an external merge sort: every batch is sorted and
+written to a temporary run file, and the runs are then merged (MAX_MERGE_RUNS at a time), reading one row per run.
+
+Usage:
+    python exports.py Inception scores.ndjson.gz --genres Action Sci-fi --sort
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import os
+import tempfile
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+import numpy as np
+
+from classes import WeightedGraph
+import batch
+import main
+from movie_arrays import MovieArrays, overall_similarities, strict_averages, unranked_rows
+
+# The fields of every exported row, in the order of the CSV columns.
+EXPORT_FIELDS = ('title', 'score', 'similarity', 'average_score', 'num_reviews')
+
+# The number of movies scored and written at a time.
+EXPORT_BATCH_SIZE = 10000
+
+# The number of sorted runs merged at a time by sorted_batches.
+MAX_MERGE_RUNS = 64
+
+
+class _BatchArrays:
+    """The columns of a MovieArrays for one batch of rows, followed by the row of the favourite movie, so that the
+    functions of movie_arrays can score one batch at a time.
+
+    Instance Attributes:
+        - genre_masks, known_genres, review_counts, review_totals: The columns of the MovieArrays for the rows
+          start to end - 1, followed by the favourite movie.
+        - favourite: The row of the favourite movie in these columns.
+    """
+    genre_masks: np.ndarray
+    known_genres: np.ndarray
+    review_counts: np.ndarray
+    review_totals: np.ndarray
+    favourite: int
+
+    def __init__(self, arrays: MovieArrays, row: int, start: int, end: int) -> None:
+        """Initialize the columns of the rows start to end - 1 of arrays, followed by the given row.
+
+        Preconditions:
+            - 0 <= start < end <= len(arrays.titles)
+            - 0 <= row < len(arrays.titles)
+        """
+        self.genre_masks, self.known_genres, self.review_counts, self.review_totals = (
+            np.append(column[start:end], column[row]) for column in
+            (arrays.genre_masks, arrays.known_genres, arrays.review_counts, arrays.review_totals))
+        self.favourite = end - start
+
+
+def score_batches(arrays: MovieArrays, row: int, genres_mask: int, batch_size: int = EXPORT_BATCH_SIZE,
+                  min_number_of_reviews: int = 3, weight_for_movie: float = 0.5,
+                  weight_for_genres: float = 0.5) -> Iterator[list[dict[str, Any]]]:
+    """Yields the rows (see EXPORT_FIELDS) of the movies ranked by the 'similarity' ranking for the favourite movie
+    in the given row and the preferred genres in genres_mask, in row order and in non-empty batches of at most
+    batch_size rows.
+
+    Every batch is scored by the functions of movie_arrays.similarity_scores (with min_number_of_reviews and the
+    weights of overall_similarity_score), and the movies that the ranking does not consider
+    (see movie_arrays.unranked_rows) get no row.
+
+    Preconditions:
+        - 0 <= row < len(arrays.titles)
+        - batch_size > 0
+        - min_number_of_reviews > 0
+        - 0 <= weight_for_movie <= 1
+        - 0 <= weight_for_genres <= 1
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Alien", "Movie", {"Sci-fi"})
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex("Up", "Movie", {"Animation"})
+    >>> for score in [0.6, 0.7, 0.8]:
+    ...     g.add_vertex(score, "Review")
+    ...     g.add_edge("Aliens", score)
+    >>> arrays = MovieArrays(g)
+    >>> [[row['title'] for row in rows] for rows in score_batches(arrays, 0, arrays.genre_mask({"Action"}), 1)]
+    [['Aliens'], ['Up']]
+    >>> next(score_batches(arrays, 0, arrays.genre_mask({"Action"})))[0]['num_reviews']
+    3
+    >>> rows = next(score_batches(arrays, 0, arrays.genre_mask({"Action"}), weight_for_movie=0, weight_for_genres=1))
+    >>> [(row['title'], row['similarity']) for row in rows]
+    [('Aliens', 0.5), ('Up', 0.0)]
+    """
+    # leave out the favourite movie and the movies whose genres are unknown
+    unranked = unranked_rows(arrays, row)
+    for start in range(0, len(arrays.titles), batch_size):
+        end = min(start + batch_size, len(arrays.titles))
+        columns = _BatchArrays(arrays, row, start, end)
+
+        rows = np.flatnonzero(~unranked[start:end])
+        if len(rows) == 0:
+            continue
+
+        similarity = overall_similarities(columns, columns.favourite, genres_mask, weight_for_movie,
+                                          weight_for_genres)[rows]
+        scores = strict_averages(columns, min_number_of_reviews)[rows] * similarity
+        yield [dict(zip(EXPORT_FIELDS, values)) for values in zip(
+            arrays.titles[start:end][rows].tolist(), scores.tolist(), similarity.tolist(),
+            strict_averages(columns, 1)[rows].tolist(), columns.review_counts[rows].tolist())]
+
+
+def sorted_batches(batches: Iterable[list[dict[str, Any]]], batch_size: int = EXPORT_BATCH_SIZE,
+                   directory: Optional[str] = None) -> Iterator[list[dict[str, Any]]]:
+    """Yields the rows of batches sorted by score from highest to lowest, in batches of at most batch_size rows.
+    Equal scores keep their order in batches.
+
+    Every batch is sorted and written to a temporary run file in directory (or the default temporary directory),
+    and the runs are merged reading one row of each at a time, so only one batch is in memory at a time.
+
+    Preconditions:
+        - batch_size > 0
+
+    >>> rows = [{'title': 'Up', 'score': 0.5}, {'title': 'Heat', 'score': 0.9}, {'title': 'Jaws', 'score': 0.5}]
+    >>> [[row['title'] for row in batch] for batch in sorted_batches([rows[:2], rows[2:]], 2)]
+    [['Heat', 'Up'], ['Jaws']]
+    """
+    with tempfile.TemporaryDirectory(dir=directory) as run_directory:
+        runs = []
+        for rows in batches:
+            runs.append(os.path.join(run_directory, f"run{len(runs)}.ndjson"))
+            with open(runs[-1], 'w', encoding="utf-8") as file:
+                _write_ndjson(file, sorted(rows, key=lambda r: -r['score']))
+
+        # merge the runs in groups until one merge can read all of them
+        while len(runs) > MAX_MERGE_RUNS:
+            merged = []
+            for i in range(0, len(runs), MAX_MERGE_RUNS):
+                merged.append(os.path.join(run_directory, f"run{len(runs) + len(merged)}.ndjson"))
+                with open(merged[-1], 'w', encoding="utf-8") as file, _merged_runs(runs[i:i + MAX_MERGE_RUNS]) as rows:
+                    for chunk in _chunks(rows, batch_size):
+                        _write_ndjson(file, chunk)
+                for run in runs[i:i + MAX_MERGE_RUNS]:
+                    os.remove(run)
+            runs = merged
+
+        with _merged_runs(runs) as rows:
+            yield from _chunks(rows, batch_size)
+
+
+@contextlib.contextmanager
+def _merged_runs(runs: list[str]) -> Iterator[Iterator[dict[str, Any]]]:
+    """Opens the given sorted run files, and returns the iterator of their rows merged by score (from highest to
+    lowest, with equal scores in the order of the runs).
+    """
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(open(run, 'r', encoding="utf-8")) for run in runs]
+        yield heapq.merge(*((json.loads(line) for line in file) for file in files), key=lambda r: -r['score'])
+
+
+def _chunks(rows: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    """Yields the given rows in lists of at most size rows."""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _write_ndjson(file: TextIO, rows: Iterable[dict[str, Any]]) -> None:
+    """Write the given rows to file, one JSON object per line."""
+    file.writelines(json.dumps(row) + '\n' for row in rows)
+
+
+def write_rows(batches: Iterable[list[dict[str, Any]]], output_file: str) -> int:
+    """Write the rows of batches to output_file, one batch at a time, and return the number of rows written.
+
+    The rows are written as CSV (with a header of EXPORT_FIELDS) if output_file ends with .csv or .csv.gz, or as
+    NDJSON if it ends with .ndjson, .jsonl, .ndjson.gz or .jsonl.gz, and compressed with gzip if it ends with .gz.
+    Raise a ValueError if output_file has any other extension.
+    """
+    name = output_file[:-len('.gz')] if output_file.endswith('.gz') else output_file
+    if not name.endswith(('.csv', '.ndjson', '.jsonl')):
+        raise ValueError(f"Unknown export format: {output_file}")
+
+    count = 0
+    opener = gzip.open if output_file.endswith('.gz') else open
+    with opener(output_file, 'wt', encoding="utf-8", newline='') as file:
+        writer = csv.DictWriter(file, EXPORT_FIELDS) if name.endswith('.csv') else None
+        if writer is not None:
+            writer.writeheader()
+        for rows in batches:
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                _write_ndjson(file, rows)
+            count += len(rows)
+    return count
+
+
+def export_scores(arrays: MovieArrays, row: int, genres_mask: int, output_file: str, sort: bool = False,
+                  batch_size: int = EXPORT_BATCH_SIZE, min_number_of_reviews: int = 3, weight_for_movie: float = 0.5,
+                  weight_for_genres: float = 0.5) -> int:
+    """Write the rows of score_batches to output_file (see write_rows), sorted by score if sort is True,
+    and return the number of rows written.
+
+    Preconditions:
+        - 0 <= row < len(arrays.titles)
+        - batch_size > 0
+        - min_number_of_reviews > 0
+        - 0 <= weight_for_movie <= 1
+        - 0 <= weight_for_genres <= 1
+    """
+    batches = score_batches(arrays, row, genres_mask, batch_size, min_number_of_reviews, weight_for_movie,
+                            weight_for_genres)
+    if sort:
+        batches = sorted_batches(batches, batch_size, os.path.dirname(os.path.abspath(output_file)))
+    return write_rows(batches, output_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the scores of every movie for one favourite movie.")
+    parser.add_argument('movie', help="title of the favourite movie")
+    parser.add_argument('output', help="output file (.ndjson, .jsonl or .csv, optionally followed by .gz)")
+    parser.add_argument('--genres', nargs='*', default=[], help="favourite genres")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--sort', action='store_true', help="sort the rows by score, from highest to lowest")
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument('--min-reviews', type=int, default=3, help="minimum number of reviews of the score")
+    parser.add_argument('--weight-for-movie', type=float, default=0.5, help="weight of the movie similarity")
+    parser.add_argument('--weight-for-genres', type=float, default=0.5, help="weight of the genre similarity")
+    args = parser.parse_args()
+
+    full_graph = WeightedGraph()
+    movie_dicts, _ = main.load_movie_columns(args.movies, full_graph)
+    try:
+        _, title = batch.find_favourite_movie(movie_dicts, {'movie': args.movie})
+    except ValueError as error:
+        parser.error(str(error))
+    main.load_review_columns(args.reviews, [full_graph], movie_dicts)
+    movie_arrays = MovieArrays(full_graph)
+
+    try:
+        num_rows = export_scores(movie_arrays, movie_arrays.index[title],
+                                 movie_arrays.genre_mask(batch.find_favourite_genres({'genres': args.genres})),
+                                 args.output, args.sort, args.batch_size, args.min_reviews, args.weight_for_movie,
+                                 args.weight_for_genres)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Exported {num_rows} movies to {args.output}")
@@ -0,0 +1,195 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the GraphVersions class, which lets queries read the full graph while new reviews are
+being ingested, without ever seeing a half-ingested chunk of reviews.
+
+The full graph is kept as two copies, each with its own ReviewLog of the same review file. Queries only read
+the published copy. An ingestion tails the new reviews into the other copy (the standby copy), then publishes
+it by swapping which copy is published, which is a single assignment. Once the queries that were still
+reading the previously published copy are done, the same reviews are ingested into it, so that it becomes an
+identical standby copy for the next ingestion. A query therefore never waits for an ingestion, at the cost of
+keeping the graph in memory twice.
+
+Queries that re-centre the published copy on their favourite movie (see WeightedGraph.set_user_preferences)
+change it, so they must not overlap; the server runs them one at a time on its scoring thread. Queries that
+only read the published copy, such as the server's 'similarity' recommendations computed from the movie arrays
+of the copy, may run at the same time on several threads. The server ingests on yet another thread.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import contextlib
+import threading
+from typing import Any, Callable, Iterator, Optional
+
+from classes import WeightedGraph
+from review_log import ReviewLog
+
+
+class GraphVersions:
+    """Two copies of the full graph of a review log: the published copy, which queries read, and the standby
+    copy, which new reviews are ingested into before it is published.
+
+    Instance Attributes:
+        - version: The number of ingestions published so far.
+
+    Representation Invariants:
+        - self.version >= 0
+    """
+    # Private Instance Attributes:
+    #     - _logs:
+    #         The review logs of the two copies of the graph.
+    #     - _published:
+    #         The index in _logs of the published copy.
+    #     - _readers:
+    #         The number of queries currently reading each copy.
+    #     - _condition:
+    #         Guards _published and _readers, and wakes up an ingestion waiting for the queries of a copy to finish.
+    #     - _write_lock:
+    #         Held by the ingestion in progress, so that ingestions never overlap.
+    version: int
+    _logs: tuple[ReviewLog, ReviewLog]
+    _published: int
+    _readers: list[int]
+    _condition: threading.Condition
+    _write_lock: threading.Lock
+
+    def __init__(self, published: ReviewLog, standby: ReviewLog) -> None:
+        """Initialize the versions of the graph of published, where standby is a log of the same review file
+        holding an identical copy of the graph (for example, resumed from a checkpoint of published).
+
+        Preconditions:
+            - published.reviews_file == standby.reviews_file
+            - published.offset == standby.offset
+            - published.graph is not standby.graph
+        """
+        self.version = 0
+        self._logs = (published, standby)
+        self._published = 0
+        self._readers = [0, 0]
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def from_checkpoint(log: ReviewLog, checkpoint_file: str) -> GraphVersions:
+        """Returns the versions of the graph of log, whose standby copy is resumed from checkpoint_file
+        and brought up to the offset of log.
+
+        Preconditions:
+            - checkpoint_file was saved by log, and log has not ingested any review since
+        """
+        standby = ReviewLog.resume(checkpoint_file, log.movie_file)
+        standby.tail(end=log.offset)
+        return GraphVersions(log, standby)
+
+    @property
+    def log(self) -> ReviewLog:
+        """The review log of the published copy, which must only be read."""
+        return self._logs[self._published]
+
+    def graphs(self) -> tuple[WeightedGraph, WeightedGraph]:
+        """Returns both copies of the graph, for example to attach the same factorization to both.
+        They must not be used while queries or ingestions are running.
+        """
+        return self._logs[0].graph, self._logs[1].graph
+
+    @contextlib.contextmanager
+    def read(self) -> Iterator[WeightedGraph]:
+        """Returns a context manager that gives the published copy of the graph, which no ingestion changes
+        until the context is exited, even if a newer copy is published in the meantime.
+        """
+        with self._condition:
+            index = self._published
+            self._readers[index] += 1
+        try:
+            yield self._logs[index].graph
+        finally:
+            with self._condition:
+                self._readers[index] -= 1
+                self._condition.notify_all()
+
+    def ingest(self, checkpoint_file: str = '',
+               prepare: Optional[Callable[[WeightedGraph], Any]] = None) -> set[str]:
+        """Ingests the reviews appended to the review file into the standby copy, publishes it, and returns the
+        titles of the movies whose reviews changed.
+
+        prepare, if given, is called on the standby copy just before it is published, for example to build
+        the caches that queries would otherwise build on the published copy. Once the queries reading the
+        previously published copy are done, it ingests the same reviews and becomes the standby copy, and
+        it is saved to checkpoint_file, if given. The calling thread must not be inside read, or it would wait
+        for itself forever.
+
+        >>> import os
+        >>> import shutil
+        >>> import tempfile
+        >>> directory = tempfile.mkdtemp()
+        >>> movie_file, reviews_file = os.path.join(directory, 'movies.csv'), os.path.join(directory, 'reviews.csv')
+        >>> with open(movie_file, 'w', encoding="utf-8") as file:
+        ...     _ = file.write('id,title,genre\\nm1,Up,Comedy\\nm2,Heat,Crime\\n')
+        >>> with open(reviews_file, 'w', encoding="utf-8") as file:
+        ...     _ = file.write('id,originalScore\\nm1,3/4\\n')
+        >>> versions = GraphVersions(ReviewLog.load(reviews_file, movie_file), ReviewLog.load(reviews_file, movie_file))
+        >>> with open(reviews_file, 'a', encoding="utf-8") as file:
+        ...     _ = file.write('m2,1/2\\nm2,1/4\\nm1,1/4\\n')
+        >>> sorted(versions.ingest())
+        ['Heat', 'Up']
+        >>> with versions.read() as graph:
+        ...     graph is versions.graphs()[1]
+        True
+        >>> [sorted((v.item, v.get_number_of_reviews(), v.average_score()) for v in graph.get_vertices('Movie'))
+        ...  for graph in versions.graphs()]
+        [[('Heat', 2, 0.375), ('Up', 2, 0.5)], [('Heat', 2, 0.375), ('Up', 2, 0.5)]]
+        >>> versions.version
+        1
+        >>> shutil.rmtree(directory)
+        """
+        with self._write_lock:
+            standby = self._logs[1 - self._published]
+            changed = standby.tail()
+            if prepare is not None:
+                prepare(standby.graph)
+
+            # publish the standby copy, then wait until no query reads the previous copy anymore
+            with self._condition:
+                previous = self._logs[self._published]
+                self._published = 1 - self._published
+                self.version += 1
+                self._condition.wait_for(lambda: self._readers[1 - self._published] == 0)
+
+            # bring the previous copy up to date, then save it, since no query reads it
+            previous.tail(end=standby.offset)
+            if checkpoint_file != '':
+                previous.save_checkpoint(checkpoint_file)
+
+        return changed
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["contextlib", "threading", "typing", "classes", "review_log"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -5,7 +5,8 @@ Module Description
 
 This module contains the main methods needed for our project.
 All functions here are original and therefore have proper documentation.
-Due to the complexity of the code in this file, no doctests are given.
+Most functions here load the full datasets or interact with the user, so doctests are only given for the
+functions that can be checked on small inputs, such as open_dataset and parse_dates.
 
 Copyright and Usage Information
 ===============================
@@ -19,45 +20,77 @@ This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
 """
 from __future__ import annotations
 
+import contextlib
 import csv
+import gzip
 import io
-import tkinter as tk
-from tkinter import simpledialog
+import itertools
+import os
+import zipfile
+from typing import TYPE_CHECKING, BinaryIO, Collection, Iterable, Iterator, Optional
 
-from classes import WeightedGraph
-import visualization1
-import visualization2
+import numpy as np
+
+from classes import WeightedGraph, _WeightedVertex, genre_similarity
+import critics
+import multi_seed
+import pagerank
+import reranking
+from review_history import ReviewHistory, attach_history, get_history
+
+# tkinter and the visualization modules (which import plotly and networkx) are slow to import, so they are only
+# imported by the interactive functions that use them, and pandas only by the column loaders
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The available rankings of recommend_movies, and the one used when the user asks for printed recommendations.
+# Personalized PageRank is fast enough on the full catalogue to be used interactively.
+RANKINGS = ('similarity', 'pagerank', 'critics', 'recent', 'median')
+INTERACTIVE_RANKING = 'pagerank'
+
+# The only columns of the movie and review datasets read by load_movie_columns and load_review_columns.
+# The review dataset is mostly review text and URLs, which are never parsed.
+MOVIE_COLUMNS = ['id', 'title', 'genre']
+REVIEW_COLUMNS = ['id', 'criticName', 'isTopCritic', 'originalScore', 'publicationName']
+
+# The column of the review dataset holding the date of each review, only read when the dates are kept.
+DATE_COLUMN = 'creationDate'
+
+# The number of reviews parsed at a time by load_review_columns, which bounds the memory used by the parser.
+REVIEW_CHUNK_SIZE = 200000
+
+# The size of the reads from (compressed) dataset files, large enough for decompression to keep up with parsing.
+READ_BUFFER_SIZE = 1 << 20
 
 
 def build_with_new_vertex_fraction(graph: list[WeightedGraph], test: list[str],
-                                   dict_list: list[dict[str, str]], movie: str, fav_genres: list[str]) -> None:
-    """Integrates review scores and genre similarities into the movie review graph.
+                                   dict_list: list[dict[str, str]], movie: str) -> None:
+    """Integrates review scores into the movie review graph.
 
-    This function adds review vertices and edges between movies and reviews based on the score and genre similarity.
+    This function adds review vertices and edges between movies and reviews based on the score,
+    and only reviews that match certain criteria are incorporated into the graph.
 
-    The weight of edges reflects the similarity in genre preferences, and only reviews
-    that match certain criteria are incorporated into the graph.
+    The genre similarity of a movie to the user's preferred genres is not stored on these edges: it is
+    computed from the genres of the movie vertex when needed, so that the preferred genres can change
+    without reloading the reviews. Every score is also added to the score sketch of the movie.
 
     Preconditions:
         - len(test) in {1, 2} and elements convertible to float
         - dict_list where dict_list[0]: {movie_id: set[genres]}, dict_list[1]: {movie_id: movie_title}
         - movie must be a key in dict_list[1]
     """
-    # process the review score(s) and calculate the genre weight based on user's favorite genres and movie's genres
+    # process the review score(s)
     if len(test) == 2 and dict_list[1].get(movie) and movie in dict_list[0]:
         try:
 
-            # calculate the genre weight as the ratio of the intersection to the union of favorite and movie genres
-            weight = (len(set(fav_genres).intersection(dict_list[0][movie]))
-                      / len(set(fav_genres).union(dict_list[0][movie])))
-
             # calculate the review score as the ratio of the first score to the second, capped at 1.0
-            score = min(list(map(float, test))[0] / list(map(float, test))[1], 1.0)
+            score = parse_review_score(test)
 
-            # add vertices for the review and movie (if not already present) and connect them with the calculated weight
+            # add vertices for the review and movie (if not already present) and connect them
             graph[0].add_vertex(score, "Review")
-            graph[0].add_vertex(dict_list[1].get(movie), "Movie")
-            graph[0].add_edge(dict_list[1].get(movie), score, weight)
+            graph[0].add_vertex(dict_list[1].get(movie), "Movie", dict_list[0][movie])
+            graph[0].add_edge(dict_list[1].get(movie), score)
+            graph[0].add_review_scores(dict_list[1].get(movie), [score])
         except (ValueError, ZeroDivisionError):
 
             # ignore errors such as division by zero or conversion issues, proceeding without adding these reviews
@@ -65,16 +98,13 @@ def build_with_new_vertex_fraction(graph: list[WeightedGraph], test: list[str],
     elif len(test) == 1 and dict_list[1].get(movie):
         try:
 
-            # for a single score, calculate the weight similarly but without dividing scores
-            weight = (len(set(fav_genres).intersection(dict_list[0][movie]))
-                      / len(set(fav_genres).union(dict_list[0][movie])))
-
             # convert the single score to a float and cap it at 1.0
-            score = min(float(test[0]), 1.0)
+            score = parse_review_score(test)
 
-            # add a vertex for the review and connect it to the movie with the calculated weight
+            # add a vertex for the review and connect it to the movie
             graph[0].add_vertex(score, "Review")
-            graph[0].add_edge(dict_list[1].get(movie), score, weight)
+            graph[0].add_edge(dict_list[1].get(movie), score)
+            graph[0].add_review_scores(dict_list[1].get(movie), [score])
         except ValueError:
 
             # ignore conversion issues for the review score
@@ -82,6 +112,118 @@ def build_with_new_vertex_fraction(graph: list[WeightedGraph], test: list[str],
     return
 
 
+def parse_review_score(test: list[str]) -> float:
+    """Returns the review score represented by test, the original score split on "/", capped at 1.0.
+
+    A score of the form "a/b" is a / b, and a single number is taken as is.
+    Raise a ValueError if the parts are not numbers, and a ZeroDivisionError if b is zero.
+
+    Preconditions:
+        - len(test) in {1, 2}
+    """
+    if len(test) == 2:
+        return min(float(test[0]) / float(test[1]), 1.0)
+    else:
+        return min(float(test[0]), 1.0)
+
+
+def add_critic_review(graph: WeightedGraph, test: list[str], dict_list: list[dict[str, str]], movie: str,
+                      critic: str, publication: str, top_critic: bool) -> None:
+    """Adds the review score a critic gave to a movie to the graph, as an edge between the critic and the movie.
+
+    Reviews without a critic name or with a score that cannot be parsed are ignored.
+
+    Preconditions:
+        - dict_list where dict_list[0]: {movie_id: set[genres]}, dict_list[1]: {movie_id: movie_title}
+        - the movies of dict_list[1] are vertices of graph
+    """
+    if critic != '' and len(test) in {1, 2} and dict_list[1].get(movie):
+        try:
+            graph.add_critic_review(critic, dict_list[1][movie], parse_review_score(test), publication, top_critic)
+        except (ValueError, ZeroDivisionError):
+
+            # ignore unparsable scores, and critics whose name is already used by a movie or review
+            pass
+
+
+@contextlib.contextmanager
+def open_dataset(path: str) -> Iterator[BinaryIO]:
+    """Opens the given CSV dataset as a buffered binary stream, decompressing it on the fly if needed.
+
+    The path may be:
+        - a .csv file
+        - a .gz file containing a CSV file
+        - a .zip file containing exactly one CSV file
+        - a CSV file inside a .zip file, such as "archive.zip/rotten_tomatoes_movies.csv"
+
+    The data is read in blocks of READ_BUFFER_SIZE bytes and is never extracted to disk.
+    Raise a ValueError if a .zip file does not contain exactly one CSV file, and a FileNotFoundError
+    if the file does not exist.
+
+    >>> import shutil
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> with gzip.open(os.path.join(directory, 'movies.csv.gz'), 'wb') as file:
+    ...     _ = file.write(b'title\\nUp\\n')
+    >>> with open_dataset(os.path.join(directory, 'movies.csv.gz')) as stream:
+    ...     stream.read()
+    b'title\\nUp\\n'
+    >>> with zipfile.ZipFile(os.path.join(directory, 'archive.zip'), 'w') as zip_file:
+    ...     zip_file.writestr('movies.csv', 'title\\nHeat\\n')
+    ...     zip_file.writestr('reviews.csv', 'score\\n0.5\\n')
+    >>> with open_dataset(os.path.join(directory, 'archive.zip', 'movies.csv')) as stream:
+    ...     stream.read()
+    b'title\\nHeat\\n'
+    >>> with open_dataset(os.path.join(directory, 'archive.zip')) as stream:  # doctest: +ELLIPSIS
+    ...     stream.read()
+    Traceback (most recent call last):
+    ...
+    ValueError: ...archive.zip contains 2 CSV files; choose one, as in ...file.csv
+    >>> shutil.rmtree(directory)
+    """
+    archive, member = _split_zip_path(path)
+    if archive != '':
+        with zipfile.ZipFile(archive) as zip_file:
+            if member == '':
+                members = [name for name in zip_file.namelist() if name.lower().endswith('.csv')]
+                if len(members) != 1:
+                    raise ValueError(f"{archive} contains {len(members)} CSV files; choose one, as in "
+                                     f"{os.path.join(archive, 'file.csv')}")
+                member = members[0]
+            with zip_file.open(member) as raw, io.BufferedReader(raw, READ_BUFFER_SIZE) as stream:
+                yield stream
+    elif path.lower().endswith('.gz'):
+        with gzip.open(path, 'rb') as raw, io.BufferedReader(raw, READ_BUFFER_SIZE) as stream:
+            yield stream
+    else:
+        with open(path, 'rb', buffering=READ_BUFFER_SIZE) as stream:
+            yield stream
+
+
+def _split_zip_path(path: str) -> tuple[str, str]:
+    """Returns (archive, member) if path is a .zip file or a file inside a .zip file, and ('', '') otherwise.
+
+    member is '' if path is the .zip file itself.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     zipfile.ZipFile(os.path.join(directory, 'archive.zip'), 'w').close()
+    ...     for name in ['archive.zip', 'archive.zip/data/movies.csv', 'movies.csv', 'missing.zip/movies.csv']:
+    ...         archive, member = _split_zip_path(os.path.join(directory, name))
+    ...         print((os.path.basename(archive), member))
+    ('archive.zip', '')
+    ('archive.zip', 'data/movies.csv')
+    ('', '')
+    ('', '')
+    """
+    parts = path.replace(os.sep, '/').split('/')
+    for i in range(len(parts), 0, -1):
+        archive = '/'.join(parts[:i])
+        if archive.lower().endswith('.zip') and os.path.isfile(archive):
+            return archive, '/'.join(parts[i:])
+    return '', ''
+
+
 def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: float) -> list[WeightedGraph]:
     """Constructs two weighted graphs connecting reviews to movies and the user's favorite movies to other movies.
 
@@ -89,8 +231,10 @@ def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: fl
     and edges represent relationships based on genre similarity and review scores. One graph is the full graph while
     the other is a simplified version based on a similarity threshold.
 
-    The weights on the edges between movies and reviews are determined by how closely the movie genres align with
-    the user's preferred genres.
+    How closely the movie genres align with the user's preferred genres is computed from the genres stored on each
+    movie vertex, so the preferred genres can be changed later without reloading the data.
+
+    Both datasets may be compressed, as described in open_dataset.
 
     Preconditions:
         - reviews_file is a path to a valid CSV file with review data.
@@ -99,6 +243,39 @@ def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: fl
     # initialize two graphs: one full and one simplified
     list_graphs = [WeightedGraph(), WeightedGraph()]
 
+    # load movie data from the file, adding a vertex for each movie in the full graph
+    dict_list, genres_list = load_movie_columns(movie_file, list_graphs[0])
+
+    # prompt the user to select their favorite movie and store the selection
+    list_fav = get_favourite_movie(dict_list[1])
+    print(list_fav)
+
+    # get the user to search again if they want to
+    while list_fav[1] == "Search again":
+        list_fav = get_favourite_movie(dict_list[1])
+
+    # prompt the user to select their favorite genres and store the selections
+    fav_genres = get_favourite_genres(genres_list)
+
+    # connect the favourite movie to every other movie and apply the user's preferences to both graphs
+    connect_favourite_movie(list_graphs, dict_list, list_fav, fav_genres, threshold)
+
+    # load and process review data, integrating it into the graphs
+    load_review_columns(reviews_file, list_graphs, dict_list)
+
+    # return the list containing both the full and simplified graphs
+    return list_graphs
+
+
+def load_movie_data(movie_file: str, graph: WeightedGraph) -> tuple[list[dict], list[str]]:
+    """Reads the movie dataset, adds a vertex for every movie to graph, and returns (dict_list, genres_list).
+
+    dict_list[0] maps each movie id to its set of genres and dict_list[1] maps each movie id to its title.
+    genres_list contains every genre that appears in the dataset.
+
+    Preconditions:
+        - movie_file is a path to a valid CSV file with movie data.
+    """
     # initialize dictionaries to store movie titles and genres
     dict_list = [{}, {}]
 
@@ -106,7 +283,7 @@ def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: fl
     genres_list = []
 
     # load movie data from the file
-    with io.open(movie_file, 'r', encoding="utf-8") as file:
+    with open_dataset(movie_file) as stream, io.TextIOWrapper(stream, encoding="utf-8") as file:
 
         # skip header row
         next(file)
@@ -116,11 +293,11 @@ def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: fl
             # assign movie ID as key and title as value in dict_list[1]
             dict_list[1][row[0]] = row[1]
 
-            # add a vertex for each movie in the full graph
-            list_graphs[0].add_vertex(row[1], "Movie")
-
             # extract genres, format them, and assign to dict_list[0] with movie ID as key
-            dict_list[0][row[0]] = set([genre.strip().capitalize() for genre in row[9].replace(", ", "&").split("&")])
+            dict_list[0][row[0]] = parse_genres(row[9])
+
+            # add a vertex for each movie in the full graph, storing its genres once
+            graph.add_vertex(row[1], "Movie", dict_list[0][row[0]])
 
             # union current genres with the total set of genres to keep it unique
             genres_list = list(set(genres_list).union(dict_list[0][row[0]]))
@@ -128,35 +305,63 @@ def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: fl
         # remove any empty genre entries that might have been added
         genres_list.remove("")
 
-    # prompt the user to select their favorite movie and store the selection
-    list_fav = get_favourite_movie(dict_list[1])
-    print(list_fav)
+    return dict_list, genres_list
 
-    # get the user to search again if they want to
-    while list_fav[1] == "Search again":
-        list_fav = get_favourite_movie(dict_list[1])
 
-    # prompt the user to select their favorite genres and store the selections
-    fav_genres = get_favourite_genres(genres_list)
+def parse_genres(genre: str) -> set[str]:
+    """Returns the set of genres listed in the genre column of the movie dataset.
 
-    # iterate over each movie in the dataset to calculate genre similarity and create graph connections
-    for item in dict_list[1]:
-        # calculate the genre similarity weight between the user's favorite movie and the current movie
-        weight = (len(dict_list[0][item].intersection(dict_list[0][list_fav[0]]))
-                  / len(dict_list[0][item].union(dict_list[0][list_fav[0]])))
+    The genres are separated by ", " or "&", and are stripped and capitalized.
+    """
+    return set([genre.strip().capitalize() for genre in genre.replace(", ", "&").split("&")])
 
-        # add vertices and edges to the simplified graph based on the similarity threshold
-        add_vertex_to_simplified_graph(list_fav[1], dict_list[1][item], weight, list_graphs[1], threshold)
 
-        # for the full graph, always add edges between the user's favorite movie and the current movie
-        list_graphs[0].add_edge(dict_list[1][item], list_fav[1], weight)
+def load_movie_columns(movie_file: str, graph: WeightedGraph) -> tuple[list[dict], list[str]]:
+    """Returns the same (dict_list, genres_list) as load_movie_data, and adds the same vertices to graph,
+    but only parses the id, title and genre columns of the movie dataset.
 
-    # apply the user's preferences to both the full and simplified graphs to centralize the analysis around them
-    list_graphs[0].set_user_preferences(list_fav[1], set(fav_genres))
-    list_graphs[1].set_user_preferences(list_fav[1], set(fav_genres))
+    The columns are read by the C parser of pandas, and every distinct genre string is only split once.
+
+    Preconditions:
+        - movie_file is a path to a valid CSV file with movie data.
+    """
+    import pandas as pd
+
+    # read the three columns as strings, keeping empty fields as '' like csv.reader does
+    with open_dataset(movie_file) as stream:
+        movies = pd.read_csv(stream, usecols=MOVIE_COLUMNS, dtype=str, na_filter=False, engine='c',
+                             encoding="utf-8")
+
+    # split every distinct genre string once
+    genre_codes, genre_strings = movies['genre'].factorize()
+    parsed_genres = [parse_genres(genre) for genre in genre_strings]
+
+    # add the movies in file order, so that later rows replace earlier rows with the same id
+    dict_list = [{}, {}]
+    for movie_id, title, code in zip(movies['id'].tolist(), movies['title'].tolist(), genre_codes.tolist()):
+        dict_list[1][movie_id] = title
+        dict_list[0][movie_id] = set(parsed_genres[code])
+        graph.add_vertex(title, "Movie", dict_list[0][movie_id])
+
+    # every genre that appears in the dataset, without the empty genre
+    genres_list = list(set().union(*parsed_genres) - {""})
+
+    return dict_list, genres_list
+
+
+def load_review_data(reviews_file: str, list_graphs: list[WeightedGraph], dict_list: list[dict],
+                     with_critics: bool = False) -> None:
+    """Reads the review dataset and adds its review scores to the full graph, list_graphs[0].
+
+    If with_critics is True, every critic is also added as a vertex adjacent to the movies they reviewed
+    (see WeightedGraph.add_critic_review), for use by the collaborative filtering scorer of critics.py.
 
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - dict_list was returned by load_movie_data
+    """
     # load and process review data, integrating it into the graphs
-    with open(reviews_file, 'r', encoding="utf-8") as file:
+    with open_dataset(reviews_file) as stream, io.TextIOWrapper(stream, encoding="utf-8") as file:
 
         # skip header row
         next(file)
@@ -165,10 +370,193 @@ def load_weighted_review_graph(reviews_file: str, movie_file: str, threshold: fl
             test = row[5].strip("'*").strip(" ").split("/")
 
             # integrate review data into the graphs based on scores and genre similarity
-            build_with_new_vertex_fraction(list_graphs, test, dict_list, row[0], genres_list)
+            build_with_new_vertex_fraction(list_graphs, test, dict_list, row[0])
 
-    # return the list containing both the full and simplified graphs
-    return list_graphs
+            # connect the critic (criticName, isTopCritic, publicationName) to the movie they reviewed
+            if with_critics:
+                add_critic_review(list_graphs[0], test, dict_list, row[0], row[3], row[7], row[4] == 'True')
+
+
+def load_review_columns(reviews_file: str, list_graphs: list[WeightedGraph], dict_list: list[dict],
+                        with_critics: bool = False, chunk_size: int = REVIEW_CHUNK_SIZE,
+                        with_dates: bool = False) -> None:
+    """Adds the same review scores (and critics, if with_critics is True) to the full graph, list_graphs[0],
+    as load_review_data, but only parses the columns of the review dataset listed in REVIEW_COLUMNS.
+
+    If with_dates is True, the date of every review is read too, and the dated reviews are kept in a
+    review_history.ReviewHistory attached to the full graph, as needed by the 'recent' ranking.
+
+    The reviews are read chunk_size rows at a time by the C parser of pandas. Within a chunk, every distinct
+    original score is parsed once and every distinct movie id is looked up once, so the graph is built
+    from columns of titles and scores instead of per-row lists. The scores of each movie in a chunk are
+    added to its score sketch at once.
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - dict_list was returned by load_movie_data or load_movie_columns
+        - the movies of dict_list[1] are vertices of list_graphs[0]
+        - chunk_size > 0
+    """
+    import pandas as pd
+
+    columns = (REVIEW_COLUMNS if with_critics else ['id', 'originalScore']) + ([DATE_COLUMN] if with_dates else [])
+    with open_dataset(reviews_file) as stream:
+        add_review_chunks(pd.read_csv(stream, usecols=columns, dtype=str, na_filter=False, engine='c',
+                                      encoding="utf-8", chunksize=chunk_size),
+                          list_graphs, dict_list, with_critics, with_dates)
+
+
+def add_review_chunks(chunks: Iterable[pd.DataFrame], list_graphs: list[WeightedGraph], dict_list: list[dict],
+                      with_critics: bool = False, with_dates: bool = False) -> None:
+    """Adds the reviews of the given chunks of the review dataset to the full graph, list_graphs[0], as
+    load_review_columns does for the chunks it reads. Chunks can be filtered before they are added, for example
+    to leave some critics out of the graph (see evaluation.py).
+
+    Preconditions:
+        - every chunk holds the columns of the review dataset read by load_review_columns, as strings
+        - dict_list was returned by load_movie_data or load_movie_columns
+        - the movies of dict_list[1] are vertices of list_graphs[0]
+    """
+    dated_titles, dates, scores = [], [], []
+    for chunk in chunks:
+
+        # integrate the reviews into the full graph in file order, as build_with_new_vertex_fraction does
+        chunk_scores = {}
+        for title, score, critic, publication, top_critic, date in review_records(chunk, dict_list):
+            list_graphs[0].add_vertex(score, "Review")
+            list_graphs[0].add_edge(title, score)
+            chunk_scores.setdefault(title, []).append(score)
+            if with_dates:
+                dated_titles.append(title)
+                dates.append(date)
+                scores.append(score)
+
+            # connect the critic to the movie they reviewed, ignoring critics whose name is already used
+            # by a movie or review
+            if with_critics and critic != '':
+                try:
+                    list_graphs[0].add_critic_review(critic, title, score, publication, top_critic)
+                except ValueError:
+                    pass
+
+        # add the scores of every movie of the chunk to its score sketch
+        for title, title_scores in chunk_scores.items():
+            list_graphs[0].add_review_scores(title, title_scores)
+
+    if with_dates:
+        attach_history(list_graphs[0], ReviewHistory(dated_titles, np.array(dates), np.array(scores)))
+
+
+def review_records(chunk: pd.DataFrame,
+                   dict_list: list[dict]) -> Iterator[tuple[str, float, str, str, bool, float]]:
+    """Yields (title, score, critic, publication, top_critic, date) for every review of chunk, in order, skipping
+    the reviews of unknown movies and the reviews whose score cannot be parsed.
+
+    chunk holds the columns of the review dataset as strings. If it has no critic columns, critic and publication
+    are '' and top_critic is False. date is the number of days since 1970-01-01 (see parse_dates), or NaN if
+    chunk has no date column or the date is missing.
+
+    Preconditions:
+        - 'id' in chunk.columns and 'originalScore' in chunk.columns
+        - dict_list was returned by load_movie_data or load_movie_columns
+    """
+    # parse every distinct original score once, marking the scores that cannot be parsed as None
+    score_codes, score_strings = chunk['originalScore'].factorize()
+    parsed_scores = [_parse_original_score(original) for original in score_strings]
+
+    # look up the title of every distinct movie id once, marking unknown movies and empty titles as None
+    movie_codes, movie_ids = chunk['id'].factorize()
+    titles = [dict_list[1].get(movie_id) or None for movie_id in movie_ids]
+
+    if 'criticName' in chunk.columns:
+        critic_columns = zip(chunk['criticName'].tolist(), chunk['publicationName'].tolist(),
+                             (chunk['isTopCritic'] == 'True').tolist())
+    else:
+        critic_columns = itertools.repeat(('', '', False))
+    dates = parse_dates(chunk[DATE_COLUMN]).tolist() if DATE_COLUMN in chunk.columns else itertools.repeat(np.nan)
+
+    for movie_code, score_code, (critic, publication, top_critic), date in zip(movie_codes.tolist(),
+                                                                                score_codes.tolist(),
+                                                                                critic_columns, dates):
+        title, score = titles[movie_code], parsed_scores[score_code]
+        if title is not None and score is not None:
+            yield title, score, critic, publication, top_critic, date
+
+
+def parse_dates(column: pd.Series) -> np.ndarray:
+    """Returns the dates of the given column of date strings (such as 2010-06-30, 2010-06 or 2010) as numbers of
+    days since 1970-01-01, with NaN for the dates that are missing or cannot be parsed.
+
+    >>> import pandas as pd
+    >>> parse_dates(pd.Series(['1970-01-02', '2000-03', '2010', '', '2010-13-01', 'June 31st'])).tolist()
+    [1.0, 11017.0, 14610.0, nan, nan, nan]
+    """
+    import pandas as pd
+
+    dates = pd.to_datetime(column, errors='coerce', format='mixed')
+    days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64).astype(float)
+    days[dates.isna().to_numpy()] = np.nan
+    return days
+
+
+def _parse_original_score(original: str) -> Optional[float]:
+    """Returns the review score of the given originalScore field (see parse_review_score), or None if it
+    cannot be parsed.
+    """
+    test = original.strip("'*").strip(" ").split("/")
+    if len(test) not in {1, 2}:
+        return None
+    try:
+        return parse_review_score(test)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def connect_favourite_movie(list_graphs: list[WeightedGraph], dict_list: list[dict], list_fav: tuple[str, str],
+                            fav_genres: set[str], threshold: float, seeds: Optional[dict[str, float]] = None,
+                            aggregation: str = 'weighted_mean') -> None:
+    """Connects the user's favourite movie to every movie in the full graph, list_graphs[0], and to every movie
+    similar enough to it in the simplified graph, list_graphs[1], and applies the user's preferences to both.
+
+    The weight of each new edge is the genre similarity between the favourite movie and the other movie.
+    The full graph may already be connected to another favourite movie: set_user_preferences replaces it.
+
+    If seeds is given, the user has several favourite movies, mapped to their weights, and list_fav is ignored:
+    the weight of each new edge is the similarity of the other movie to all the seeds, aggregated by aggregation
+    (see multi_seed.set_seed_preferences), and the simplified graph also contains every seed.
+
+    Preconditions:
+        - list_fav == (id, title) of a movie in dict_list[1]
+        - list_graphs[0] contains a vertex for every movie in dict_list[1]
+        - threshold > 0
+        - seeds is None or all(title in dict_list[1].values() for title in seeds)
+    """
+    # with several seeds, compute the similarities to them in the full graph first, centred on the main seed
+    similarities = None
+    if seeds:
+        similarities = multi_seed.set_seed_preferences(list_graphs[0], seeds, set(fav_genres), aggregation)
+        list_fav = ('', list_graphs[0].preferred_movie)
+
+    # iterate over each movie in the dataset to calculate genre similarity and create graph connections
+    for item in dict_list[1]:
+        # calculate the genre similarity weight between the user's favorite movie(s) and the current movie
+        if similarities is None:
+            weight = genre_similarity(dict_list[0][item], dict_list[0][list_fav[0]])
+        elif dict_list[1][item] in seeds:
+            weight = max(similarities.get(dict_list[1][item], 0.0), threshold)
+        else:
+            weight = similarities.get(dict_list[1][item], 0.0)
+
+        # add vertices and edges to the simplified graph based on the similarity threshold
+        add_vertex_to_simplified_graph(list_fav[1], dict_list[1][item], weight, list_graphs[1], threshold)
+
+    # apply the user's preferences to both the full and simplified graphs to centralize the analysis around them
+    # for the full graph, this connects the user's favorite movie to every other movie
+    if similarities is None:
+        list_graphs[0].set_user_preferences(list_fav[1], set(fav_genres))
+    list_graphs[1].set_user_preferences(list_fav[1], set(fav_genres))
+    if similarities is not None:
+        list_graphs[1].set_seed_movies(seeds, {})
 
 
 def get_favourite_movie(films: dict[str, str]) -> tuple[str, str]:
@@ -178,6 +566,9 @@ def get_favourite_movie(films: dict[str, str]) -> tuple[str, str]:
 
     If the user's initial search does not yield satisfactory results, they can choose to search again.
     """
+    import tkinter as tk
+    from tkinter import simpledialog
+
     # initialize the Tkinter root window in hidden mode to avoid showing an empty window
     root = tk.Tk()
     root.withdraw()
@@ -249,6 +640,9 @@ def get_favourite_genres(genres: list[str]) -> set[str]:
     The function opens a dialog box where the user can input the indices of their favorite genres,
     supporting multiple selections separated by commas. The selected genres are returned as a set of strings.
     """
+    import tkinter as tk
+    from tkinter import simpledialog
+
     # initialize the Tkinter root window in hidden mode to avoid showing an empty window
     root = tk.Tk()
     root.withdraw()
@@ -295,32 +689,105 @@ def get_favourite_genres(genres: list[str]) -> set[str]:
     return favourite_genres
 
 
-def print_recommended_movies(graph: WeightedGraph, limit: int, show_num_of_reviews: bool = False) -> None:
-    """Recommends movies based on the user's preferences and prints the results.
+def recommend_movies(graph: WeightedGraph, limit: int, ranking: str = 'similarity',
+                     candidates: Optional[Collection[str]] = None,
+                     diversity: float = 0.0) -> list[tuple[_WeightedVertex, float]]:
+    """Returns the top limit movies recommended based on the user's preferences, as (movie vertex, score) pairs
+    sorted by score in descending order.
+
+    The ranking is either:
+        - 'similarity': the strict average score of each neighbour of the preferred movie multiplied by
+          its overall similarity score
+        - 'pagerank': the personalized PageRank of each movie, computed by the pagerank module
+        - 'critics': the votes of the critics who liked the preferred movie (or the similarity of the critic
+          factors, if a factorization was attached), computed by the critics module. The graph must have
+          been loaded with critics (see load_review_data).
+        - 'recent': the 'similarity' ranking with the reviews weighted by their age, using the half-life and
+          window of dates of the review history of the graph. The graph must have been loaded with review dates
+          (see load_review_columns).
+        - 'median': the 'similarity' ranking with the median of the raw review scores of each movie (from its
+          score sketch) instead of the average of its unique review scores, so outlier reviews weigh less
+
+    If candidates is given (for example, the titles selected by a movie_filters.MovieMetadata filter),
+    only the movies with these titles are scored.
+
+    If diversity > 0, the top reranking.MMR_CANDIDATES movies of the ranking are re-ranked by reranking.rerank,
+    which trades their scores off against their genre similarity to the movies recommended before them.
+
+    If the user has several favourite movies (see multi_seed), none of them is recommended, and the 'similarity'
+    and 'median' rankings use the similarity of every movie to all of them.
+
+    Raise a ValueError if ranking is not in RANKINGS.
 
     Preconditions:
         - limit > 0
+        - graph.preferred_movie != ''
+        - 0 <= diversity <= 1
+
+    >>> recommend_movies(WeightedGraph(), 10, 'bogus')
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown ranking: bogus
     """
-    # display the user's chosen preferences for context
-    print("Based on your preferrences: \n"
-          + f"    - Preferred Movie: {graph.preferred_movie} \n"
-          + f"    - Preferred Genre(s): {graph.preferred_genres}")
+    if ranking not in RANKINGS:
+        raise ValueError(f"Unknown ranking: {ranking}")
+    if diversity > 0:
+        return reranking.rerank(recommend_movies(graph, max(limit, reranking.MMR_CANDIDATES), ranking, candidates),
+                                limit, diversity)
+
+    # the other favourite movies of a multi-seed query are marked as preferred too, and never recommended
+    rankers = {'pagerank': pagerank.get_ranker, 'critics': critics.get_scorer, 'recent': get_history}
+    if ranking in rankers:
+        ranked = rankers[ranking](graph).rank(graph, limit + max(len(graph.seed_movies) - 1, 0), candidates)
+        return [(movie, score) for movie, score in ranked if not movie.preferred][:limit]
 
     # retrieve the preferred movie vertex for reference
     preferred_movie = graph.get_vertex(graph.preferred_movie)
 
     # gather movies that are considered similar based on graph connections
     similar_movies = preferred_movie.neighbours
+    if candidates is not None:
+        # only score the candidates, rather than every neighbour of the preferred movie
+        similar_movies = [movie for movie in (graph.get_vertex(title) for title in candidates if title in graph)
+                          if movie in preferred_movie.neighbours]
 
-    # calculate and sort movies by a combined score of average strict score and overall similarity
+    # calculate and sort movies by a combined score of average strict score (or median score) and overall similarity
     # this score is meant to prioritize movies closely matching the user's preferences
     average_scores = [
-        (sim_movie, sim_movie.average_score_strict() * sim_movie.overall_similarity_score(preferred_movie))
-        for sim_movie in similar_movies if sim_movie != preferred_movie]
+        (sim_movie, (sim_movie.score_quantile(0.5, 3) if ranking == 'median' else sim_movie.average_score_strict())
+         * sim_movie.overall_similarity_score(preferred_movie))
+        for sim_movie in similar_movies if sim_movie.kind == 'Movie' and not sim_movie.preferred]
     average_scores.sort(key=lambda x: x[1], reverse=True)
 
     # limit the recommendations to the specified limit
-    recommended_movies = average_scores[:limit]
+    return average_scores[:limit]
+
+
+def print_recommended_movies(graph: WeightedGraph, limit: int, show_num_of_reviews: bool = False,
+                             ranking: str = 'similarity', candidates: Optional[Collection[str]] = None,
+                             diversity: float = 0.0) -> None:
+    """Recommends movies based on the user's preferences and prints the results.
+
+    See recommend_movies for the available rankings, for restricting the recommendations to candidates,
+    and for diversifying them.
+
+    Preconditions:
+        - limit > 0
+        - ranking in RANKINGS
+        - 0 <= diversity <= 1
+    """
+    # display the user's chosen preferences for context, with the weight of every favourite movie if there are several
+    favourites = ', '.join(f"{title} ({weight:g})" for title, weight in graph.seed_movies.items()) \
+        if len(graph.seed_movies) > 1 else graph.preferred_movie
+    print("Based on your preferrences: \n"
+          + f"    - Preferred Movie: {favourites} \n"
+          + f"    - Preferred Genre(s): {graph.preferred_genres}")
+
+    # retrieve the preferred movie vertex for reference
+    preferred_movie = graph.get_vertex(graph.preferred_movie)
+
+    # calculate the recommendations, limited to the specified limit
+    recommended_movies = recommend_movies(graph, limit, ranking, candidates, diversity)
 
     # print the recommendations along with their matching scores and optionally the number of reviews
     print(f"Here are the top {limit} movies matching your preferrences: \n")
@@ -347,6 +814,12 @@ def display_recommendations(whole_graph: WeightedGraph, partial_graph: WeightedG
             2. Shows a graph plot with all the vertices representing a movie or review.
             3. Shows a quadrant visualization of all the movies.
     """
+    import tkinter as tk
+    from tkinter import simpledialog
+
+    import visualization1
+    import visualization2
+
     # initialize Tkinter root window in hidden mode to prompt for user input
     root = tk.Tk()
     root.withdraw()
@@ -362,7 +835,7 @@ def display_recommendations(whole_graph: WeightedGraph, partial_graph: WeightedG
     # handle the case where user input is invalid or not given; default to printing recommendations
     if user_input is None or user_input not in options:
         print("Invalid Option Chosen. Printing recommendations (by default)")
-        print_recommended_movies(whole_graph, 10, True)
+        print_recommended_movies(whole_graph, 10, True, INTERACTIVE_RANKING)
         return
 
     # retrieve the chosen option from the options dictionary using the user's input
@@ -381,7 +854,7 @@ def display_recommendations(whole_graph: WeightedGraph, partial_graph: WeightedG
     else:
 
         # default action: Print the recommendations to the console.
-        print_recommended_movies(whole_graph, 10, True)
+        print_recommended_movies(whole_graph, 10, True, INTERACTIVE_RANKING)
 
 
 def add_vertex_to_simplified_graph(target_movie: str, movie: str, weight: float,
@@ -416,6 +889,9 @@ def add_vertex_to_simplified_graph(target_movie: str, movie: str, weight: float,
 if __name__ == "__main__":
     # requirement for "code quality"
     # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
 
     # import python_ta.contracts
     # python_ta.contracts.check_all_contracts()
@@ -423,10 +899,10 @@ if __name__ == "__main__":
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ["csv", "networkx", "typing", "io", "time", "tkinter",
-                          "visualization1", "visualization2", "classes",
-                          "plotly.graph_objs", "pandas", "plotly.graph_objects"],
-        'allowed-io': ["get_favourite_movie", "get_favourite_genres", "load_weighted_review_graph",
+        'extra-imports': ["contextlib", "csv", "gzip", "io", "itertools", "os", "zipfile", "typing", "numpy", "classes",
+                          "critics", "multi_seed", "pagerank", "reranking", "review_history", "pandas", "tkinter",
+                          "visualization1", "visualization2"],
+        'allowed-io': ["get_favourite_movie", "get_favourite_genres", "open_dataset", "load_weighted_review_graph",
                        "print_recommended_movies", "display_recommendations"],
         'max-line-length': 120
     })
@@ -0,0 +1,359 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the MovieArrays class, which extracts the per-movie data of a WeightedGraph into
+NumPy arrays (one row per movie), along with helper functions for genre bitmasks.
+
+The genres of a movie are stored as a bitmask: bit i is set if the movie has genre_names[i]. The genre
+similarity of every movie to a set of genres can then be computed at once with bitwise operations.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+from typing import Any, Collection, Iterable, Optional
+
+import numpy as np
+
+from classes import WeightedGraph, _WeightedVertex
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """Returns the number of set bits in every entry of the given array of bitmasks.
+
+    >>> popcount(np.array([0, 1, 7, 2 ** 63], dtype=np.uint64)).tolist()
+    [0, 1, 3, 1]
+    """
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks).astype(np.int64)
+
+    # older versions of NumPy: count the bits of the 8 bytes of every mask
+    return np.unpackbits(masks.view(np.uint8)).reshape(masks.shape + (64,)).sum(axis=-1, dtype=np.int64)
+
+
+def genre_bitmask(genre_names: list[str], genres: Iterable[str]) -> int:
+    """Returns the bitmask of the given genres, where bit i stands for genre_names[i].
+    Genres that are not in genre_names are ignored.
+
+    >>> genre_bitmask(["Action", "Drama", "Comedy"], {"Comedy", "Action", "Horror"})
+    5
+    """
+    mask = 0
+    for genre in genres:
+        if genre in genre_names:
+            mask |= 1 << genre_names.index(genre)
+    return mask
+
+
+def genre_similarities(masks: np.ndarray, mask: int) -> np.ndarray:
+    """Returns the genre similarity (as computed by classes.genre_similarity) between every genre bitmask
+    in masks and the genre bitmask mask.
+
+    >>> genre_similarities(np.array([0b011, 0b100, 0], dtype=np.uint64), 0b001).tolist()
+    [0.5, 0.0, 0.0]
+    >>> genre_similarities(np.array([0], dtype=np.uint64), 0).tolist()
+    [0.0]
+    """
+    mask = np.uint64(mask)
+    intersection = popcount(masks & mask)
+    union = popcount(masks | mask)
+    return np.divide(intersection, union, out=np.zeros(len(masks)), where=union > 0)
+
+
+def similarity_scores(arrays: Any, row: int, genres_mask: int, min_number_of_reviews: int = 3,
+                      averages: Optional[np.ndarray] = None, weight_for_movie: float = 0.5,
+                      weight_for_genres: float = 0.5) -> np.ndarray:
+    """Returns the score of every movie (in row order) under the 'similarity' ranking of main.recommend_movies,
+    for the favourite movie in the given row and the preferred genres in genres_mask.
+
+    This is the strict average score of each movie (see _WeightedVertex.average_score_strict) multiplied by
+    its overall similarity score to the favourite movie (see _WeightedVertex.overall_similarity_score), computed
+    for every movie at once. The movies that recommend_movies does not consider (the favourite movie itself,
+    and the movies whose genres are unknown) get -inf.
+
+    arrays is a MovieArrays, or any object with the same genre_masks, known_genres, review_counts and
+    review_totals arrays. If averages is given, it replaces the strict average score of every movie.
+    weight_for_movie and weight_for_genres are the weights of overall_similarity_score.
+
+    Preconditions:
+        - 0 <= row < len(arrays.genre_masks)
+        - min_number_of_reviews > 0
+        - 0 <= weight_for_movie <= 1
+        - 0 <= weight_for_genres <= 1
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Alien", "Movie", {"Sci-fi"})
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> for score in [0.6, 0.7, 0.8]:
+    ...     g.add_vertex(score, "Review")
+    ...     g.add_edge("Aliens", score)
+    >>> arrays = MovieArrays(g)
+    >>> scores = similarity_scores(arrays, 0, arrays.genre_mask({"Action"}))
+    >>> g.set_user_preferences("Alien", {"Action"})
+    >>> aliens, alien = g.get_vertex("Aliens"), g.get_vertex("Alien")
+    >>> float(scores[1]) == aliens.average_score_strict() * aliens.overall_similarity_score(alien)
+    True
+    """
+    if averages is None:
+        averages = strict_averages(arrays, min_number_of_reviews)
+
+    scores = averages * overall_similarities(arrays, row, genres_mask, weight_for_movie, weight_for_genres)
+    scores[unranked_rows(arrays, row)] = -np.inf
+    return scores
+
+
+def strict_averages(arrays: Any, min_number_of_reviews: int = 3) -> np.ndarray:
+    """Returns the strict average score (see _WeightedVertex.average_score_strict) of every movie, in row order.
+
+    arrays is a MovieArrays, or any object with the same review_counts and review_totals arrays.
+
+    Preconditions:
+        - min_number_of_reviews > 0
+    """
+    counts = arrays.review_counts
+    return np.divide(arrays.review_totals, counts, out=np.zeros(len(counts)), where=counts >= min_number_of_reviews)
+
+
+def unranked_rows(arrays: Any, row: int) -> np.ndarray:
+    """Returns whether the movie in each row is left out of the 'similarity' ranking for the favourite movie in the
+    given row: the favourite movie itself and the movies whose genres are unknown, or every movie if the genres of
+    the favourite movie are unknown.
+
+    Preconditions:
+        - 0 <= row < len(arrays.known_genres)
+    """
+    unranked = ~arrays.known_genres
+    unranked[row] = True
+    if not arrays.known_genres[row]:
+        unranked[:] = True
+    return unranked
+
+
+def overall_similarities(arrays: Any, row: int, genres_mask: int, weight_for_movie: float = 0.5,
+                         weight_for_genres: float = 0.5) -> np.ndarray:
+    """Returns the overall similarity score (see _WeightedVertex.overall_similarity_score) of every movie
+    (in row order) to the favourite movie in the given row, for the preferred genres in genres_mask.
+
+    The movie similarity is the edge weight that set_user_preferences gives every movie with known genres,
+    and the genre similarity is only counted for movies with at least one review.
+
+    Preconditions:
+        - 0 <= row < len(arrays.genre_masks)
+        - 0 <= weight_for_movie <= 1
+        - 0 <= weight_for_genres <= 1
+    """
+    movie_similarity, genre_similarity = similarity_columns(arrays, row, genres_mask)
+    return movie_similarity * weight_for_movie + genre_similarity * weight_for_genres
+
+
+def similarity_columns(arrays: Any, row: int, genres_mask: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the unweighted (movie similarity, genre similarity) of every movie (in row order) that
+    overall_similarities combines, for the favourite movie in the given row and the preferred genres in genres_mask.
+
+    Preconditions:
+        - 0 <= row < len(arrays.genre_masks)
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Alien", "Movie", {"Sci-fi"})
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex(0.8, "Review")
+    >>> g.add_edge("Aliens", 0.8)
+    >>> arrays = MovieArrays(g)
+    >>> [column.tolist() for column in similarity_columns(arrays, 0, arrays.genre_mask({"Action"}))]
+    [[1.0, 0.5], [0.0, 0.5]]
+    """
+    masks = arrays.genre_masks
+    movie_similarity = genre_similarities(masks, int(masks[row]))
+    genre_similarity = np.where(arrays.review_counts > 0, genre_similarities(masks, genres_mask), 0)
+    return movie_similarity, genre_similarity
+
+
+def top_rows(scores: np.ndarray, limit: int) -> list[int]:
+    """Returns the rows of the (at most) limit highest scores, from highest to lowest, skipping -inf scores.
+    Equal scores are ordered by row.
+
+    Only the best limit scores are sorted.
+
+    >>> top_rows(np.array([0.5, -np.inf, 0.9, 0.5]), 3)
+    [2, 0, 3]
+    >>> top_rows(np.array([0.5, 0.5, 0.5, 0.9]), 2)
+    [3, 0]
+    """
+    limit = min(limit, int(np.count_nonzero(scores > -np.inf)))
+    if limit <= 0:
+        return []
+
+    # find the lowest score that makes the cut, then break the ties at that score by row
+    threshold = scores[np.argpartition(-scores, limit - 1)[limit - 1]]
+    better = np.flatnonzero(scores > threshold)
+    top = np.concatenate([better, np.flatnonzero(scores == threshold)[:limit - len(better)]])
+    return top[np.lexsort((top, -scores[top]))].tolist()
+
+
+def restrict_scores(scores: np.ndarray, index: Any, candidates: Collection[str]) -> None:
+    """Set the score of every movie whose title is not in candidates to -inf, so that top_rows skips it.
+
+    index maps each title to its row (see MovieArrays.index). Candidates that have no row are ignored.
+
+    >>> scores = np.array([0.5, 0.9, 0.7])
+    >>> restrict_scores(scores, {'Up': 0, 'Heat': 1, 'Jaws': 2}, ['Jaws', 'Up', 'Cats'])
+    >>> scores.tolist()
+    [0.5, -inf, 0.7]
+    """
+    keep = np.zeros(len(scores), dtype=bool)
+    keep[[index[title] for title in candidates if title in index]] = True
+    scores[~keep] = -np.inf
+
+
+class MovieArrays:
+    """The movies of a WeightedGraph and their reviews, stored as NumPy arrays with one row per movie.
+
+    The arrays are a snapshot of the graph when they were created: they must be created again
+    if movies are added to the graph, and new movie-review edges must be added with add_edges.
+
+    Instance Attributes:
+        - movies: The movie vertices, in row order.
+        - titles: The title of the movie in each row.
+        - index: Maps each title to its row.
+        - genre_names: The genre represented by each bit of the genre bitmasks.
+        - genre_masks: The genre bitmask of the movie in each row.
+        - known_genres: Whether the genres of the movie in each row are known.
+        - review_counts: The number of reviews of the movie in each row.
+        - review_totals: The total score of the reviews of the movie in each row.
+        - review_scores: The score of each review vertex, indexed by review number.
+        - edge_movies: The row of the movie of every movie-review edge.
+        - edge_reviews: The review number of the review of every movie-review edge.
+
+    Representation Invariants:
+        - len(self.movies) == len(self.titles) == len(self.genre_masks) == len(self.review_counts)
+        - len(self.edge_movies) == len(self.edge_reviews)
+        - len(self.genre_names) <= 64
+    """
+    # Private Instance Attributes:
+    #     - _review_numbers:
+    #         Maps each review vertex to its review number.
+    movies: list[_WeightedVertex]
+    titles: np.ndarray
+    index: dict[Any, int]
+    genre_names: list[str]
+    genre_masks: np.ndarray
+    known_genres: np.ndarray
+    review_counts: np.ndarray
+    review_totals: np.ndarray
+    review_scores: np.ndarray
+    edge_movies: np.ndarray
+    edge_reviews: np.ndarray
+    _review_numbers: dict[_WeightedVertex, int]
+
+    def __init__(self, graph: WeightedGraph) -> None:
+        """Extract the movies and reviews of the given graph.
+
+        Raise a ValueError if the movies of the graph have more than 64 distinct genres.
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Inception", "Movie", {"Action", "Sci-fi"})
+        >>> g.add_vertex("Up", "Movie", {"Animation"})
+        >>> g.add_vertex(0.8, "Review")
+        >>> g.add_edge("Inception", 0.8)
+        >>> arrays = MovieArrays(g)
+        >>> arrays.titles.tolist()
+        ['Inception', 'Up']
+        >>> arrays.edge_movies.tolist(), arrays.review_scores[arrays.edge_reviews].tolist()
+        ([0], [0.8])
+        >>> genre_similarities(arrays.genre_masks, arrays.genre_mask({"Action"})).tolist()
+        [0.5, 0.0]
+        """
+        self.movies = [v for v in graph.get_vertices() if v.kind in ("Movie", "Chosen Movie")]
+        self.titles = np.empty(len(self.movies), dtype=object)
+        self.titles[:] = [v.item for v in self.movies]
+        self.index = {v.item: i for i, v in enumerate(self.movies)}
+
+        # give every genre one bit, in order of first appearance
+        self.genre_names = list(dict.fromkeys(genre for v in self.movies for genre in (v.genres or ())))
+        if len(self.genre_names) > 64:
+            raise ValueError(f"{len(self.genre_names)} genres do not fit in a 64-bit genre mask")
+        self.genre_masks = np.fromiter((self.genre_mask(v.genres or ()) for v in self.movies),
+                                       dtype=np.uint64, count=len(self.movies))
+        self.known_genres = np.array([v.genres is not None for v in self.movies], dtype=bool)
+
+        # number the review vertices and list the movie-review edges, in one pass over the movies
+        self._review_numbers, edge_movies, edge_reviews = {}, [], []
+        for row, movie in enumerate(self.movies):
+            for review in movie.neighbours:
+                if review.kind == "Review":
+                    edge_movies.append(row)
+                    edge_reviews.append(self._review_numbers.setdefault(review, len(self._review_numbers)))
+        self.review_scores = np.fromiter((review.item for review in self._review_numbers), dtype=float,
+                                         count=len(self._review_numbers))
+        self.edge_movies = np.array(edge_movies, dtype=np.intp)
+        self.edge_reviews = np.array(edge_reviews, dtype=np.intp)
+        self._update_review_totals()
+
+    def _update_review_totals(self) -> None:
+        """Compute the number and total score of the reviews of every movie."""
+        self.review_counts = np.bincount(self.edge_movies, minlength=len(self.movies))
+        self.review_totals = np.bincount(self.edge_movies, self.review_scores[self.edge_reviews],
+                                         minlength=len(self.movies))
+
+    def add_edges(self, edges: list[tuple[_WeightedVertex, _WeightedVertex]]) -> None:
+        """Append the given (movie vertex, review vertex) edges, which were added to the graph after these
+        arrays were created. Reviews that are new to the arrays get the next review numbers.
+
+        Preconditions:
+            - all(movie.item in self.index for movie, _ in edges)
+            - no edge in edges is already in these arrays
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex("Up", "Movie")
+        >>> arrays = MovieArrays(g)
+        >>> g.add_vertex(0.8, "Review")
+        >>> g.add_edge("Up", 0.8)
+        >>> arrays.add_edges([(g.get_vertex("Up"), g.get_vertex(0.8))])
+        >>> arrays.edge_movies.tolist(), arrays.review_scores[arrays.edge_reviews].tolist()
+        ([0], [0.8])
+        """
+        num_reviews = len(self._review_numbers)
+        edge_movies = np.fromiter((self.index[movie.item] for movie, _ in edges), dtype=np.intp, count=len(edges))
+        edge_reviews = np.fromiter((self._review_numbers.setdefault(review, len(self._review_numbers))
+                                    for _, review in edges), dtype=np.intp, count=len(edges))
+
+        # the scores of the reviews numbered in this call, in number order
+        new_scores = np.fromiter((review.item for review in list(self._review_numbers)[num_reviews:]), dtype=float)
+        self.review_scores = np.concatenate([self.review_scores, new_scores])
+        self.edge_movies = np.concatenate([self.edge_movies, edge_movies])
+        self.edge_reviews = np.concatenate([self.edge_reviews, edge_reviews])
+        self._update_review_totals()
+
+    def genre_mask(self, genres: Iterable[str]) -> int:
+        """Returns the genre bitmask of the given genres. Genres that no movie has are ignored."""
+        return genre_bitmask(self.genre_names, genres)
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["typing", "numpy", "classes"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
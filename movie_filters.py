@@ -0,0 +1,305 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the metadata filter engine, used to restrict recommendations to the movies that satisfy
+constraints such as "rated PG-13, under 120 minutes, released after 2010, with at least 5 reviews".
+
+The metadata columns of the movie dataset are loaded into typed NumPy arrays (one row per movie), with an index
+per column: numeric columns are sorted once, so a range of values is found by binary search, and every rating has
+a bitmap of the movies with that rating. A filter expression is a conjunction of conditions, such as
+    rating in PG,PG-13 and runtimeMinutes < 120 and releaseDateTheaters >= 2011 and reviews >= 5
+The rows satisfying the most selective indexed condition are found first, and the other conditions are only
+checked on those rows, so a selective filter only touches the movies it might return.
+
+The fields of an expression are:
+    - rating (with ==, != or in, followed by a comma-separated list of ratings)
+    - runtimeMinutes, tomatoMeter, audienceScore (numbers)
+    - releaseDateTheaters, releaseDateStreaming (dates such as 2010, 2010-06 or 2010-06-30)
+    - reviews (the number of reviews of the movie in a graph)
+with the comparisons ==, !=, <, <=, > and >=. Movies with a missing value never satisfy a condition on it.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import operator
+import re
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import numpy as np
+
+from classes import WeightedGraph
+import main
+
+# pandas is only imported when the metadata is loaded, so that importing this module (and batch) stays fast
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The numeric and date columns of the movie dataset that can be filtered on.
+NUMERIC_FIELDS = ('runtimeMinutes', 'tomatoMeter', 'audienceScore')
+DATE_FIELDS = ('releaseDateTheaters', 'releaseDateStreaming')
+
+# The comparisons of a filter expression.
+_COMPARISONS: dict[str, Callable[[Any, Any], Any]] = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge
+}
+
+# One condition of a filter expression: a field, a comparison and a value.
+_CONDITION = re.compile(r'^\s*(\w+)\s*(==|!=|<=|>=|<|>|\bin\b)\s*(.+?)\s*$')
+
+
+class MovieMetadata:
+    """The metadata of the movies of the movie dataset, with the indexes used to filter them.
+
+    Instance Attributes:
+        - titles: The title of the movie in each row. A title that appears more than once in the dataset
+                  only has the row of its first appearance, like the movie vertices of a graph.
+        - index: Maps each title to its row.
+        - values: The values of every numeric and date column, one per row, with NaN for missing values.
+                  Dates are stored as days since 1970-01-01.
+        - rating_names: The distinct ratings.
+        - rating_codes: The position in rating_names of the rating of each row, or -1 if it is missing.
+
+    Representation Invariants:
+        - all(len(column) == len(self.titles) for column in self.values.values())
+        - len(self.rating_codes) == len(self.titles)
+    """
+    # Private Instance Attributes:
+    #     - _sorted:
+    #         For every numeric and date column, the rows with a value sorted by value, and the sorted values.
+    #     - _rating_bitmaps:
+    #         For every rating, whether each movie has that rating.
+    titles: np.ndarray
+    index: dict[str, int]
+    values: dict[str, np.ndarray]
+    rating_names: list[str]
+    rating_codes: np.ndarray
+    _sorted: dict[str, tuple[np.ndarray, np.ndarray]]
+    _rating_bitmaps: dict[str, np.ndarray]
+
+    def __init__(self, movies: pd.DataFrame) -> None:
+        """Initialize the metadata of the given movies, which have the columns of the movie dataset as strings.
+
+        >>> import pandas as pd
+        >>> movies = pd.DataFrame({'title': ['Up', 'Heat', 'Up'], 'rating': ['PG', 'R', 'G'],
+        ...                        'runtimeMinutes': ['96', '', '1'],
+        ...                        'releaseDateTheaters': ['2009-05-29', '1995', '']})
+        >>> metadata = MovieMetadata(movies)
+        >>> metadata.titles.tolist(), metadata.values['runtimeMinutes'].tolist()
+        (['Up', 'Heat'], [96.0, nan])
+        >>> metadata.select("rating in PG,PG-13 and releaseDateTheaters >= 2000")
+        ['Up']
+        """
+        import pandas as pd
+
+        movies = movies.drop_duplicates('title')
+        self.titles = movies['title'].to_numpy(dtype=object)
+        self.index = {title: row for row, title in enumerate(self.titles)}
+
+        # parse every numeric and date column once, into a float column with NaN for missing values
+        self.values = {}
+        for field in NUMERIC_FIELDS + DATE_FIELDS:
+            if field not in movies.columns:
+                self.values[field] = np.full(len(self.titles), np.nan)
+            elif field in DATE_FIELDS:
+                self.values[field] = main.parse_dates(movies[field])
+            else:
+                self.values[field] = pd.to_numeric(movies[field], errors='coerce').to_numpy(dtype=float)
+
+        # sort the rows of every column by value once, leaving out the missing values
+        self._sorted = {}
+        for field, column in self.values.items():
+            rows = np.flatnonzero(~np.isnan(column))
+            rows = rows[np.argsort(column[rows], kind='stable')]
+            self._sorted[field] = (rows, column[rows])
+
+        # number the ratings, and keep one bitmap per rating
+        ratings = movies['rating'] if 'rating' in movies.columns else pd.Series('', index=movies.index)
+        ratings = ratings.str.strip().str.upper()
+        codes, names = pd.factorize(ratings.where(ratings != ''))
+        self.rating_names = [str(name) for name in names]
+        self.rating_codes = codes.astype(np.int16)
+        self._rating_bitmaps = {name: self.rating_codes == code for code, name in enumerate(self.rating_names)}
+
+    @staticmethod
+    def load(movie_file: str) -> MovieMetadata:
+        """Returns the metadata of the movies of the given movie dataset, which may be compressed
+        (see main.open_dataset). Only the title and metadata columns are parsed.
+
+        Preconditions:
+            - movie_file is a path to a valid CSV file with movie data.
+        """
+        import pandas as pd
+
+        columns = ['title', 'rating'] + list(NUMERIC_FIELDS + DATE_FIELDS)
+        with main.open_dataset(movie_file) as stream:
+            movies = pd.read_csv(stream, usecols=columns, dtype=str, na_filter=False, engine='c', encoding="utf-8")
+        return MovieMetadata(movies)
+
+    def select(self, expression: str, graph: Optional[WeightedGraph] = None) -> list[str]:
+        """Returns the titles of the movies that satisfy the given filter expression, in row order.
+
+        The number of reviews of a movie is read from graph, which must be given if the expression has a
+        condition on reviews. Raise a ValueError if the expression is not valid.
+
+        >>> import pandas as pd
+        >>> movies = pd.DataFrame({'title': ['A', 'B', 'C', 'D'], 'rating': ['PG', 'R', 'PG', ''],
+        ...                        'runtimeMinutes': ['90', '100', '130', '95']})
+        >>> MovieMetadata(movies).select("runtimeMinutes < 120 and rating != R")
+        ['A']
+        >>> MovieMetadata(movies).select("rating in PG and ")
+        Traceback (most recent call last):
+        ...
+        ValueError: Empty condition in filter: 'rating in PG and '
+        >>> MovieMetadata(movies).select("runtimeMinutes <= nan")
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid value in condition: runtimeMinutes <= nan
+        """
+        parts = [part.strip() for part in re.split(r'\band\b', expression)]
+        if '' in parts:
+            raise ValueError(f"Empty condition in filter: {expression!r}")
+        conditions = [self._parse_condition(part) for part in parts]
+        if any(field == 'reviews' for field, _, _ in conditions) and graph is None:
+            raise ValueError("A graph is needed to filter on the number of reviews")
+
+        # start from the rows of the most selective indexed condition, so that the other conditions are only
+        # checked on rows that might be returned
+        indexed = [condition for condition in conditions if self._is_indexed(condition)]
+        if len(indexed) > 0:
+            first = min(indexed, key=self._estimate)
+            rows = np.sort(self._rows(first))
+            conditions.remove(first)
+        else:
+            rows = np.arange(len(self.titles))
+
+        for condition in conditions:
+            rows = rows[self._check(condition, rows, graph)]
+
+        return self.titles[rows].tolist()
+
+    def _parse_condition(self, condition: str) -> tuple[str, str, Any]:
+        """Returns the (field, comparison, value) of one condition of a filter expression. The value of a rating
+        condition is the list of ratings, and the value of a date condition is a number of days.
+
+        Raise a ValueError if the condition is not valid.
+        """
+        match = _CONDITION.match(condition)
+        if match is None:
+            raise ValueError(f"Invalid condition: {condition}")
+        field, comparison, value = match.groups()
+
+        try:
+            if field == 'rating' and comparison in ('==', '!=', 'in'):
+                return field, comparison, [rating.strip().upper() for rating in value.split(',')]
+            elif field in DATE_FIELDS and comparison != 'in':
+                date = np.datetime64(value, 'D')
+                if np.isnat(date):
+                    raise ValueError(f"Missing date: {value}")
+                return field, comparison, float(date.astype(np.int64))
+            elif (field in NUMERIC_FIELDS or field == 'reviews') and comparison != 'in':
+                number = float(value)
+                if not np.isfinite(number):
+                    raise ValueError(f"Non-finite number: {value}")
+                return field, comparison, number
+        except ValueError as error:
+            raise ValueError(f"Invalid value in condition: {condition}") from error
+
+        raise ValueError(f"Invalid field or comparison in condition: {condition}")
+
+    def _is_indexed(self, condition: tuple[str, str, Any]) -> bool:
+        """Returns whether the rows satisfying the given condition can be found from an index."""
+        field, comparison, _ = condition
+        return field != 'reviews' and comparison != '!='
+
+    def _estimate(self, condition: tuple[str, str, Any]) -> int:
+        """Returns the number of rows that satisfy the given indexed condition, computed from the indexes only.
+
+        Preconditions:
+            - self._is_indexed(condition)
+        """
+        field, _, value = condition
+        if field == 'rating':
+            return sum(int(np.count_nonzero(self._rating_bitmaps[rating])) for rating in set(value)
+                       if rating in self._rating_bitmaps)
+        low, high = self._range(condition)
+        return high - low
+
+    def _range(self, condition: tuple[str, str, Any]) -> tuple[int, int]:
+        """Returns the range of positions in the sorted column of the given indexed numeric or date condition
+        that satisfy it, found by binary search.
+        """
+        field, comparison, value = condition
+        sorted_values = self._sorted[field][1]
+        low, high = 0, len(sorted_values)
+        if comparison in ('>', '>='):
+            low = int(np.searchsorted(sorted_values, value, 'right' if comparison == '>' else 'left'))
+        elif comparison in ('<', '<='):
+            high = int(np.searchsorted(sorted_values, value, 'left' if comparison == '<' else 'right'))
+        else:
+            low = int(np.searchsorted(sorted_values, value, 'left'))
+            high = int(np.searchsorted(sorted_values, value, 'right'))
+        return low, high
+
+    def _rows(self, condition: tuple[str, str, Any]) -> np.ndarray:
+        """Returns the rows that satisfy the given indexed condition, from the indexes.
+
+        Preconditions:
+            - self._is_indexed(condition)
+        """
+        field, _, value = condition
+        if field == 'rating':
+            bitmap = np.zeros(len(self.titles), dtype=bool)
+            for rating in value:
+                if rating in self._rating_bitmaps:
+                    bitmap |= self._rating_bitmaps[rating]
+            return np.flatnonzero(bitmap)
+
+        low, high = self._range(condition)
+        return self._sorted[field][0][low:high]
+
+    def _check(self, condition: tuple[str, str, Any], rows: np.ndarray,
+               graph: Optional[WeightedGraph]) -> np.ndarray:
+        """Returns whether each of the given rows satisfies the given condition."""
+        field, comparison, value = condition
+        if field == 'rating':
+            codes = [self.rating_names.index(rating) for rating in value if rating in self.rating_names]
+            matches = np.isin(self.rating_codes[rows], codes)
+            return matches if comparison != '!=' else ~matches & (self.rating_codes[rows] >= 0)
+        elif field == 'reviews':
+            column = np.array([graph.get_vertex(title).get_number_of_reviews() if title in graph else np.nan
+                               for title in self.titles[rows]], dtype=float)
+        else:
+            column = self.values[field][rows]
+
+        # comparisons with NaN (missing values) are False, except !=
+        return _COMPARISONS[comparison](column, value) & ~np.isnan(column)
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["operator", "re", "typing", "numpy", "pandas", "classes", "main"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,164 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the multi-seed preferences, where the user gives several favourite movies (the seeds),
+each with a weight, instead of one.
+
+The movie similarity of every movie becomes an aggregate of its genre similarity to every seed:
+    - 'weighted_mean': the weighted mean of the similarities, which is the genre similarity for a single seed
+    - 'sum': the weighted sum of the similarities, capped at 1, which favours movies similar to many seeds
+    - 'max': the highest weighted similarity, divided by the highest weight, which favours movies very similar
+      to any one seed
+
+Every aggregate is between 0 and 1, like a genre similarity, so that the weights of the seeds only decide how
+the seeds compare with each other, and never how the movie similarity compares with the genre similarity.
+
+The similarities are computed for every seed and movie at once from genre bitmasks (see movie_arrays), and only
+for the movies that share a genre with at least one seed, since the similarity of every other movie is 0.
+The seed with the highest weight becomes the preferred movie of the graph (see WeightedGraph.set_user_preferences),
+and the weight of the edge between it and every other movie becomes the aggregated similarity, so that the
+'similarity' and 'median' rankings of main.recommend_movies and both visualizations use it as the movie similarity.
+The other rankings are centred on that seed only.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import weakref
+
+import numpy as np
+
+from classes import WeightedGraph, _WeightedVertex
+from movie_arrays import genre_bitmask, popcount
+
+# The ways of aggregating the similarities of a movie to every seed.
+AGGREGATIONS = ('weighted_mean', 'sum', 'max')
+
+# The movies with known genres of every graph and their genre bitmasks, along with the number of vertices of the
+# graph when they were extracted, so that they are extracted again once the graph has new vertices.
+_GENRE_MASKS = weakref.WeakKeyDictionary()
+
+
+def seed_similarities(masks: np.ndarray, seed_masks: np.ndarray, weights: np.ndarray,
+                      aggregation: str = 'weighted_mean') -> np.ndarray:
+    """Returns the aggregated genre similarity (see the module description) of every movie, whose genre bitmasks
+    are masks, to the seeds, whose genre bitmasks are seed_masks and whose weights are weights.
+
+    Preconditions:
+        - len(seed_masks) == len(weights) > 0
+        - all(weight > 0 for weight in weights)
+        - aggregation in AGGREGATIONS
+
+    >>> masks = np.array([0b001, 0b011, 0b100, 0b1000], dtype=np.uint64)
+    >>> seed_masks = np.array([0b001, 0b110], dtype=np.uint64)
+    >>> seed_similarities(masks, seed_masks, np.array([3.0, 1.0])).tolist()
+    [0.75, 0.4583333333333333, 0.125, 0.0]
+    >>> seed_similarities(masks, seed_masks, np.array([3.0, 1.0]), 'max').tolist()
+    [1.0, 0.5, 0.16666666666666666, 0.0]
+    >>> seed_similarities(masks, seed_masks, np.array([3.0, 1.0]), 'sum').tolist()
+    [1.0, 1.0, 0.5, 0.0]
+    >>> all(0 <= similarity <= 1 for aggregation in AGGREGATIONS
+    ...     for similarity in seed_similarities(masks, seed_masks, np.array([5.0, 2.0]), aggregation))
+    True
+    """
+    similarities = np.zeros(len(masks))
+
+    # only the movies sharing a genre with a seed have a similarity above 0
+    rows = np.flatnonzero(masks & np.bitwise_or.reduce(seed_masks))
+    if len(rows) == 0:
+        return similarities
+
+    # the weighted genre similarity of every (seed, movie) pair, as one broadcast operation
+    candidates = masks[rows]
+    weighted = weights[:, np.newaxis] * (popcount(seed_masks[:, np.newaxis] & candidates)
+                                         / popcount(seed_masks[:, np.newaxis] | candidates))
+    if aggregation == 'sum':
+        similarities[rows] = np.minimum(weighted.sum(axis=0), 1.0)
+    elif aggregation == 'max':
+        similarities[rows] = weighted.max(axis=0) / weights.max()
+    else:
+        similarities[rows] = weighted.sum(axis=0) / weights.sum()
+    return similarities
+
+
+def _genre_masks(graph: WeightedGraph) -> tuple[list[_WeightedVertex], list[str], np.ndarray]:
+    """Returns the movies of graph with known genres, the genre represented by every bit of their genre bitmasks,
+    and their genre bitmasks, extracting them again only if the graph has new vertices.
+
+    Raise a ValueError if the movies have more than 64 distinct genres.
+    """
+    if graph not in _GENRE_MASKS or _GENRE_MASKS[graph][0] != graph.get_number_of_vertices():
+        movies = [v for v in graph.get_vertices() if v.kind in ('Movie', 'Chosen Movie') and v.genres is not None]
+        genre_names = list(dict.fromkeys(genre for v in movies for genre in v.genres))
+        if len(genre_names) > 64:
+            raise ValueError(f"{len(genre_names)} genres do not fit in a 64-bit genre mask")
+        masks = np.fromiter((genre_bitmask(genre_names, v.genres) for v in movies), dtype=np.uint64,
+                            count=len(movies))
+        _GENRE_MASKS[graph] = (graph.get_number_of_vertices(), movies, genre_names, masks)
+    return _GENRE_MASKS[graph][1:]
+
+
+def set_seed_preferences(graph: WeightedGraph, seeds: dict[str, float], genres: set[str],
+                         aggregation: str = 'weighted_mean') -> dict[str, float]:
+    """Centres graph on the given seeds, mapped to their weights, and the given preferred genres, and returns
+    the aggregated similarity of every movie with known genres to the seeds, by title.
+
+    The seed with the highest weight (the first one, if several have it) becomes the preferred movie, and the
+    weight of its edge to every other movie with known genres becomes the aggregated similarity of that movie
+    (see WeightedGraph.set_seed_movies). A seed whose genres are unknown adds nothing to the similarities.
+
+    Raise a ValueError if there is no seed, if a seed is not a movie of graph or has a weight of 0 or less,
+    or if aggregation is not in AGGREGATIONS.
+
+    >>> g = WeightedGraph()
+    >>> for title, genres in [("Alien", {"Sci-fi"}), ("Heat", {"Crime"}), ("Se7en", {"Crime", "Sci-fi"})]:
+    ...     g.add_vertex(title, "Movie", genres)
+    >>> set_seed_preferences(g, {"Alien": 3.0, "Heat": 1.0}, {"Crime"})
+    {'Alien': 0.75, 'Heat': 0.25, 'Se7en': 0.5}
+    >>> g.preferred_movie, g.get_vertex("Se7en").neighbours[g.get_vertex("Alien")], g.get_vertex("Heat").preferred
+    ('Alien', 0.5, True)
+    """
+    if not seeds or any(title not in graph or weight <= 0 for title, weight in seeds.items()):
+        raise ValueError(f"Invalid seeds: {seeds}")
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {aggregation}")
+
+    graph.set_user_preferences(max(seeds, key=seeds.get), genres)
+
+    movies, genre_names, masks = _genre_masks(graph)
+    seed_masks = np.fromiter((genre_bitmask(genre_names, graph.get_vertex(title).genres or ()) for title in seeds),
+                             dtype=np.uint64, count=len(seeds))
+    weights = np.fromiter(seeds.values(), dtype=float, count=len(seeds))
+    similarities = dict(zip((v.item for v in movies), seed_similarities(masks, seed_masks, weights,
+                                                                         aggregation).tolist()))
+    graph.set_seed_movies(seeds, similarities)
+    return similarities
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["weakref", "numpy", "classes", "movie_arrays"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,260 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains an alternative ranking mode: personalized PageRank, also known as a random walk
+with restart, over the bipartite graph of movies and their reviews.
+
+A random walker starts at the user's favourite movie. At every step, with probability damping, it follows
+an edge between a movie and one of its review scores (edges to higher scores are followed more often);
+otherwise it restarts. Restarts go back to the favourite movie, or (with probability genre_restart) to a
+movie picked in proportion to its overall genre similarity. Movies are ranked by the probability of
+finding the walker on them, which rewards movies that share many well-reviewed scores with the movies
+the user likes.
+
+The walk is computed by power iteration over NumPy arrays of the edges. The edge arrays only depend on
+the reviews, so they are built once per graph and reused for every preference.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import weakref
+from typing import Collection, Optional
+
+import numpy as np
+
+from classes import WeightedGraph, _WeightedVertex
+from movie_arrays import MovieArrays, genre_similarities, restrict_scores, top_rows
+
+# The PersonalizedPageRank of every graph ranked so far, so that its arrays are only built once per graph.
+_RANKERS = weakref.WeakKeyDictionary()
+
+
+class PersonalizedPageRank:
+    """A personalized PageRank ranking of the movies of a WeightedGraph.
+
+    Instance Attributes:
+        - arrays: The movies and reviews of the graph.
+        - damping: The probability that the walker follows an edge instead of restarting.
+        - genre_restart: The probability that a restart goes to a genre-similar movie instead of the favourite.
+        - tolerance: The iteration stops once the total change of the probabilities is below this value.
+        - max_iterations: The maximum number of iterations.
+        - iterations: The number of iterations used by the most recent call to scores.
+
+    Representation Invariants:
+        - 0 < self.damping < 1
+        - 0 <= self.genre_restart <= 1
+        - self.tolerance > 0
+        - self.max_iterations > 0
+    """
+    # Private Instance Attributes:
+    #     - _movie_to_review:
+    #         For every movie-review edge, the probability that the walker moves from the movie to the review.
+    #     - _review_to_movie:
+    #         For every movie-review edge, the probability that the walker moves from the review to the movie.
+    #     - _dangling:
+    #         Marks the vertices (movies, then reviews) that have no edge to follow.
+    #     - _previous:
+    #         The probabilities computed by the most recent call to scores, used as the starting point
+    #         of the next call, or None.
+    arrays: MovieArrays
+    damping: float
+    genre_restart: float
+    tolerance: float
+    max_iterations: int
+    iterations: int
+    _movie_to_review: np.ndarray
+    _review_to_movie: np.ndarray
+    _dangling: np.ndarray
+    _previous: Optional[np.ndarray]
+
+    def __init__(self, arrays: MovieArrays, damping: float = 0.85, genre_restart: float = 0.5,
+                 tolerance: float = 1e-6, max_iterations: int = 100) -> None:
+        """Initialize the ranking of the movies in the given arrays."""
+        self.arrays = arrays
+        self.damping = damping
+        self.genre_restart = genre_restart
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.iterations = 0
+        self._previous = None
+        self._update_transitions()
+
+    def _update_transitions(self) -> None:
+        """Compute the probability of following every edge of self.arrays."""
+        arrays = self.arrays
+
+        # every edge is weighted by its review score, and the weights leaving each vertex are normalized
+        num_movies, num_reviews = len(arrays.titles), len(arrays.review_scores)
+        weights = arrays.review_scores[arrays.edge_reviews]
+        movie_totals = np.bincount(arrays.edge_movies, weights, minlength=num_movies)
+        review_totals = np.bincount(arrays.edge_reviews, weights, minlength=num_reviews)
+        self._movie_to_review = np.divide(weights, movie_totals[arrays.edge_movies],
+                                          out=np.zeros(len(weights)), where=weights > 0)
+        self._review_to_movie = np.divide(weights, review_totals[arrays.edge_reviews],
+                                          out=np.zeros(len(weights)), where=weights > 0)
+        self._dangling = np.concatenate([movie_totals == 0, review_totals == 0])
+
+    def add_edges(self, edges: list[tuple[_WeightedVertex, _WeightedVertex]]) -> None:
+        """Add the given (movie vertex, review vertex) edges, which were added to the graph after this ranking
+        was created.
+
+        The next call to scores still starts from the previous result, with no probability on the new reviews.
+
+        Preconditions:
+            - all(movie.item in self.arrays.index for movie, _ in edges)
+            - no edge in edges is already in self.arrays
+        """
+        self.arrays.add_edges(edges)
+        self._update_transitions()
+        if self._previous is not None:
+            self._previous = np.concatenate([self._previous, np.zeros(len(self._dangling) - len(self._previous))])
+
+    def restart_vector(self, movie: str, genres: set[str]) -> np.ndarray:
+        """Returns the probability of restarting at each movie, for the given favourite movie and genres.
+
+        Preconditions:
+            - movie in self.arrays.index
+        """
+        num_movies = len(self.arrays.titles)
+        row = self.arrays.index[movie]
+        restart = np.zeros(num_movies)
+
+        # spread part of the restarts over the movies, in proportion to their overall genre similarity,
+        # computed with the same weights as _WeightedVertex.overall_similarity_score
+        masks = self.arrays.genre_masks
+        similarity = (genre_similarities(masks, int(masks[row])) * 0.5
+                      + genre_similarities(masks, self.arrays.genre_mask(genres)) * 0.5)
+        similarity[row] = 0
+        if similarity.sum() > 0:
+            restart += self.genre_restart * similarity / similarity.sum()
+            restart[row] += 1 - self.genre_restart
+        else:
+            restart[row] = 1
+
+        return restart
+
+    def scores(self, movie: str, genres: set[str]) -> np.ndarray:
+        """Returns the personalized PageRank of every movie (in row order) for the given favourite movie
+        and genres.
+
+        The iteration starts from the result of the previous call, so it converges in fewer iterations
+        when the preferences only changed slightly.
+
+        Preconditions:
+            - movie in self.arrays.index
+        """
+        arrays = self.arrays
+        num_movies = len(arrays.titles)
+        restart = np.concatenate([self.restart_vector(movie, genres), np.zeros(len(arrays.review_scores))])
+        current = restart if self._previous is None else self._previous
+
+        self.iterations = 0
+        while self.iterations < self.max_iterations:
+            self.iterations += 1
+
+            # follow one edge from every vertex: movies to reviews, and reviews to movies
+            moved = np.concatenate([
+                np.bincount(arrays.edge_movies, current[num_movies:][arrays.edge_reviews] * self._review_to_movie,
+                            minlength=num_movies),
+                np.bincount(arrays.edge_reviews, current[arrays.edge_movies] * self._movie_to_review,
+                            minlength=len(arrays.review_scores))
+            ])
+
+            # walkers with no edge to follow restart, as do the walkers that do not follow an edge
+            stuck = current[self._dangling].sum()
+            following = self.damping * (moved + stuck * restart) + (1 - self.damping) * restart
+
+            # stop once the probabilities no longer change
+            change = np.abs(following - current).sum()
+            current = following
+            if change < self.tolerance:
+                break
+
+        self._previous = current
+        return current[:num_movies].copy()
+
+    def rank(self, graph: WeightedGraph, limit: int,
+             candidates: Optional[Collection[str]] = None) -> list[tuple[_WeightedVertex, float]]:
+        """Returns the top limit movies for the preferences of graph, as (movie vertex, score) pairs
+        sorted by score in descending order. The preferred movie itself is not included.
+
+        If candidates is given, only the movies with these titles are ranked (see movie_filters).
+
+        Preconditions:
+            - limit > 0
+            - graph.preferred_movie in self.arrays.index
+
+        >>> g = WeightedGraph()
+        >>> for title in ["Alien", "Aliens", "Cats"]:
+        ...     g.add_vertex(title, "Movie", {"Sci-fi"} if title.startswith("Alien") else {"Musical"})
+        >>> for score in [0.9, 0.2]:
+        ...     g.add_vertex(score, "Review")
+        >>> g.add_edge("Alien", 0.9)
+        >>> g.add_edge("Aliens", 0.9)
+        >>> g.add_edge("Cats", 0.2)
+        >>> g.set_user_preferences("Alien", {"Sci-fi"})
+        >>> [movie.item for movie, _ in get_ranker(g).rank(g, 2)]
+        ['Aliens', 'Cats']
+        """
+        return [(self.arrays.movies[row], score)
+                for row, score in self.top(graph.preferred_movie, graph.preferred_genres, limit, candidates)]
+
+    def top(self, movie: str, genres: set[str], limit: int,
+            candidates: Optional[Collection[str]] = None) -> list[tuple[int, float]]:
+        """Returns the rows of the top limit movies for the given favourite movie and genres, as (row, score)
+        pairs sorted by score in descending order. The favourite movie itself is not included.
+
+        If candidates is given, only the movies with these titles are ranked.
+
+        Preconditions:
+            - limit > 0
+            - movie in self.arrays.index
+        """
+        scores = self.scores(movie, genres)
+        scores[self.arrays.index[movie]] = -np.inf
+        if candidates is not None:
+            restrict_scores(scores, self.arrays.index, candidates)
+        return [(row, float(scores[row])) for row in top_rows(scores, limit)]
+
+
+def update_ranker(graph: WeightedGraph, edges: list[tuple[_WeightedVertex, _WeightedVertex]]) -> None:
+    """Add the given new (movie vertex, review vertex) edges of graph to its PersonalizedPageRank, if it has one."""
+    if graph in _RANKERS:
+        _RANKERS[graph].add_edges(edges)
+
+
+def get_ranker(graph: WeightedGraph) -> PersonalizedPageRank:
+    """Returns the PersonalizedPageRank of the given graph, creating it the first time the graph is ranked."""
+    if graph not in _RANKERS:
+        _RANKERS[graph] = PersonalizedPageRank(MovieArrays(graph))
+    return _RANKERS[graph]
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["weakref", "typing", "numpy", "classes", "movie_arrays"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,187 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the helpers of the prefork worker mode of batch.py and server.py, where the data is
+loaded once and then shared by worker processes forked from the loading process.
+
+A forked worker shares the memory pages of its parent until either process writes to them. Reading a Python
+object still writes to it (its reference count), and every collection of the garbage collector writes to
+every object it scans, so without care every worker ends up with a private copy of most of the graph.
+pause_collection disables the garbage collector while the data is loaded, freeze_loaded_data then moves the
+loaded objects out of its reach just before forking, and resume_collection enables it again in every worker.
+memory_usage reports how much memory each worker really uses:
+    - rss: the resident memory of the process, including the pages it shares
+    - pss: the proportional memory, where every shared page is divided between the processes sharing it
+    - uss: the unique memory, made of the pages no other process shares, which is what one more worker costs
+
+The memory is read from /proc/<pid>/smaps_rollup, so it is only reported on Linux.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import gc
+import os
+import signal
+import sys
+import time
+import traceback
+from typing import Callable
+
+# The fields of /proc/<pid>/smaps_rollup that make up the memory reported by memory_usage.
+_SMAPS_FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Private_Clean': 'uss', 'Private_Dirty': 'uss'}
+
+
+def pause_collection() -> None:
+    """Disable the garbage collector before the data is loaded, so that it neither scans the loaded objects
+    again and again while they are created, nor frees the memory between them that forked workers would write to.
+    """
+    gc.disable()
+
+
+def freeze_loaded_data() -> None:
+    """Move every object to the permanent generation of the garbage collector, so that the collections of forked
+    workers never scan the loaded objects (and never write to their memory pages).
+
+    Call pause_collection before loading the data, and this once the data is loaded and its caches are built,
+    just before forking the workers. The garbage collector stays disabled in this process until
+    resume_collection is called.
+    """
+    gc.freeze()
+
+
+def resume_collection(unfreeze: bool = False) -> None:
+    """Enable the garbage collector again, in a forked worker or once the workers are done.
+    If unfreeze is True, the frozen objects are also moved back to the generations the garbage collector scans.
+    """
+    if unfreeze:
+        gc.unfreeze()
+    gc.enable()
+
+
+def memory_usage(pid: int = 0) -> dict[str, int]:
+    """Returns the rss, pss and uss (see the module description) of the process with the given pid (or of this
+    process, if pid is 0) in bytes, or an empty dict if they cannot be read.
+    """
+    usage = {'rss': 0, 'pss': 0, 'uss': 0}
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup", 'r', encoding="utf-8") as file:
+            for line in file:
+                field, _, value = line.partition(':')
+                if field in _SMAPS_FIELDS:
+                    usage[_SMAPS_FIELDS[field]] += int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+
+    # a process that has exited has no mapped memory left to report
+    return usage if usage['rss'] > 0 else {}
+
+
+def format_memory(usage: dict[str, int]) -> str:
+    """Returns the given memory usage (see memory_usage) in MiB, as a short string.
+
+    >>> format_memory({'rss': 300 << 20, 'pss': 120 << 20, 'uss': 15 << 19})
+    'uss 7.5 MiB, pss 120.0 MiB, rss 300.0 MiB'
+    >>> format_memory({})
+    'memory unavailable'
+    """
+    if not usage:
+        return 'memory unavailable'
+    return ', '.join(f"{field} {round(usage[field] / (1 << 20), 1)} MiB" for field in ('uss', 'pss', 'rss'))
+
+
+def fork_workers(num_workers: int, run: Callable[[], None]) -> list[int]:
+    """Forks num_workers worker processes that each call run and then exit, and returns their pids.
+
+    The workers share the memory of this process when it forks them, so the data should be loaded
+    (and frozen, see freeze_loaded_data) first. Every worker enables its garbage collector before calling run.
+
+    Preconditions:
+        - num_workers > 0
+        - the 'fork' start method is available (os.fork exists)
+    """
+    # flush the output first, so that the workers do not print it again
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pids = []
+    for _ in range(num_workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                resume_collection()
+                run()
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        pids.append(pid)
+    return pids
+
+
+def wait_for_workers(pids: list[int], interval: float = 1.0) -> dict[int, dict[str, int]]:
+    """Waits until every worker in pids has exited, and returns the last memory usage read from every worker.
+    The memory usage of the running workers is read every interval seconds.
+
+    SIGINT and SIGTERM are forwarded to the running workers as SIGTERM.
+
+    Preconditions:
+        - interval > 0
+    """
+    memory, running = {}, set(pids)
+
+    def stop_workers(_signum: int, _frame: object) -> None:
+        """Ask the running workers to stop."""
+        for pid in running:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous = {sig: signal.signal(sig, stop_workers) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        while running:
+            for pid in list(running):
+                if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                    running.discard(pid)
+                elif usage := memory_usage(pid):
+                    memory[pid] = usage
+            if running:
+                time.sleep(interval)
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    return memory
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["gc", "os", "signal", "sys", "time", "traceback", "typing"],
+        'allowed-io': ["memory_usage"],
+        'max-line-length': 120
+    })
@@ -0,0 +1,127 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the headless print mode, which prints the recommendations for one or more favourite movies
+without any interactive prompts, for example in a terminal without a display.
+
+Unlike main.py, it never imports tkinter, plotly or networkx, which are slow to import and only needed to
+prompt the user and to plot the recommendations, so the first recommendations are printed sooner.
+The 'startup' benchmark of benchmarks.py measures how soon.
+
+Usage:
+    python recommend.py Inception --genres Action Sci-fi --limit 10
+    python recommend.py Inception Heat --weights 2 1 --aggregation max
+    python recommend.py Inception --ranking similarity --cluster-index index.npz --nprobe 4
+
+The movies are titles from the movie dataset, or movie ids if --by-id is given. With several movies, their
+similarities are aggregated as described in multi_seed.py.
+
+With --cluster-index index.npz (built by cluster_index.py), the 'similarity' and 'median' rankings only score the
+movies of the --nprobe clusters nearest to every favourite movie, instead of every movie.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Any, Optional
+
+from classes import WeightedGraph
+from cluster_index import DEFAULT_NPROBE, ClusterIndex
+import batch
+import main
+import multi_seed
+
+
+def print_recommendations(reviews_file: str, movie_file: str, profile: dict[str, Any], limit: int,
+                          ranking: str = main.INTERACTIVE_RANKING, diversity: float = 0.0,
+                          index: Optional[ClusterIndex] = None, nprobe: int = DEFAULT_NPROBE) -> WeightedGraph:
+    """Loads the datasets, centres the full graph on the favourite movie(s) and genres of profile (as described in
+    batch.py), prints its top limit recommendations (diversified by diversity) with main.print_recommended_movies
+    and returns the graph.
+
+    If index is given, only the movies of the nprobe clusters of index nearest to every favourite movie are scored
+    (see ClusterIndex.candidates).
+
+    Raise a ValueError if a movie of the profile is not in the movie dataset, if its genres are not a list of
+    strings, or if its aggregation is unknown.
+    The movies are looked up before the reviews are loaded, since they take most of the loading time.
+
+    Preconditions:
+        - reviews_file is a path to a valid CSV file with review data.
+        - movie_file is a path to a valid CSV file with movie data.
+        - limit > 0
+        - ranking in main.RANKINGS
+        - 0 <= diversity <= 1
+        - nprobe > 0
+        - index is None or ranking in {'similarity', 'median'}
+    """
+    graph = WeightedGraph()
+    dict_list, _ = main.load_movie_columns(movie_file, graph)
+    _, title = batch.find_favourite_movie(dict_list, profile)
+    genres = batch.find_favourite_genres(profile)
+    seeds = batch.find_seed_movies(dict_list, profile)
+    if profile.get('aggregation', 'weighted_mean') not in multi_seed.AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {profile['aggregation']}")
+
+    # the critics and review dates are only loaded if the ranking needs them
+    main.load_review_columns(reviews_file, [graph], dict_list, ranking == 'critics', with_dates=ranking == 'recent')
+
+    if seeds:
+        multi_seed.set_seed_preferences(graph, seeds, genres, profile.get('aggregation', 'weighted_mean'))
+    else:
+        graph.set_user_preferences(title, genres)
+
+    candidates = None
+    if index is not None:
+        candidates = set().union(*(index.candidates(graph.get_vertex(movie).genres or (), genres, nprobe, limit)
+                                   for movie in graph.seed_movies))
+    main.print_recommended_movies(graph, limit, True, ranking, candidates, diversity)
+    return graph
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the recommendations for one favourite movie.")
+    parser.add_argument('movie', nargs='+', help="titles of the favourite movies")
+    parser.add_argument('--weights', nargs='+', type=float, default=[], help="weight of each favourite movie")
+    parser.add_argument('--aggregation', choices=multi_seed.AGGREGATIONS, default='weighted_mean',
+                        help="how the similarities to several favourite movies are aggregated")
+    parser.add_argument('--by-id', action='store_true', help="the movie is a movie id instead of a title")
+    parser.add_argument('--genres', nargs='*', default=[], help="favourite genres")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--ranking', choices=main.RANKINGS, default=main.INTERACTIVE_RANKING)
+    parser.add_argument('--diversity', type=float, default=0.0,
+                        help="trade-off between score (0) and genre diversity (1) of the recommendations")
+    parser.add_argument('--cluster-index', default='', help=".npz cluster index saved by cluster_index.py")
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE,
+                        help="number of clusters of the cluster index scored for every favourite movie")
+    args = parser.parse_args()
+    if args.cluster_index and args.ranking not in ('similarity', 'median'):
+        parser.error("--cluster-index only applies to the 'similarity' and 'median' rankings")
+
+    key = 'movie_id' if args.by_id else 'movie'
+    weights = args.weights or [1.0] * len(args.movie)
+    if len(weights) != len(args.movie):
+        parser.error("give one weight per favourite movie")
+    try:
+        print_recommendations(args.reviews, args.movies,
+                              {key: args.movie[0], 'weight': weights[0], 'genres': args.genres,
+                               'aggregation': args.aggregation,
+                               'seeds': [{key: movie, 'weight': weight}
+                                         for movie, weight in zip(args.movie[1:], weights[1:])]},
+                              args.limit, args.ranking, args.diversity,
+                              ClusterIndex.load(args.cluster_index) if args.cluster_index else None, args.nprobe)
+    except ValueError as error:
+        parser.error(str(error))
@@ -0,0 +1,117 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the diversity-aware re-ranking of recommendations by maximal marginal relevance (MMR).
+
+The top movies of a ranking often share the exact genres of the favourite movie. MMR re-ranks the top
+MMR_CANDIDATES movies of a ranking by picking one movie at a time: the movie with the highest
+    (1 - diversity) * relevance - diversity * (highest genre similarity to a movie already picked)
+where the relevance of a movie is its score divided by the highest score of the candidates. A diversity of 0
+keeps the order of the ranking, and a higher diversity favours movies whose genres differ from those picked.
+
+The genres of the candidates are stored as bitmasks (see movie_arrays), and the highest genre similarity of every
+candidate to the movies already picked is updated for all the candidates at once after every pick, so picking
+k movies out of N candidates takes k vectorized passes over N bitmasks.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from classes import WeightedGraph, _WeightedVertex
+from movie_arrays import genre_bitmask, genre_similarities
+
+# The number of top movies of a ranking that are re-ranked.
+MMR_CANDIDATES = 1000
+
+
+def mmr_rows(relevance: np.ndarray, masks: np.ndarray, limit: int, diversity: float) -> list[int]:
+    """Returns the indices of the (at most) limit candidates picked by MMR (see the module description), in the
+    order they were picked, where relevance and masks hold the score and the genre bitmask of every candidate.
+    Equal values are broken by index. A candidate whose genres are unknown (mask 0) is similar to no other movie.
+
+    Preconditions:
+        - len(relevance) == len(masks)
+        - all(score >= 0 for score in relevance)
+        - 0 <= diversity <= 1
+
+    >>> masks = np.array([0b011, 0b011, 0b100], dtype=np.uint64)
+    >>> mmr_rows(np.array([0.9, 0.8, 0.5]), masks, 2, 0.0)
+    [0, 1]
+    >>> mmr_rows(np.array([0.9, 0.8, 0.5]), masks, 2, 0.5)
+    [0, 2]
+    >>> mmr_rows(np.array([0.9, 0.8, 0.5]), masks, 5, 0.5)
+    [0, 2, 1]
+    """
+    top = relevance.max(initial=0)
+    gains = (1 - diversity) * (relevance / top if top > 0 else relevance)
+
+    # the highest genre similarity of every candidate to the candidates picked so far
+    max_similarity = np.zeros(len(relevance))
+    available = np.ones(len(relevance), dtype=bool)
+    picked = []
+    for _ in range(min(limit, len(relevance))):
+        best = int(np.argmax(np.where(available, gains - diversity * max_similarity, -np.inf)))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_similarity, genre_similarities(masks, int(masks[best])), out=max_similarity)
+    return picked
+
+
+def rerank(recommendations: list[tuple[_WeightedVertex, float]], limit: int,
+           diversity: float) -> list[tuple[_WeightedVertex, float]]:
+    """Returns the (at most) limit (movie vertex, score) pairs of recommendations picked by MMR, in the order they
+    were picked, where recommendations is sorted by score in descending order (as main.recommend_movies returns).
+
+    Raise a ValueError if the movies have more than 64 distinct genres.
+
+    Preconditions:
+        - all(score >= 0 for _, score in recommendations)
+        - 0 <= diversity <= 1
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex("Predator", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex("Up", "Movie", {"Animation"})
+    >>> ranked = [(g.get_vertex("Aliens"), 0.9), (g.get_vertex("Predator"), 0.8), (g.get_vertex("Up"), 0.5)]
+    >>> [(movie.item, score) for movie, score in rerank(ranked, 2, 0.5)]
+    [('Aliens', 0.9), ('Up', 0.5)]
+    """
+    genre_names = list(dict.fromkeys(genre for movie, _ in recommendations for genre in (movie.genres or ())))
+    if len(genre_names) > 64:
+        raise ValueError(f"{len(genre_names)} genres do not fit in a 64-bit genre mask")
+
+    masks = np.fromiter((genre_bitmask(genre_names, movie.genres or ()) for movie, _ in recommendations),
+                        dtype=np.uint64, count=len(recommendations))
+    relevance = np.fromiter((score for _, score in recommendations), dtype=float, count=len(recommendations))
+    return [recommendations[i] for i in mmr_rows(relevance, masks, limit, diversity)]
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["numpy", "classes", "movie_arrays"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,423 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the ReviewHistory class, which keeps the date of every review so that movies can be
+scored by their recent reviews (the 'recent' ranking of main.recommend_movies).
+
+The review vertices of a WeightedGraph are shared by every movie with the same score and have no date, so the
+history stores every dated review separately: the reviews of each movie are sorted by date, with prefix sums
+of their scores. The reviews of a movie within a window of dates are then found by binary search, and their
+(decayed) average is the difference of two prefix sums, so no review is visited again after loading.
+New reviews are merged into the sorted reviews of their movies, and only the sums of these movies are updated.
+
+With exponential decay, a review that is half_life days older than another one has half its weight. The
+decayed average of a set of reviews does not depend on the date it is computed at, since moving that date
+multiplies every weight by the same factor.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import weakref
+from typing import Collection, Optional
+
+import numpy as np
+
+from classes import WeightedGraph, _WeightedVertex
+from movie_arrays import MovieArrays, restrict_scores, similarity_scores, top_rows
+import pagerank
+
+# The default half-life of the reviews, in days.
+DEFAULT_HALF_LIFE = 365.0
+
+# The review history of every graph loaded with review dates, which is discarded with the graph.
+_HISTORIES = weakref.WeakKeyDictionary()
+
+
+class ReviewHistory:
+    """The dated reviews of the movies of a graph, sorted by date within each movie.
+
+    Dates are numbers of days since 1970-01-01.
+
+    Instance Attributes:
+        - titles: The title of the movie in each row.
+        - index: Maps each title to its row.
+        - starts: The reviews of the movie in row i are at positions starts[i] to starts[i + 1] - 1.
+        - dates: The date of every review.
+        - scores: The score of every review.
+        - half_life: The number of days after which the weight of a review is halved, or inf for no decay.
+        - since: The first date of the reviews used by rank.
+        - until: The last date of the reviews used by rank.
+        - min_number_of_reviews: The number of reviews a movie needs within the window to be scored by rank.
+
+    Representation Invariants:
+        - len(self.starts) == len(self.titles) + 1
+        - len(self.dates) == len(self.scores) == self.starts[-1]
+        - self.half_life > 0
+        - self.min_number_of_reviews > 0
+    """
+    # Private Instance Attributes:
+    #     - _rows:
+    #         The row of the movie of every review.
+    #     - _keys:
+    #         The row and date of every review combined into one sorted number, so that the window of
+    #         every movie can be found with one np.searchsorted.
+    #     - _first_date:
+    #         The earliest date of any review.
+    #     - _span:
+    #         The number of keys given to each row, which is more than the number of days between the reviews.
+    #     - _score_sums:
+    #         The sum of the scores of the reviews of the same movie, up to and including each position.
+    #     - _weighted_sums, _weight_sums:
+    #         The sum of the decayed weights (times the scores) of the reviews of the same movie, up to and
+    #         including each position. The weight of the latest review of every movie is 1.
+    #     - _aligned:
+    #         The MovieArrays that rank last used, and the row of each of their movies in this history (or -1).
+    titles: np.ndarray
+    index: dict[str, int]
+    starts: np.ndarray
+    dates: np.ndarray
+    scores: np.ndarray
+    half_life: float
+    since: float
+    until: float
+    min_number_of_reviews: int
+    _rows: np.ndarray
+    _keys: np.ndarray
+    _first_date: float
+    _span: float
+    _score_sums: np.ndarray
+    _weighted_sums: np.ndarray
+    _weight_sums: np.ndarray
+    _aligned: Optional[tuple[MovieArrays, np.ndarray]]
+
+    def __init__(self, titles: list[str], dates: np.ndarray, scores: np.ndarray,
+                 half_life: float = DEFAULT_HALF_LIFE) -> None:
+        """Initialize the history of the reviews with the given movie titles, dates and scores (one per review).
+        Reviews without a date (NaN) are left out.
+
+        Preconditions:
+            - len(titles) == len(dates) == len(scores)
+            - half_life > 0
+
+        >>> history = ReviewHistory(['Up', 'Heat', 'Up'], np.array([20.0, 10.0, 0.0]), np.array([1.0, 0.5, 0.0]),
+        ...                         half_life=20)
+        >>> history.titles.tolist(), history.starts.tolist(), history.scores.tolist()
+        (['Up', 'Heat'], [0, 2, 3], [0.0, 1.0, 0.5])
+        >>> history.statistics('Up')
+        (2, 0.5, 0.6666666666666666)
+        """
+        self.since, self.until, self.min_number_of_reviews = -np.inf, np.inf, 3
+        self._aligned = None
+        self._build(list(titles), np.asarray(dates, dtype=float), np.asarray(scores, dtype=float))
+        self.half_life = np.nan
+        self.set_half_life(half_life)
+
+    def _build(self, titles: list[str], dates: np.ndarray, scores: np.ndarray) -> None:
+        """Sort the given reviews by movie and date, and compute the sums of their scores."""
+        # pandas is only imported here, so that importing this module (and main) stays fast
+        import pandas as pd
+
+        dated = ~np.isnan(dates)
+
+        # number the movies in order of their first review, then sort the reviews by row and date
+        rows, unique_titles = pd.factorize(np.array(titles, dtype=object)[dated])
+        dates, scores = dates[dated], scores[dated]
+        order = np.lexsort((dates, rows))
+
+        self.titles = np.asarray(unique_titles, dtype=object)
+        self.index = {title: row for row, title in enumerate(self.titles)}
+        self._rows, self.dates, self.scores = rows[order], dates[order], scores[order]
+        self.starts = np.concatenate([[0], np.cumsum(np.bincount(self._rows, minlength=len(self.titles)))])
+
+        self._first_date = float(self.dates.min()) if len(self.dates) > 0 else 0.0
+        self._span = (float(self.dates.max()) - self._first_date + 2) if len(self.dates) > 0 else 2.0
+        self._keys = self._rows * self._span + (self.dates - self._first_date)
+        self._score_sums, self._weight_sums, self._weighted_sums = (np.empty(len(self.dates)) for _ in range(3))
+
+    def set_half_life(self, half_life: float) -> None:
+        """Set the half-life of the reviews, in days (inf for no decay), and recompute the decayed sums of every
+        movie from the stored reviews.
+
+        Preconditions:
+            - half_life > 0
+        """
+        if half_life == self.half_life:
+            return
+        self.half_life = half_life
+        self._update_sums(np.arange(len(self.titles)))
+
+    def _update_sums(self, rows: np.ndarray) -> None:
+        """Compute the sums of the scores and the decayed sums of the reviews of the movies in the given rows."""
+        # the positions of the reviews of these movies, and where the reviews of each movie start among them
+        lengths = self.starts[rows + 1] - self.starts[rows]
+        segment_starts = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.arange(segment_starts[-1]) + np.repeat(self.starts[rows] - segment_starts[:-1], lengths)
+
+        # weigh every review relative to the latest review of its movie, so that no weight overflows
+        latest = np.repeat(self.dates[self.starts[rows + 1] - 1], lengths)
+        weights = np.exp2((self.dates[positions] - latest) / self.half_life)
+        scores = self.scores[positions]
+
+        # the sums restart at every movie, so that the sums of old reviews keep their precision
+        self._score_sums[positions] = _segment_cumsum(scores, segment_starts)
+        self._weight_sums[positions] = _segment_cumsum(weights, segment_starts)
+        self._weighted_sums[positions] = _segment_cumsum(weights * scores, segment_starts)
+
+    def set_window(self, since: float = -np.inf, until: float = np.inf) -> None:
+        """Set the window of dates (inclusive) of the reviews used by rank."""
+        self.since, self.until = since, until
+
+    def apply_options(self, options: dict) -> None:
+        """Set the half-life and window of this history from the optional "half_life" (in days), "since" and
+        "until" (dates such as 2015, 2015-06 or 2015-06-30) of a batch profile or server request.
+        The half-life defaults to DEFAULT_HALF_LIFE, and the window to every date.
+
+        Raise a ValueError if an option is not valid.
+
+        >>> history = ReviewHistory([], np.empty(0), np.empty(0))
+        >>> history.apply_options({'half_life': 30, 'since': '1970-01-11'})
+        >>> history.half_life, history.since, history.until
+        (30.0, 10.0, inf)
+        """
+        half_life = float(options.get('half_life', DEFAULT_HALF_LIFE))
+        if not half_life > 0:
+            raise ValueError(f"Invalid half-life: {half_life}")
+        self.set_half_life(half_life)
+        since, until = options.get('since'), options.get('until')
+        self.set_window(-np.inf if since is None else _parse_day(since), np.inf if until is None else _parse_day(until))
+
+    def add_reviews(self, titles: list[str], dates: np.ndarray, scores: np.ndarray) -> None:
+        """Add the given reviews (one movie title, date and score per review) to this history.
+        Reviews without a date (NaN) are left out.
+
+        The new reviews are merged into the sorted reviews of their movies, after the reviews with the same date,
+        and only the sums of these movies are computed again. New movies get the next rows, in order of their
+        first review.
+
+        Preconditions:
+            - len(titles) == len(dates) == len(scores)
+
+        >>> history = ReviewHistory(['Up', 'Heat'], np.array([20.0, 10.0]), np.array([1.0, 0.5]), half_life=20)
+        >>> history.add_reviews(['Jaws', 'Up', 'Up'], np.array([5.0, 0.0, np.nan]), np.array([0.8, 0.0, 0.3]))
+        >>> history.titles.tolist(), history.starts.tolist(), history.scores.tolist()
+        (['Up', 'Heat', 'Jaws'], [0, 2, 3, 4], [0.0, 1.0, 0.5, 0.8])
+        >>> history.statistics('Up')
+        (2, 0.5, 0.6666666666666666)
+        """
+        dates, scores = np.asarray(dates, dtype=float), np.asarray(scores, dtype=float)
+        dated = ~np.isnan(dates)
+        titles = [title for title, has_date in zip(titles, dated.tolist()) if has_date]
+        dates, scores = dates[dated], scores[dated]
+        if len(dates) == 0:
+            return
+
+        # number the new movies
+        num_titles = len(self.titles)
+        rows = np.fromiter((self.index.setdefault(title, len(self.index)) for title in titles), dtype=np.int64,
+                           count=len(titles))
+        if len(self.index) > num_titles:
+            new_titles = np.empty(len(self.index) - num_titles, dtype=object)
+            new_titles[:] = list(self.index)[num_titles:]
+            self.titles = np.concatenate([self.titles, new_titles])
+            self._aligned = None
+
+        # widen the range of the keys if the new reviews are dated outside of it
+        first, last = float(dates.min()), float(dates.max())
+        if len(self.dates) > 0:
+            first, last = min(first, self._first_date), max(last, self._first_date + self._span - 2)
+        if first != self._first_date or last - first + 2 != self._span:
+            self._first_date, self._span = first, last - first + 2
+            self._keys = self._rows * self._span + (self.dates - self._first_date)
+
+        # insert the new reviews, sorted by row and date, after the stored reviews with the same key
+        keys = rows * self._span + (dates - self._first_date)
+        order = np.argsort(keys, kind='stable')
+        positions = np.searchsorted(self._keys, keys[order], 'right')
+        self._keys = np.insert(self._keys, positions, keys[order])
+        self._rows = np.insert(self._rows, positions, rows[order])
+        self.dates = np.insert(self.dates, positions, dates[order])
+        self.scores = np.insert(self.scores, positions, scores[order])
+        self._score_sums, self._weight_sums, self._weighted_sums = (
+            np.insert(sums, positions, 0.0) for sums in (self._score_sums, self._weight_sums, self._weighted_sums))
+
+        added = np.bincount(rows, minlength=len(self.titles))
+        lengths = np.concatenate([np.diff(self.starts), np.zeros(len(self.titles) - num_titles, dtype=np.int64)])
+        self.starts = np.concatenate([[0], np.cumsum(lengths + added)])
+        self._update_sums(np.flatnonzero(added))
+
+    def statistics(self, title: str, since: float = -np.inf, until: float = np.inf) -> tuple[int, float, float]:
+        """Returns (number of reviews, average score, decayed average score) of the reviews of the movie with
+        the given title dated within since and until (inclusive), or (0, 0, 0) if there are none.
+
+        The reviews are found by binary search.
+        """
+        row = self.index.get(title)
+        if row is None:
+            return 0, 0.0, 0.0
+        start, end = self.starts[row], self.starts[row + 1]
+        low = start + int(np.searchsorted(self.dates[start:end], since, 'left'))
+        high = start + int(np.searchsorted(self.dates[start:end], until, 'right'))
+        counts, averages, decayed = self._window_statistics(np.array([row]), np.array([low]), np.array([high]))
+        return int(counts[0]), float(averages[0]), float(decayed[0])
+
+    def window_statistics(self, since: float = -np.inf,
+                          until: float = np.inf) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the number of reviews, average score and decayed average score of every movie (in row order)
+        over its reviews dated within since and until (inclusive). Movies without such reviews get 0.
+
+        >>> history = ReviewHistory(['Up', 'Heat', 'Up'], np.array([20.0, 10.0, 0.0]), np.array([1.0, 0.5, 0.0]))
+        >>> counts, averages, _ = history.window_statistics(since=5)
+        >>> counts.tolist(), averages.tolist()
+        ([1, 1], [1.0, 0.5])
+        """
+        rows = np.arange(len(self.titles))
+        base = rows * self._span - self._first_date
+
+        # clip the window so that it stays within the keys of each row
+        low = np.searchsorted(self._keys, base + np.clip(since, self._first_date, self._first_date + self._span - 1),
+                              'left')
+        high = np.searchsorted(self._keys, base + np.clip(until, self._first_date - 1,
+                                                          self._first_date + self._span - 1), 'right')
+        return self._window_statistics(rows, low, high)
+
+    def _window_statistics(self, rows: np.ndarray, low: np.ndarray,
+                           high: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the number of reviews, average score and decayed average score of the reviews at positions
+        low to high - 1 of each of the given rows, computed from the prefix sums.
+        """
+        counts = high - low
+
+        # the sums restart at every movie, so the sum before the first review of a movie is 0
+        starts = self.starts[rows]
+        totals = self._segment_sums(self._score_sums, starts, low, high)
+        weights = self._segment_sums(self._weight_sums, starts, low, high)
+        weighted = self._segment_sums(self._weighted_sums, starts, low, high)
+
+        averages = np.divide(totals, counts, out=np.zeros(len(rows)), where=counts > 0)
+        decayed = np.divide(weighted, weights, out=np.zeros(len(rows)), where=weights > 0)
+        return counts, averages, decayed
+
+    def _segment_sums(self, sums: np.ndarray, starts: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Returns the sums of the positions low to high - 1 of movies whose reviews start at starts, from sums
+        that restart at every movie.
+        """
+        if len(sums) == 0:
+            return np.zeros(len(starts))
+        upper = np.where(high > starts, sums[np.maximum(high - 1, 0)], 0.0)
+        lower = np.where(low > starts, sums[np.maximum(low - 1, 0)], 0.0)
+        return upper - lower
+
+    def rank(self, graph: WeightedGraph, limit: int,
+             candidates: Optional[Collection[str]] = None) -> list[tuple[_WeightedVertex, float]]:
+        """Returns the top limit movies for the preferences of graph, as (movie vertex, score) pairs sorted by
+        score in descending order. The preferred movie itself is not included.
+
+        This is the 'similarity' ranking of main.recommend_movies, with the decayed average of the reviews within
+        the window instead of the average of every review. Movies with fewer than min_number_of_reviews reviews
+        in the window score 0. If candidates is given, only the movies with these titles are ranked.
+
+        Preconditions:
+            - limit > 0
+            - graph.preferred_movie != ''
+        """
+        arrays = pagerank.get_ranker(graph).arrays
+
+        # find the row of every movie of the arrays in this history, once per arrays
+        if self._aligned is None or self._aligned[0] is not arrays:
+            self._aligned = (arrays, np.array([self.index.get(title, -1) for title in arrays.titles],
+                                              dtype=np.int64))
+        history_rows = self._aligned[1]
+
+        counts, _, decayed = self.window_statistics(self.since, self.until)
+        decayed[counts < self.min_number_of_reviews] = 0
+        averages = np.where(history_rows >= 0, decayed[history_rows], 0) if len(decayed) > 0 \
+            else np.zeros(len(history_rows))
+
+        row = arrays.index[graph.preferred_movie]
+        scores = similarity_scores(arrays, row, arrays.genre_mask(graph.preferred_genres), averages=averages)
+        if candidates is not None:
+            restrict_scores(scores, arrays.index, candidates)
+        return [(arrays.movies[other], float(scores[other])) for other in top_rows(scores, limit)]
+
+
+def _segment_cumsum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Returns the cumulative sums of values that restart at every segment, where segment i is made of the
+    positions starts[i] to starts[i + 1] - 1.
+
+    The segments with the same length are summed together, as the rows of one matrix.
+
+    >>> _segment_cumsum(np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]), np.array([0, 2, 5, 6])).tolist()
+    [1.0, 3.0, 3.0, 7.0, 12.0, 6.0]
+    """
+    sums = np.empty(len(values))
+    lengths = np.diff(starts)
+    for length in np.unique(lengths[lengths > 0]).tolist():
+        positions = starts[:-1][lengths == length, np.newaxis] + np.arange(length)
+        sums[positions] = np.cumsum(values[positions], axis=1)
+    return sums
+
+
+def _parse_day(date: str) -> float:
+    """Returns the number of days between 1970-01-01 and the given date, such as 2015, 2015-06 or 2015-06-30.
+
+    Raise a ValueError if the date is not valid.
+    """
+    return float(np.datetime64(str(date), 'D').astype(np.int64))
+
+
+def attach_history(graph: WeightedGraph, history: ReviewHistory) -> None:
+    """Make history the review history of graph, used by its 'recent' ranking."""
+    _HISTORIES[graph] = history
+
+
+def update_history(graph: WeightedGraph, titles: list[str], dates: np.ndarray, scores: np.ndarray) -> bool:
+    """Add the given new reviews of graph to its review history, and return whether it has one."""
+    if graph not in _HISTORIES:
+        return False
+    _HISTORIES[graph].add_reviews(titles, dates, scores)
+    return True
+
+
+def get_history(graph: WeightedGraph) -> ReviewHistory:
+    """Returns the review history of graph.
+
+    Raise a ValueError if the graph was loaded without review dates (see main.load_review_columns).
+    """
+    if graph not in _HISTORIES:
+        raise ValueError("The reviews were loaded without their dates")
+    return _HISTORIES[graph]
+
+
+def has_history(graph: WeightedGraph) -> bool:
+    """Returns whether graph has a review history."""
+    return graph in _HISTORIES
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["weakref", "typing", "numpy", "classes", "movie_arrays", "pagerank", "pandas"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
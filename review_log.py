@@ -0,0 +1,387 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the ReviewLog class, which treats the review dataset as an append-only log: new reviews
+are added to a loaded graph as they are appended to the review CSV file, without reloading the whole file.
+
+A ReviewLog remembers the byte offset of the first review it has not ingested yet. Ingesting new reviews only
+touches the movies they review: their review edges (from which the averages of classes._WeightedVertex are
+computed) and the cached rankings of pagerank.py and critics.py, which are updated in place.
+
+If the log keeps the review dates, the dated reviews are also added to the review history of the graph
+(see review_history.py), which is saved in the checkpoint too.
+
+A checkpoint saves the review edges and score sketches of the graph together with the offset, so that a
+restarted process loads the movies, restores the edges from the checkpoint and only ingests the reviews
+appended since, instead of parsing the whole review dataset again.
+
+Usage (ingest the new reviews and update the checkpoint, creating it the first time):
+    python review_log.py checkpoint.npz --reviews data/rotten_tomatoes_movie_reviews.csv
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from classes import WeightedGraph
+import critics
+import main
+import pagerank
+from review_history import ReviewHistory, attach_history, get_history, update_history
+from sketches import QuantileSketch
+
+# The number of bytes of the review file read at a time by ReviewLog.tail.
+TAIL_BLOCK_SIZE = 64 << 20
+
+# The separator of the strings packed into one array of a checkpoint.
+_STRING_SEPARATOR = '\x00'
+
+
+class ReviewLog:
+    """The reviews of a growing review CSV file, ingested into a full graph as they are appended.
+
+    Instance Attributes:
+        - graph: The full graph that the reviews are added to.
+        - dict_list: The movie genres and titles, as returned by main.load_movie_columns.
+        - reviews_file: The uncompressed review CSV file that new reviews are appended to.
+        - movie_file: The movie dataset that the movies of graph were loaded from.
+        - with_critics: Whether the critics of the reviews are added to graph.
+        - with_dates: Whether the dated reviews are added to the review history of graph.
+        - offset: The byte offset in reviews_file of the first review that has not been ingested.
+        - num_reviews: The number of reviews ingested so far.
+
+    Representation Invariants:
+        - self.offset > 0
+        - self.num_reviews >= 0
+    """
+    # Private Instance Attributes:
+    #     - _header:
+    #         The column names of reviews_file.
+    graph: WeightedGraph
+    dict_list: list[dict]
+    reviews_file: str
+    movie_file: str
+    with_critics: bool
+    with_dates: bool
+    offset: int
+    num_reviews: int
+    _header: list[str]
+
+    def __init__(self, graph: WeightedGraph, dict_list: list[dict], reviews_file: str, movie_file: str,
+                 with_critics: bool = False, offset: int = 0, num_reviews: int = 0, with_dates: bool = False) -> None:
+        """Initialize a log of the reviews of reviews_file from the given byte offset, which is the end of the
+        header row if it is 0.
+
+        Preconditions:
+            - dict_list was returned by main.load_movie_columns(movie_file, graph)
+            - offset == 0 or offset is the start of a row of reviews_file
+            - not with_dates or graph has a review history
+        """
+        self.graph = graph
+        self.dict_list = dict_list
+        self.reviews_file = reviews_file
+        self.movie_file = movie_file
+        self.with_critics = with_critics
+        self.with_dates = with_dates
+        self.num_reviews = num_reviews
+
+        # read the column names, which the appended rows do not repeat
+        with open(reviews_file, 'rb') as file:
+            header_row = file.readline()
+        self._header = next(csv.reader([header_row.decode('utf-8')]))
+        self.offset = offset if offset > 0 else len(header_row)
+
+    @staticmethod
+    def load(reviews_file: str, movie_file: str, with_critics: bool = False, with_dates: bool = False) -> ReviewLog:
+        """Returns the log of a new full graph, after ingesting every review of reviews_file.
+        If with_dates is True, the graph gets a review history holding every dated review.
+
+        Preconditions:
+            - reviews_file is a path to a valid, uncompressed CSV file with review data.
+            - movie_file is a path to a valid CSV file with movie data.
+        """
+        graph = WeightedGraph()
+        dict_list, _ = main.load_movie_columns(movie_file, graph)
+        if with_dates:
+            attach_history(graph, ReviewHistory([], np.empty(0), np.empty(0)))
+        log = ReviewLog(graph, dict_list, reviews_file, movie_file, with_critics, with_dates=with_dates)
+        log.tail()
+        return log
+
+    def add_rows(self, rows: Iterable[list[str]]) -> set[str]:
+        """Ingest the given review rows, which have the columns of the review dataset, and return the titles
+        of the movies whose reviews changed.
+
+        The rows are not written to reviews_file, but they are part of the next checkpoint.
+        """
+        chunk = pd.DataFrame(list(rows), columns=self._header, dtype=str)
+        return self._add_chunk(chunk)
+
+    def tail(self, block_size: int = TAIL_BLOCK_SIZE, end: Optional[int] = None) -> set[str]:
+        """Ingest the complete rows appended to reviews_file since offset, and return the titles of the movies
+        whose reviews changed. If end is given, only the rows before the byte offset end are ingested, for
+        example to bring another log of the same file up to the offset of this one (see graph_versions.py).
+
+        A row that is still being written (one that does not end with a line break yet) is left for the next call.
+        Raise a ValueError if reviews_file is now shorter than offset, which means it was truncated or replaced.
+
+        Preconditions:
+            - block_size > 0
+            - end is None or (end >= self.offset and end is the start of a row of reviews_file)
+        """
+        affected = set()
+        with open(self.reviews_file, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < self.offset:
+                raise ValueError(f"{self.reviews_file} is shorter than the checkpoint offset {self.offset}")
+            file.seek(self.offset)
+
+            # ingest the complete rows of every block, carrying the partial row at its end over to the next block
+            pending = b''
+            while block := file.read(block_size if end is None else min(block_size, end - file.tell())):
+                pending += block
+                length = _complete_length(pending)
+                if length > 0:
+                    columns = (main.REVIEW_COLUMNS if self.with_critics else ['id', 'originalScore']) \
+                        + ([main.DATE_COLUMN] if self.with_dates else [])
+                    chunk = pd.read_csv(io.BytesIO(pending[:length]), header=None, names=self._header,
+                                        usecols=columns, dtype=str, na_filter=False, engine='c', encoding="utf-8")
+                    affected |= self._add_chunk(chunk)
+                    self.offset += length
+                    pending = pending[length:]
+
+        return affected
+
+    def _add_chunk(self, chunk: pd.DataFrame) -> set[str]:
+        """Ingest the reviews of the given chunk of the review dataset, and return the titles of the movies
+        whose reviews changed.
+        """
+        graph = self.graph
+        new_edges, critic_reviews, affected = [], [], set()
+        dated_titles, dates, scores, chunk_scores = [], [], [], {}
+        for title, score, critic, publication, top_critic, date in main.review_records(chunk, self.dict_list):
+            chunk_scores.setdefault(title, []).append(score)
+            if self.with_dates:
+                dated_titles.append(title)
+                dates.append(date)
+                scores.append(score)
+            graph.add_vertex(score, "Review")
+            movie, review = graph.get_vertex(title), graph.get_vertex(score)
+
+            # reviews are shared by every movie with the same score, so a movie only gains an edge for a new score
+            if review not in movie.neighbours:
+                graph.add_edge(title, score)
+                new_edges.append((movie, review))
+                affected.add(title)
+
+            # connect the critic to the movie they reviewed, ignoring critics whose name is already used
+            # by a movie or review
+            if self.with_critics and critic != '':
+                try:
+                    graph.add_critic_review(critic, title, score, publication, top_critic)
+                except ValueError:
+                    continue
+                critic_reviews.append((graph.get_vertex(critic), movie))
+                affected.add(title)
+
+        self.num_reviews += len(chunk)
+
+        # every review changes the score sketch of its movie, even if the movie already had its score
+        for title, title_scores in chunk_scores.items():
+            graph.add_review_scores(title, title_scores)
+        affected.update(chunk_scores)
+
+        # update the cached rankings of the graph, if it has any
+        pagerank.update_ranker(graph, new_edges)
+        critics.update_scorer(graph, critic_reviews)
+
+        # every dated review changes the recent scores of its movie
+        if self.with_dates and update_history(graph, dated_titles, np.array(dates), np.array(scores)):
+            affected.update(dated_titles)
+        return affected
+
+    def save_checkpoint(self, checkpoint_file: str) -> None:
+        """Save the review edges and score sketches of the graph and the position of this log to checkpoint_file.
+
+        The checkpoint is written to a temporary file first, so an interrupted save never corrupts
+        the previous checkpoint.
+        """
+        # number the movies, and list the movie-review edges by movie number
+        movies = [v for v in self.graph.get_vertices() if v.kind in ("Movie", "Chosen Movie")]
+        numbers = {movie: number for number, movie in enumerate(movies)}
+        edge_movies, edge_scores = [], []
+        for review in self.graph.get_vertices('Review'):
+            for movie in review.neighbours:
+                edge_movies.append(numbers[movie])
+                edge_scores.append(review.item)
+
+        # list the scores stored in the score sketches, with their movie numbers and levels
+        sketch_movies, sketch_levels, sketch_scores = [], [], []
+        for number, movie in enumerate(movies):
+            if movie.score_sketch is not None:
+                for level, items in enumerate(movie.score_sketch.levels):
+                    sketch_movies.extend([number] * len(items))
+                    sketch_levels.extend([level] * len(items))
+                    sketch_scores.extend(items)
+
+        # list the critics and their reviews
+        critic_vertices = self.graph.get_vertices('Critic')
+        critic_edges, critic_movies, critic_scores = [], [], []
+        for number, critic in enumerate(critic_vertices):
+            for movie, score in critic.neighbours.items():
+                critic_edges.append(number)
+                critic_movies.append(numbers[movie])
+                critic_scores.append(score)
+
+        # list the dated reviews of the review history
+        history_titles, history_rows = [], np.empty(0, dtype=np.int32)
+        history_dates, history_scores = np.empty(0), np.empty(0)
+        if self.with_dates:
+            history = get_history(self.graph)
+            history_titles = history.titles.tolist()
+            history_rows = np.repeat(np.arange(len(history.titles), dtype=np.int32), np.diff(history.starts))
+            history_dates, history_scores = history.dates, history.scores
+
+        with open(checkpoint_file + '.tmp', 'wb') as file:
+            np.savez(file, reviews_file=self.reviews_file, movie_file=self.movie_file,
+                     with_critics=self.with_critics, offset=self.offset, num_reviews=self.num_reviews,
+                     titles=_pack_strings([movie.item for movie in movies]),
+                     edge_movies=np.array(edge_movies, dtype=np.int32), edge_scores=np.array(edge_scores),
+                     critic_names=_pack_strings([critic.item for critic in critic_vertices]),
+                     critic_publications=_pack_strings(['\t'.join(sorted(critic.publications))
+                                                        for critic in critic_vertices]),
+                     top_critics=np.array([critic.top_critic for critic in critic_vertices], dtype=bool),
+                     critic_edges=np.array(critic_edges, dtype=np.int32),
+                     critic_movies=np.array(critic_movies, dtype=np.int32),
+                     critic_scores=np.array(critic_scores), with_dates=self.with_dates,
+                     sketch_movies=np.array(sketch_movies, dtype=np.int32),
+                     sketch_levels=np.array(sketch_levels, dtype=np.int8), sketch_scores=np.array(sketch_scores),
+                     history_titles=_pack_strings(history_titles), history_rows=history_rows,
+                     history_dates=history_dates, history_scores=history_scores)
+        os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+    @staticmethod
+    def resume(checkpoint_file: str, movie_file: str = '') -> ReviewLog:
+        """Returns the log saved to checkpoint_file, with a new full graph holding the movies of movie_file
+        (or the movie file of the checkpoint, if movie_file is '') and the review edges of the checkpoint.
+
+        Call tail to ingest the reviews appended since the checkpoint was saved.
+        Raise a ValueError if a movie of the checkpoint is not in the movie file.
+        """
+        with np.load(checkpoint_file) as data:
+            checkpoint = {key: data[key] for key in data.files}
+
+        graph = WeightedGraph()
+        movie_file = movie_file or str(checkpoint['movie_file'])
+        dict_list, _ = main.load_movie_columns(movie_file, graph)
+
+        # restore the movie-review edges
+        titles = _unpack_strings(checkpoint['titles'])
+        for number, score in zip(checkpoint['edge_movies'].tolist(), checkpoint['edge_scores'].tolist()):
+            graph.add_vertex(score, "Review")
+            graph.add_edge(titles[number], score)
+
+        # restore the score sketches
+        sketches = {}
+        for number, level, score in zip(checkpoint.get('sketch_movies', np.empty(0, dtype=np.int32)).tolist(),
+                                        checkpoint.get('sketch_levels', np.empty(0, dtype=np.int8)).tolist(),
+                                        checkpoint.get('sketch_scores', np.empty(0)).tolist()):
+            levels = sketches.setdefault(number, [])
+            levels.extend([] for _ in range(level + 1 - len(levels)))
+            levels[level].append(score)
+        for number, levels in sketches.items():
+            graph.get_vertex(titles[number]).score_sketch = QuantileSketch.from_levels(levels)
+
+        # restore the critics and their reviews
+        critic_names = _unpack_strings(checkpoint['critic_names'])
+        for number, movie, score in zip(checkpoint['critic_edges'].tolist(), checkpoint['critic_movies'].tolist(),
+                                        checkpoint['critic_scores'].tolist()):
+            graph.add_critic_review(critic_names[number], titles[movie], score)
+        for name, publications, top_critic in zip(critic_names, _unpack_strings(checkpoint['critic_publications']),
+                                                  checkpoint['top_critics'].tolist()):
+            critic = graph.get_vertex(name)
+            critic.publications.update(publication for publication in publications.split('\t') if publication != '')
+            critic.top_critic = top_critic
+
+        # restore the review history
+        with_dates = bool(checkpoint.get('with_dates', False))
+        if with_dates:
+            history_titles = np.array(_unpack_strings(checkpoint['history_titles']), dtype=object)
+            attach_history(graph, ReviewHistory(history_titles[checkpoint['history_rows']].tolist(),
+                                                checkpoint['history_dates'], checkpoint['history_scores']))
+
+        return ReviewLog(graph, dict_list, str(checkpoint['reviews_file']), movie_file,
+                         bool(checkpoint['with_critics']), int(checkpoint['offset']), int(checkpoint['num_reviews']),
+                         with_dates)
+
+
+def _complete_length(data: bytes) -> int:
+    """Returns the length of the longest prefix of data made of complete CSV rows, where data starts at the
+    start of a row.
+
+    A line break ends a row unless it is inside a quoted field, which is the case exactly when an odd number
+    of quotes come before it (quotes inside quoted fields are doubled).
+
+    >>> _complete_length(b'm1,"a\\nb",1\\nm2,"c')
+    11
+    >>> _complete_length(b'm1,"a\\nb')
+    0
+    """
+    end = data.rfind(b'\n')
+    quotes = data.count(b'"', 0, max(end, 0))
+    while end != -1 and quotes % 2 == 1:
+        previous = data.rfind(b'\n', 0, end)
+        quotes -= data.count(b'"', previous + 1, end)
+        end = previous
+    return end + 1
+
+
+def _pack_strings(strings: list[str]) -> np.ndarray:
+    """Returns the given strings packed into one array of UTF-8 bytes.
+
+    >>> _unpack_strings(_pack_strings(['Up', 'Léon', '']))
+    ['Up', 'Léon', '']
+    """
+    return np.frombuffer(_STRING_SEPARATOR.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _unpack_strings(packed: np.ndarray) -> list[str]:
+    """Returns the strings packed by _pack_strings."""
+    return packed.tobytes().decode('utf-8').split(_STRING_SEPARATOR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the reviews appended since the last checkpoint.")
+    parser.add_argument('checkpoint_file', help=".npz checkpoint, created if it does not exist")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--critics', action='store_true', help="also ingest the critics")
+    parser.add_argument('--dates', action='store_true', help="also keep the review dates, for the 'recent' ranking")
+    args = parser.parse_args()
+
+    if os.path.exists(args.checkpoint_file):
+        review_log = ReviewLog.resume(args.checkpoint_file, args.movies)
+        changed = review_log.tail()
+    else:
+        review_log = ReviewLog.load(args.reviews, args.movies, args.critics, args.dates)
+        changed = set(review_log.dict_list[1].values())
+    review_log.save_checkpoint(args.checkpoint_file)
+    print(f"{review_log.num_reviews} reviews ingested up to byte {review_log.offset}; "
+          f"{len(changed)} movies changed")
@@ -0,0 +1,507 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains a local recommendation server. The movie and review data is loaded into a
+WeightedGraph once, when the server starts, and stays in memory while the server answers requests.
+
+The protocol is newline-delimited JSON over a local TCP port: every line sent by a client is one request,
+and the server answers every request with one line, in the order the requests were sent. A client may send
+several requests without waiting for the answers (pipelining). The available requests are:
+    {"op": "search", "query": "matrix", "limit": 20}
+    {"op": "recommend", "movie": "The Matrix", "genres": ["Action"], "limit": 10, "ranking": "pagerank"}
+    {"op": "quadrant", "movie": "The Matrix", "genres": ["Action"], "review_threshold": 3, "score_quantile": 0.5}
+    {"op": "ingest"}
+    {"op": "memory"}
+    {"op": "ping"}
+    {"op": "shutdown"}
+A "memory" request answers with the pid and memory usage of the process answering it (see prefork.memory_usage).
+An optional "id" in a request is copied into its answer. A movie may also be given by "movie_id".
+A "recommend" or "quadrant" request may have a "filter", a movie_filters expression such as
+"rating == PG-13 and releaseDateTheaters >= 2011", that restricts its answer to the matching movies.
+
+Usage:
+    python server.py --port 8765
+
+With --review-log checkpoint.npz, the server ingests the reviews appended to the review file (see
+review_log.py) on every "ingest" request, and every --tail-interval seconds if it is given, saving the
+checkpoint after each ingestion. A restarted server resumes from the checkpoint instead of reloading the reviews.
+The graph is then kept as two copies (see graph_versions.py): reviews are ingested into one copy on a separate
+ingestion thread while requests are answered from the other, so requests never wait for an ingestion and never
+see a half-ingested chunk of reviews. The 'similarity' recommendations are then computed from the movie arrays
+of the published copy, without centring the graph, by READING_THREADS threads at once; the other requests still
+re-centre the published copy, one at a time on the scoring thread.
+
+With --workers N, the 'similarity' and 'pagerank' recommendations are computed by N worker processes that
+share the movie arrays through shared memory (see shared_arrays.py), instead of by the single scoring thread.
+
+The 'critics' ranking needs the critics to be loaded, with --critics (or --factors factors.npz, to rank by
+a factorization trained by critics.py). The 'recent' ranking needs the review dates to be loaded, with --dates;
+its requests may have a "half_life" (in days), "since" and "until" (see review_history.py).
+
+With --prefork N, the data is loaded and frozen once (see prefork.py), then N worker processes are forked, and
+each of them serves the connections it accepts on the shared port with its own graph, whose memory pages it shares
+with the other workers until it writes to them. This mode cannot ingest reviews or use --workers. The memory used
+by every worker is printed when the server stops.
+
+The server stops gracefully on SIGINT/SIGTERM or a "shutdown" request: it stops accepting connections
+and finishes the requests it has already received. In prefork mode, a "shutdown" request only stops the worker
+that answers it.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, Optional
+
+from classes import WeightedGraph
+import batch
+import critics
+from graph_versions import GraphVersions
+from movie_filters import MovieMetadata
+import pagerank
+import prefork
+from review_history import get_history
+from review_log import ReviewLog
+import shared_arrays
+from shared_arrays import SHARED_RANKINGS, ScoringPool
+import visualization2
+
+# The number of threads that compute the 'similarity' recommendations of a server with versions at once.
+READING_THREADS = 4
+
+
+class RecommendationServer:
+    """A server that keeps the full movie review graph in memory and answers JSON requests about it.
+
+    Instance Attributes:
+        - threshold: The similarity threshold used for the simplified graph of every favourite movie.
+        - versions: The two copies of the graph of the review log that new reviews are ingested from, or None.
+        - checkpoint_file: The checkpoint of the review log, saved after every ingestion.
+        - scoring_pool: The worker processes that compute the rankings of SHARED_RANKINGS, or None.
+        - metadata: The metadata that the filters of requests are evaluated on, or None.
+    """
+    # Private Instance Attributes:
+    #     - _graph:
+    #         The full graph, centred on the favourite movie of the most recent recommendation request,
+    #         if the server has no versions.
+    #     - _dict_list:
+    #         The movie genres and titles, as returned by main.load_movie_data.
+    #     - _scoring_executor:
+    #         The single thread that runs every request using the graph. Requests that re-centre the graph
+    #         must not overlap, so they are run one at a time, away from the event loop.
+    #     - _reading_executor:
+    #         The threads that compute the 'similarity' recommendations from the movie arrays of the published
+    #         copy of versions. They never change the graph, so their requests may overlap.
+    #     - _ingest_executor:
+    #         The single thread that ingests new reviews into the standby copy of versions.
+    #     - _shutdown:
+    #         Set when the server should stop.
+    #     - _connections:
+    #         The tasks handling the currently open connections.
+    threshold: float
+    versions: Optional[GraphVersions]
+    checkpoint_file: str
+    scoring_pool: Optional[ScoringPool]
+    metadata: Optional[MovieMetadata]
+    _graph: WeightedGraph
+    _dict_list: list[dict]
+    _scoring_executor: ThreadPoolExecutor
+    _reading_executor: ThreadPoolExecutor
+    _ingest_executor: ThreadPoolExecutor
+    _shutdown: Optional[asyncio.Event]
+    _connections: set[asyncio.Task]
+
+    def __init__(self, graph: WeightedGraph, dict_list: list[dict], threshold: float = 0.7,
+                 versions: Optional[GraphVersions] = None, checkpoint_file: str = '',
+                 scoring_pool: Optional[ScoringPool] = None, metadata: Optional[MovieMetadata] = None) -> None:
+        """Initialize a server answering requests about the given full graph, which must not yet be
+        connected to a favourite movie. If versions is given, the requests are answered from its published
+        copy instead, and graph is one of its copies.
+
+        Preconditions:
+            - graph.preferred_movie == ''
+            - threshold > 0
+            - versions is None or (graph in versions.graphs() and checkpoint_file != '')
+        """
+        self.threshold = threshold
+        self.versions = versions
+        self.checkpoint_file = checkpoint_file
+        self.scoring_pool = scoring_pool
+        self.metadata = metadata
+        self._graph = graph
+        self._dict_list = dict_list
+        self._scoring_executor = ThreadPoolExecutor(max_workers=1)
+        self._reading_executor = ThreadPoolExecutor(max_workers=READING_THREADS)
+        self._ingest_executor = ThreadPoolExecutor(max_workers=1)
+        self._shutdown = None
+        self._connections = set()
+
+    def search(self, query: str, limit: int = 20) -> list[dict[str, str]]:
+        """Returns at most limit movies whose title contains query, ignoring case.
+
+        >>> server = RecommendationServer(WeightedGraph(), [{}, {'m1': 'The Matrix', 'm2': 'Up'}])
+        >>> server.search('matrix')
+        [{'movie_id': 'm1', 'title': 'The Matrix'}]
+        """
+        query = query.strip().lower()
+        results = []
+        for movie_id, title in self._dict_list[1].items():
+            if query in title.lower():
+                results.append({'movie_id': movie_id, 'title': title})
+                if len(results) >= limit:
+                    break
+        return results
+
+    @contextlib.contextmanager
+    def _read_graph(self) -> Iterator[WeightedGraph]:
+        """Returns a context manager that gives the graph to answer a request from: the published copy of
+        versions, which no ingestion changes until the context is exited, or the only graph if there are no versions.
+        """
+        if self.versions is None:
+            yield self._graph
+        else:
+            with self.versions.read() as graph:
+                yield graph
+
+    def _centre_graph(self, graph: WeightedGraph, request: dict[str, Any]) -> None:
+        """Centres the given full graph on the favourite movie and genres of the given request, and sets the
+        half-life and window of the review history for a 'recent' request.
+
+        set_user_preferences only recomputes what differs from the previous request.
+        Raise a ValueError if the movie of the request is not in the movie dataset, or if its genres are not
+        a list of strings.
+        """
+        list_fav = batch.find_favourite_movie(self._dict_list, request)
+        fav_genres = batch.find_favourite_genres(request)
+        if request.get('ranking') == 'recent':
+            get_history(graph).apply_options(request)
+        graph.set_user_preferences(list_fav[1], fav_genres)
+
+    def _candidates(self, request: dict[str, Any], graph: Optional[WeightedGraph] = None) -> Optional[list[str]]:
+        """Returns the titles of the movies matching the filter of the given request, evaluated on the given
+        graph (or the graph of the next request, if it is None), or None if the request has no filter.
+
+        Raise a ValueError if the filter is not valid, or if the server has no metadata to evaluate it on.
+        """
+        if 'filter' not in request:
+            return None
+        elif self.metadata is None:
+            raise ValueError("This server does not support filters")
+        elif graph is None:
+            with self._read_graph() as graph:
+                return self.metadata.select(request['filter'], graph)
+        return self.metadata.select(request['filter'], graph)
+
+    def recommend(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Returns the top recommendations for the profile of the given request.
+
+        Raise a ValueError if the ranking of the request is not in main.RANKINGS.
+
+        Preconditions:
+            - request.get('limit', 10) > 0
+        """
+        with self._read_graph() as graph:
+            candidates = self._candidates(request, graph)
+            self._centre_graph(graph, request)
+            return {'preferred_movie': graph.preferred_movie,
+                    'recommendations': batch.recommendation_records(graph, request.get('limit', 10),
+                                                                    request.get('ranking', 'similarity'), candidates)}
+
+    def quadrant(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Returns the data plotted by visualization2.plot_movie_recommendations for the profile of the
+        given request, as one list per column.
+        """
+        with self._read_graph() as graph:
+            candidates = self._candidates(request, graph)
+            self._centre_graph(graph, request)
+            df = visualization2.load_data_with_graph(graph, candidates, request.get('score_quantile'))
+        df = df[df['num_reviews'] >= request.get('review_threshold', 3)]
+        return {'title': list(df['title']), 'w1': df['w1'].tolist(), 'w2': df['w2'].tolist(),
+                'Color Value': df['Color Value'].tolist(), 'num_reviews': df['num_reviews'].tolist()}
+
+    async def _recommend_in_pool(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Returns the same answer as recommend, computed by a worker of the scoring pool without centring
+        the graph.
+
+        Raise a ValueError if the worker raises an error or dies.
+
+        Preconditions:
+            - self.scoring_pool is not None
+            - request.get('limit', 10) > 0
+            - request.get('ranking', 'similarity') in SHARED_RANKINGS
+        """
+        movie = batch.find_favourite_movie(self._dict_list, request)[1]
+        fav_genres = batch.find_favourite_genres(request)
+
+        # the filter reads the graph, so it is evaluated on the scoring thread
+        candidates = None
+        if 'filter' in request:
+            candidates = await asyncio.get_running_loop().run_in_executor(self._scoring_executor,
+                                                                          self._candidates, request)
+        future = self.scoring_pool.recommend(movie, fav_genres, request.get('limit', 10),
+                                             request.get('ranking', 'similarity'), candidates)
+
+        # an error raised by the worker (or a worker that died) only fails this request
+        try:
+            recommendations = await asyncio.wrap_future(future)
+        except (KeyError, OSError, RuntimeError) as error:
+            raise ValueError(f"The scoring worker failed: {error!r}") from error
+        return {'preferred_movie': movie, 'recommendations': recommendations}
+
+    async def _recommend_from_arrays(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Returns the same answer as recommend for a 'similarity' request, computed on a reading thread from the
+        movie arrays of the published copy of versions, without centring the graph.
+
+        Preconditions:
+            - self.versions is not None
+            - request.get('limit', 10) > 0
+            - request.get('ranking', 'similarity') == 'similarity'
+        """
+        movie = batch.find_favourite_movie(self._dict_list, request)[1]
+        fav_genres = batch.find_favourite_genres(request)
+
+        # the filter reads the graph, so it is evaluated on the scoring thread
+        loop = asyncio.get_running_loop()
+        candidates = None
+        if 'filter' in request:
+            candidates = await loop.run_in_executor(self._scoring_executor, self._candidates, request)
+        return await loop.run_in_executor(self._reading_executor, self._read_recommendations, movie, fav_genres,
+                                          request.get('limit', 10), candidates)
+
+    def _read_recommendations(self, movie: str, genres: set[str], limit: int,
+                              candidates: Optional[list[str]]) -> dict[str, Any]:
+        """Returns the 'similarity' recommendations for the given favourite movie and genres, computed from the
+        movie arrays of the published copy of versions, which no ingestion changes while they are read.
+
+        Preconditions:
+            - self.versions is not None
+            - limit > 0
+        """
+        with self.versions.read() as graph:
+            arrays = pagerank.get_ranker(graph).arrays
+            return {'preferred_movie': movie,
+                    'recommendations': shared_arrays.recommendation_records(arrays, movie, genres, limit,
+                                                                            'similarity', candidates)}
+
+    def ingest(self) -> dict[str, Any]:
+        """Ingests the reviews appended to the review file since the last ingestion into the standby copy of
+        the graph, publishes it, saves the checkpoint, and returns the number of reviews ingested so far and
+        the titles of the movies whose reviews changed.
+
+        Raise a ValueError if the server has no review log.
+        """
+        if self.versions is None:
+            raise ValueError("The server was started without --review-log")
+
+        # the reading threads and the scoring workers use the arrays of the new copy, which are built (or updated)
+        # before it is published
+        changed = self.versions.ingest(self.checkpoint_file, pagerank.get_ranker)
+
+        # share the updated arrays with the scoring workers
+        if self.scoring_pool is not None and changed:
+            self.scoring_pool.update(pagerank.get_ranker(self.versions.log.graph).arrays)
+        return {'num_reviews': self.versions.log.num_reviews, 'version': self.versions.version,
+                'changed_movies': sorted(changed)}
+
+    async def _ingest_periodically(self, interval: float) -> None:
+        """Ingests the new reviews every interval seconds, on the ingestion thread, until a shutdown is requested."""
+        loop = asyncio.get_running_loop()
+        while not self._shutdown.is_set():
+            try:
+                await asyncio.wait_for(self._shutdown.wait(), interval)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self._ingest_executor, self.ingest)
+
+    async def answer(self, line: bytes) -> dict[str, Any]:
+        """Returns the answer to one request line.
+
+        Requests that use the graph are run on the scoring thread so that the event loop stays responsive.
+        Any error raised by a request is answered as an error, so that it never stops the answers that follow.
+        """
+        request = {}
+        try:
+            request = json.loads(line)
+            op = request.get('op')
+            loop = asyncio.get_running_loop()
+            if op == 'ping':
+                result = 'pong'
+            elif op == 'search':
+                result = await loop.run_in_executor(None, self.search, str(request.get('query', '')),
+                                                    request.get('limit', 20))
+            elif op == 'recommend' and self.scoring_pool is not None \
+                    and request.get('ranking', 'similarity') in SHARED_RANKINGS:
+                result = await self._recommend_in_pool(request)
+            elif op == 'recommend' and self.versions is not None \
+                    and request.get('ranking', 'similarity') == 'similarity':
+                result = await self._recommend_from_arrays(request)
+            elif op == 'recommend':
+                result = await loop.run_in_executor(self._scoring_executor, self.recommend, request)
+            elif op == 'quadrant':
+                result = await loop.run_in_executor(self._scoring_executor, self.quadrant, request)
+            elif op == 'ingest':
+                result = await loop.run_in_executor(self._ingest_executor, self.ingest)
+            elif op == 'memory':
+                result = {'pid': os.getpid(), **prefork.memory_usage()}
+            elif op == 'shutdown':
+                self._shutdown.set()
+                result = 'shutting down'
+            else:
+                raise ValueError(f"Unknown op: {op}")
+        except Exception as error:
+            # json.JSONDecodeError is a ValueError; the other errors are not meant for the client, so they are named
+            message = str(error) if isinstance(error, (ValueError, TypeError, AttributeError)) else repr(error)
+            return {'id': request.get('id') if isinstance(request, dict) else None, 'ok': False, 'error': message}
+
+        return {'id': request.get('id'), 'ok': True, 'result': result}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers the requests sent over one connection until the client closes it.
+
+        Every request is started as soon as its line is read, and the answers are written in request order.
+        """
+        pending = asyncio.Queue()
+
+        async def write_answers() -> None:
+            """Writes the answer of each pending request as soon as it and every earlier answer are ready."""
+            while (task := await pending.get()) is not None:
+                writer.write(json.dumps(await task).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        writer_task = asyncio.create_task(write_answers())
+        try:
+            while not self._shutdown.is_set() and (line := await reader.readline()):
+                if line.strip():
+                    await pending.put(asyncio.create_task(self.answer(line)))
+        finally:
+            # finish answering the requests already received, then close the connection
+            await pending.put(None)
+            try:
+                await writer_task
+            finally:
+                writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, tail_interval: float = 0,
+                    sock: Optional[socket.socket] = None) -> None:
+        """Serves requests on the given local address (or on the given listening socket, which may be shared
+        with other processes) until a shutdown is requested.
+
+        If tail_interval is positive, the new reviews of the review log are ingested every tail_interval seconds.
+        """
+        self._shutdown = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._shutdown.set)
+
+        async def track_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            """Runs _handle_connection, remembering its task until it is done."""
+            task = asyncio.current_task()
+            self._connections.add(task)
+            try:
+                await self._handle_connection(reader, writer)
+            finally:
+                self._connections.discard(task)
+
+        if sock is None:
+            server = await asyncio.start_server(track_connection, host, port)
+        else:
+            server = await asyncio.start_server(track_connection, sock=sock)
+            host, port = sock.getsockname()[:2]
+        print(f"Serving recommendations on {host}:{port} (pid {os.getpid()})")
+        async with server:
+            if self.versions is not None and tail_interval > 0:
+                ingest_task = asyncio.create_task(self._ingest_periodically(tail_interval))
+            else:
+                ingest_task = None
+            await self._shutdown.wait()
+            if ingest_task is not None:
+                await ingest_task
+
+            # stop accepting new connections, then let the open ones finish their requests
+            server.close()
+            if self._connections:
+                await asyncio.wait(self._connections, timeout=10)
+
+        self._scoring_executor.shutdown()
+        self._reading_executor.shutdown()
+        self._ingest_executor.shutdown()
+        if self.scoring_pool is not None:
+            self.scoring_pool.close()
+        print("Server stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve movie recommendations from a graph kept in memory.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--threshold', type=float, default=0.7)
+    parser.add_argument('--critics', action='store_true', help="load the critics, for the 'critics' ranking")
+    parser.add_argument('--factors', help=".npz factorization saved by critics.py, used by the 'critics' ranking")
+    parser.add_argument('--dates', action='store_true', help="load the review dates, for the 'recent' ranking")
+    parser.add_argument('--review-log', default='', help=".npz checkpoint of the reviews ingested so far")
+    parser.add_argument('--tail-interval', type=float, default=0, help="seconds between review ingestions")
+    parser.add_argument('--workers', type=int, default=0, help="number of scoring worker processes")
+    parser.add_argument('--prefork', type=int, default=0, help="number of forked serving processes")
+    args = parser.parse_args()
+    if args.prefork > 0 and (args.review_log or args.workers > 0):
+        parser.error("--prefork cannot be combined with --review-log or --workers")
+    if args.prefork > 0:
+        # the data is frozen before forking, so it is loaded without collecting the garbage in between
+        prefork.pause_collection()
+
+    log = None
+    if args.review_log and os.path.exists(args.review_log):
+        log = ReviewLog.resume(args.review_log, args.movies)
+        log.tail()
+        full_graph, movie_dicts = log.graph, log.dict_list
+    elif args.review_log:
+        log = ReviewLog.load(args.reviews, args.movies, args.critics or bool(args.factors), args.dates)
+        full_graph, movie_dicts = log.graph, log.dict_list
+    else:
+        full_graph, movie_dicts, _ = batch.load_base_data(args.reviews, args.movies,
+                                                          args.critics or bool(args.factors), args.dates)
+    versions = None
+    if log is not None:
+        log.save_checkpoint(args.review_log)
+        versions = GraphVersions.from_checkpoint(log, args.review_log)
+    for graph_copy in (versions.graphs() if versions is not None else [full_graph]):
+        if args.factors:
+            critics.get_scorer(graph_copy).factors = critics.Factorization.load(args.factors)
+        if args.workers > 0 or versions is not None:
+            # the arrays are built before any request reads them
+            pagerank.get_ranker(graph_copy)
+    pool = ScoringPool(pagerank.get_ranker(full_graph).arrays, args.workers) if args.workers > 0 else None
+    recommendation_server = RecommendationServer(full_graph, movie_dicts, args.threshold, versions, args.review_log,
+                                                 pool, MovieMetadata.load(args.movies))
+    if args.prefork > 0:
+        # build the caches that every worker would otherwise build for itself, then freeze the loaded data
+        pagerank.get_ranker(full_graph)
+        if args.critics:
+            critics.get_scorer(full_graph)
+        listener = socket.create_server((args.host, args.port))
+        prefork.freeze_loaded_data()
+        workers = prefork.fork_workers(args.prefork, lambda: asyncio.run(recommendation_server.serve(sock=listener)))
+        listener.close()
+        for worker, usage in prefork.wait_for_workers(workers).items():
+            print(f"Worker {worker}: {prefork.format_memory(usage)}")
+    else:
+        asyncio.run(recommendation_server.serve(args.host, args.port, args.tail_interval))
@@ -0,0 +1,394 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains a pool of worker processes that score recommendation queries in parallel, without
+giving every worker its own copy of the graph.
+
+The per-movie data of a MovieArrays (titles, genre bitmasks, review counts and totals) and its packed
+review edges are copied once into multiprocessing.shared_memory blocks. The workers only receive a small
+descriptor (the names, dtypes and shapes of the blocks) and attach NumPy arrays to the blocks without
+copying them. They then rank the movies with the same scoring functions as main.recommend_movies:
+movie_arrays.similarity_scores for the 'similarity' ranking and pagerank.PersonalizedPageRank for
+the 'pagerank' ranking.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Collection, Iterable, Optional
+
+import numpy as np
+
+from movie_arrays import MovieArrays, genre_bitmask, overall_similarities, restrict_scores, similarity_scores, \
+    top_rows
+from pagerank import PersonalizedPageRank
+
+# The rankings that the workers of a ScoringPool can compute.
+SHARED_RANKINGS = ('similarity', 'pagerank')
+
+# The arrays of a MovieArrays that are copied into shared memory.
+_SHARED_FIELDS = ('genre_masks', 'known_genres', 'review_counts', 'review_totals', 'review_scores',
+                  'edge_movies', 'edge_reviews')
+
+# The arrays attached by this worker process, and the PersonalizedPageRank created from them, if any.
+_WORKER: dict[str, Any] = {'id': '', 'arrays': None, 'ranker': None}
+
+
+class SharedArrays:
+    """The arrays of a MovieArrays, copied into shared memory blocks owned by the process that created them.
+
+    Instance Attributes:
+        - descriptor: Everything a process needs to attach to the blocks: the name, dtype and shape of every
+                      block, and the genre names. It only holds strings, numbers and lists, so it is cheap to send.
+    """
+    # Private Instance Attributes:
+    #     - _blocks:
+    #         The shared memory blocks, which are freed by close.
+    descriptor: dict[str, Any]
+    _blocks: list[shared_memory.SharedMemory]
+
+    def __init__(self, arrays: MovieArrays) -> None:
+        """Copy the arrays of the given MovieArrays into new shared memory blocks."""
+        self._blocks = []
+        self.descriptor = {'genre_names': list(arrays.genre_names), 'blocks': {}}
+        for field in _SHARED_FIELDS:
+            self._share(field, getattr(arrays, field))
+
+        # the titles are packed into one block of UTF-8 bytes, along with the offset of every title and the
+        # rows in title order, so that a worker can find a title by binary search without decoding all of them
+        encoded = [str(title).encode('utf-8') for title in arrays.titles]
+        self._share('title_bytes', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        self._share('title_offsets', np.cumsum([0] + [len(title) for title in encoded], dtype=np.int64))
+        self._share('title_order', np.array(sorted(range(len(encoded)), key=lambda row: arrays.titles[row]),
+                                            dtype=np.int64))
+        self.descriptor['id'] = self._blocks[0].name
+
+    def _share(self, field: str, array: np.ndarray) -> None:
+        """Copy array into a new shared memory block, and record the block in the descriptor under field."""
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        self._blocks.append(block)
+        self.descriptor['blocks'][field] = [block.name, array.dtype.str, list(array.shape)]
+
+    def close(self) -> None:
+        """Free the shared memory blocks. Processes that are still attached keep their views until they detach."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+class SharedMovieArrays:
+    """Read-only NumPy views of the arrays shared by a SharedArrays, usable wherever the scoring functions
+    expect a MovieArrays (for example by movie_arrays.similarity_scores and PersonalizedPageRank).
+
+    Instance Attributes:
+        - titles: The title of the movie in each row.
+        - index: Maps each title to its row.
+        - genre_names: The genre represented by each bit of the genre bitmasks.
+        - genre_masks, known_genres, review_counts, review_totals, review_scores, edge_movies, edge_reviews:
+              The arrays of the same name of the shared MovieArrays.
+    """
+    # Private Instance Attributes:
+    #     - _blocks:
+    #         The attached shared memory blocks, which are detached by close.
+    titles: _SharedTitles
+    index: _SharedTitleIndex
+    genre_names: list[str]
+    genre_masks: np.ndarray
+    known_genres: np.ndarray
+    review_counts: np.ndarray
+    review_totals: np.ndarray
+    review_scores: np.ndarray
+    edge_movies: np.ndarray
+    edge_reviews: np.ndarray
+    _blocks: list[shared_memory.SharedMemory]
+
+    def __init__(self, descriptor: dict[str, Any]) -> None:
+        """Attach to the shared memory blocks of the given descriptor, without copying them."""
+        self._blocks = []
+        self.genre_names = descriptor['genre_names']
+        views = {}
+        for field, (name, dtype, shape) in descriptor['blocks'].items():
+            block = _attach_block(name)
+            self._blocks.append(block)
+            views[field] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=block.buf)
+            views[field].flags.writeable = False
+
+        for field in _SHARED_FIELDS:
+            setattr(self, field, views[field])
+        self.titles = _SharedTitles(views['title_bytes'], views['title_offsets'])
+        self.index = _SharedTitleIndex(self.titles, views['title_order'])
+
+    def genre_mask(self, genres: Iterable[str]) -> int:
+        """Returns the genre bitmask of the given genres. Genres that no movie has are ignored."""
+        return genre_bitmask(self.genre_names, genres)
+
+    def close(self) -> None:
+        """Detach from the shared memory blocks. The arrays of this object must not be used afterwards."""
+        for field in _SHARED_FIELDS:
+            setattr(self, field, None)
+        self.titles = self.index = None
+        for block in self._blocks:
+            block.close()
+        self._blocks = []
+
+
+class _SharedTitles:
+    """The titles of a SharedMovieArrays, decoded one at a time from the shared UTF-8 bytes."""
+    # Private Instance Attributes:
+    #     - _bytes:
+    #         The UTF-8 bytes of every title, one after the other.
+    #     - _offsets:
+    #         The offset of the bytes of every title, followed by the total number of bytes.
+    _bytes: np.ndarray
+    _offsets: np.ndarray
+
+    def __init__(self, title_bytes: np.ndarray, offsets: np.ndarray) -> None:
+        """Initialize the titles packed in the given arrays."""
+        self._bytes = title_bytes
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        """Returns the number of titles."""
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        """Returns the title of the movie in the given row."""
+        return self._bytes[self._offsets[row]:self._offsets[row + 1]].tobytes().decode('utf-8')
+
+
+class _SharedTitleIndex:
+    """Maps each title of a SharedMovieArrays to its row, by binary search over the rows in title order.
+
+    >>> encoded = [title.encode('utf-8') for title in ['Up', 'Léon', 'Heat']]
+    >>> titles = _SharedTitles(np.frombuffer(b''.join(encoded), dtype=np.uint8),
+    ...                        np.cumsum([0] + [len(title) for title in encoded]))
+    >>> index = _SharedTitleIndex(titles, np.array([2, 1, 0]))
+    >>> index['Léon'], index.get('Up'), index.get('Jaws', -1), 'Heat' in index, 'Alien' in index
+    (1, 0, -1, True, False)
+    >>> index['Jaws']
+    Traceback (most recent call last):
+    ...
+    KeyError: 'Jaws'
+    """
+    # Private Instance Attributes:
+    #     - _titles:
+    #         The titles.
+    #     - _order:
+    #         The rows, sorted by title.
+    _titles: _SharedTitles
+    _order: np.ndarray
+
+    def __init__(self, titles: _SharedTitles, order: np.ndarray) -> None:
+        """Initialize the index of the given titles, where order lists the rows sorted by title."""
+        self._titles = titles
+        self._order = order
+
+    def get(self, title: str, default: Optional[int] = None) -> Optional[int]:
+        """Returns the row of the movie with the given title, or default if there is none."""
+        low, high = 0, len(self._order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._titles[int(self._order[middle])] < title:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._order) and self._titles[int(self._order[low])] == title:
+            return int(self._order[low])
+        return default
+
+    def __getitem__(self, title: str) -> int:
+        """Returns the row of the movie with the given title.
+
+        Raise a KeyError if there is no movie with this title.
+        """
+        row = self.get(title)
+        if row is None:
+            raise KeyError(title)
+        return row
+
+    def __contains__(self, title: str) -> bool:
+        """Returns whether there is a movie with the given title."""
+        return self.get(title) is not None
+
+
+class ScoringPool:
+    """A pool of worker processes that rank movies from arrays shared with them through shared memory.
+
+    Instance Attributes:
+        - max_workers: The number of worker processes.
+    """
+    # Private Instance Attributes:
+    #     - _shared:
+    #         The shared arrays that new queries are answered from.
+    #     - _executor:
+    #         The worker processes.
+    #     - _users:
+    #         The number of queries that use each shared arrays and have not been answered yet.
+    #     - _lock:
+    #         Held while reading or replacing _shared and updating _users, since update runs on the thread that
+    #         ingests reviews and the queries are answered on the thread that manages the workers.
+    max_workers: int
+    _shared: SharedArrays
+    _executor: ProcessPoolExecutor
+    _users: dict[SharedArrays, int]
+    _lock: threading.Lock
+
+    def __init__(self, arrays: MovieArrays, max_workers: int = 4) -> None:
+        """Share the given arrays and start max_workers worker processes.
+
+        Preconditions:
+            - max_workers > 0
+        """
+        self.max_workers = max_workers
+        self._shared = SharedArrays(arrays)
+        self._users = {}
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context())
+
+    def recommend(self, movie: str, genres: set[str], limit: int = 10, ranking: str = 'similarity',
+                  candidates: Optional[Collection[str]] = None) -> Future:
+        """Starts ranking the movies (or only the candidates, if given) for the given favourite movie and genres
+        on a worker, and returns the future of the result of recommendation_records.
+
+        Preconditions:
+            - limit > 0
+            - ranking in SHARED_RANKINGS
+        """
+        # register the query as a user of the arrays before submitting it, so that they are not freed before
+        # the worker attaches to them
+        with self._lock:
+            shared = self._shared
+            self._users[shared] = self._users.get(shared, 0) + 1
+        try:
+            future = self._executor.submit(_worker_recommend, shared.descriptor, movie, set(genres), limit,
+                                           ranking, None if candidates is None else list(candidates))
+        except BaseException:
+            self._release(shared)
+            raise
+        future.add_done_callback(lambda _: self._release(shared))
+        return future
+
+    def update(self, arrays: MovieArrays) -> None:
+        """Share the given arrays (for example, after new reviews were added to them), so that the queries
+        started from now on are answered from them.
+
+        The previously shared arrays are freed once the queries using them are answered.
+        """
+        shared = SharedArrays(arrays)
+        with self._lock:
+            previous, self._shared = self._shared, shared
+            if previous not in self._users:
+                previous.close()
+
+    def _release(self, shared: SharedArrays) -> None:
+        """Forget one answered (or never submitted) query that used the given arrays, and free them if they were
+        replaced and no other query uses them.
+        """
+        with self._lock:
+            self._users[shared] -= 1
+            if self._users[shared] == 0:
+                del self._users[shared]
+                if shared is not self._shared:
+                    shared.close()
+
+    def close(self) -> None:
+        """Stop the worker processes, after they answered the queries already started, and free the arrays."""
+        self._executor.shutdown()
+        self._shared.close()
+
+
+def recommendation_records(arrays: Any, movie: str, genres: set[str], limit: int, ranking: str = 'similarity',
+                           candidates: Optional[Collection[str]] = None) -> list[dict[str, Any]]:
+    """Returns the same records as batch.recommendation_records for the given favourite movie, genres and
+    candidates, computed from the given MovieArrays or SharedMovieArrays instead of a graph.
+
+    Raise a KeyError if movie is not the title of a movie in arrays.
+
+    Preconditions:
+        - limit > 0
+        - ranking in SHARED_RANKINGS
+
+    >>> import batch
+    >>> from classes import WeightedGraph
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Alien", "Movie", {"Sci-fi"})
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex("Heat", "Movie", {"Action", "Crime"})
+    >>> for movie, scores in [("Alien", [0.9, 0.8]), ("Aliens", [0.6, 0.7, 0.8]), ("Heat", [0.5, 0.7, 0.9])]:
+    ...     for score in scores:
+    ...         g.add_vertex(score, "Review")
+    ...         g.add_edge(movie, score)
+    >>> shared = SharedArrays(MovieArrays(g))
+    >>> arrays = SharedMovieArrays(shared.descriptor)
+    >>> records = {ranking: recommendation_records(arrays, "Alien", {"Action"}, 2, ranking)
+    ...            for ranking in SHARED_RANKINGS}
+    >>> g.set_user_preferences("Alien", {"Action"})
+    >>> all(records[ranking] == batch.recommendation_records(g, 2, ranking) for ranking in SHARED_RANKINGS)
+    True
+    >>> [record['title'] for record in records['similarity']]
+    ['Aliens', 'Heat']
+    >>> arrays.close()
+    >>> shared.close()
+    """
+    row = arrays.index[movie]
+    genres_mask = arrays.genre_mask(genres)
+    if ranking == 'pagerank':
+        # the transition probabilities are computed once per worker
+        if _WORKER['ranker'] is None or _WORKER['ranker'].arrays is not arrays:
+            _WORKER['ranker'] = PersonalizedPageRank(arrays)
+        ranked = _WORKER['ranker'].top(movie, genres, limit, candidates)
+    else:
+        scores = similarity_scores(arrays, row, genres_mask)
+        if candidates is not None:
+            restrict_scores(scores, arrays.index, candidates)
+        ranked = [(other, float(scores[other])) for other in top_rows(scores, limit)]
+
+    similarities = overall_similarities(arrays, row, genres_mask)
+    counts = arrays.review_counts
+    return [{'rank': rank, 'title': arrays.titles[other], 'score': score,
+             'similarity': float(similarities[other]),
+             'average_score': float(arrays.review_totals[other] / counts[other]) if counts[other] > 0 else 0,
+             'num_reviews': int(counts[other])}
+            for rank, (other, score) in enumerate(ranked, start=1)]
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """Attach to the existing shared memory block with the given name, leaving it to its creator to free it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13, blocks attached by the workers of a pool are tracked by the resource tracker
+        # of the process that created them, which is also the one that frees them
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_recommend(descriptor: dict[str, Any], movie: str, genres: set[str], limit: int, ranking: str,
+                      candidates: Optional[list[str]]) -> list[dict[str, Any]]:
+    """Runs recommendation_records in a worker process, attaching to the shared arrays of descriptor if this
+    worker is not attached to them yet.
+    """
+    arrays = _WORKER['arrays']
+    if _WORKER['id'] != descriptor['id']:
+        if arrays is not None:
+            _WORKER['ranker'] = None
+            arrays.close()
+        _WORKER['arrays'], _WORKER['id'] = SharedMovieArrays(descriptor), descriptor['id']
+
+    return recommendation_records(_WORKER['arrays'], movie, genres, limit, ranking, candidates)
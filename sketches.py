@@ -0,0 +1,192 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the QuantileSketch class, a KLL sketch that keeps the approximate distribution of the
+review scores of a movie in bounded memory, so that medians and other percentiles of the raw scores can be
+computed without keeping every score.
+
+A sketch is made of levels of stored scores, where a score stored at level h stands for 2 ** h scores.
+When a level holds too many scores, they are sorted and every other one is promoted to the next level, so
+a sketch never stores more than about 3 * k scores however many it was given. Until then, every score is
+stored and the quantiles are exact. Two sketches are merged by concatenating their levels, so the reviews
+can be summarized in separate chunks (or processes) and merged afterwards.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import bisect
+import itertools
+from typing import Iterable, Optional
+
+# The size parameter of new sketches: the rank error of a quantile is about 1.7 / SKETCH_SIZE.
+SKETCH_SIZE = 200
+
+
+class QuantileSketch:
+    """A mergeable sketch of the distribution of a stream of scores.
+
+    Instance Attributes:
+        - k: The size parameter of this sketch: the number of scores the top level can hold.
+        - n: The number of scores given to this sketch.
+        - levels: The scores stored at every level, where a score at level h stands for 2 ** h scores.
+
+    Representation Invariants:
+        - self.k >= 2
+        - self.n == sum(len(items) * 2 ** h for h, items in enumerate(self.levels))
+    """
+    # Private Instance Attributes:
+    #     - _coin:
+    #         Which half of the sorted scores the next compaction promotes, alternated between compactions.
+    #     - _cdf:
+    #         The sorted stored scores and their cumulative weights, computed by quantile, or None.
+    k: int
+    n: int
+    levels: list[list[float]]
+    _coin: int
+    _cdf: Optional[tuple[list[float], list[int]]]
+
+    def __init__(self, k: int = SKETCH_SIZE) -> None:
+        """Initialize an empty sketch with the given size parameter.
+
+        Preconditions:
+            - k >= 2
+        """
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self._coin = 0
+        self._cdf = None
+
+    @staticmethod
+    def from_levels(levels: list[list[float]], k: int = SKETCH_SIZE) -> QuantileSketch:
+        """Returns the sketch with the given stored levels, such as the levels of a saved sketch.
+
+        >>> sketch = QuantileSketch.from_levels([[0.5], [0.1, 0.9]])
+        >>> sketch.n, sketch.quantile(0.5)
+        (5, 0.5)
+        """
+        sketch = QuantileSketch(k)
+        sketch.levels = [list(items) for items in levels] or [[]]
+        sketch.n = sum(len(items) << h for h, items in enumerate(sketch.levels))
+        return sketch
+
+    def update(self, score: float) -> None:
+        """Add one score to this sketch."""
+        self.update_many([score])
+
+    def update_many(self, scores: Iterable[float]) -> None:
+        """Add the given scores to this sketch.
+
+        >>> sketch = QuantileSketch(k=8)
+        >>> sketch.update_many(range(1000))
+        >>> sketch.n, sum(len(items) for items in sketch.levels) <= 3 * 8 + 2 * len(sketch.levels)
+        (1000, True)
+        >>> 400 <= sketch.quantile(0.5) <= 600
+        True
+        """
+        level = self.levels[0]
+        size = len(level)
+        level.extend(scores)
+        self.n += len(level) - size
+        self._cdf = None
+        if len(level) >= self._capacity(0):
+            self._compress()
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Add the scores summarized by other to this sketch.
+
+        >>> first, second = QuantileSketch(), QuantileSketch()
+        >>> first.update_many([0.1, 0.2, 0.3])
+        >>> second.update_many([0.9, 1.0])
+        >>> first.merge(second)
+        >>> first.n, first.quantile(0.5), first.quantile(1)
+        (5, 0.3, 1.0)
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.n += other.n
+        self._cdf = None
+        self._compress()
+
+    def quantile(self, q: float) -> float:
+        """Returns the (approximate) score that a proportion q of the scores are at most, which is the lower median
+        if q == 0.5, or 0 if this sketch is empty.
+
+        Preconditions:
+            - 0 <= q <= 1
+
+        >>> sketch = QuantileSketch()
+        >>> sketch.update_many([0.6, 0.2, 0.9, 0.7])
+        >>> sketch.quantile(0.5), sketch.quantile(0.9), sketch.quantile(0)
+        (0.6, 0.9, 0.2)
+        >>> QuantileSketch().quantile(0.5)
+        0
+        """
+        if self.n == 0:
+            return 0
+
+        # sort the stored scores with their weights once, until the next update
+        if self._cdf is None:
+            weighted = sorted((score, 1 << h) for h, items in enumerate(self.levels) for score in items)
+            self._cdf = ([score for score, _ in weighted],
+                         list(itertools.accumulate(weight for _, weight in weighted)))
+
+        scores, cumulative = self._cdf
+        position = bisect.bisect_left(cumulative, q * self.n)
+        return scores[min(position, len(scores) - 1)]
+
+    def _capacity(self, h: int) -> int:
+        """Returns the number of scores level h can hold: the top level holds k, and every level below it
+        two thirds of the level above it, but at least 2.
+        """
+        return max(2, int(self.k * (2 / 3) ** (len(self.levels) - 1 - h)))
+
+    def _compress(self) -> None:
+        """Compact every level that holds as many scores as it can, from the lowest level up."""
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) >= self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append([])
+
+                # keep one score at this level if there is an odd number of them, and promote every other one
+                # of the remaining sorted scores
+                items.sort()
+                kept = [items.pop()] if len(items) % 2 == 1 else []
+                self.levels[h + 1].extend(items[self._coin::2])
+                self.levels[h] = kept
+                self._coin = 1 - self._coin
+            h += 1
+
+
+if __name__ == "__main__":
+    # requirement for "code quality"
+    # "code-checking tools"
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ["bisect", "itertools", "typing"],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,310 @@
+"""CSC111 Project 2: Identifying Quality Films Through Rotten Tomatoes' Metrics
+
+Module Description
+==================
+
+This module contains the parameter sweep of the 'similarity' ranking, which ranks the movies for one favourite
+movie under a whole grid of settings of its parameters at once, and reports how stable the rankings are.
+
+A setting is a (weight_for_movie, weight_for_genres, min_number_of_reviews) triple: the weights of
+_WeightedVertex.overall_similarity_score and the minimum of _WeightedVertex.average_score_strict. The score of
+every movie under every setting is computed from the per-movie columns of a MovieArrays (see
+movie_arrays.similarity_scores), as one broadcast NumPy operation per minimum number of reviews, and only for
+the movies that can reach the top of at least one of the settings (see sweep_top_rows). The report gives:
+    - the top k movies under every setting
+    - the overlap between the top k movies of every pair of settings
+    - the Kendall rank correlation (tau-b) between the scores of every pair of settings, over the movies that
+      are in the top k of any setting
+    - the time taken by the sweep, next to the time of a single ranking
+
+Usage:
+    python sweeps.py Inception --genres Action Sci-fi --weights 0 0.25 0.5 0.75 1 --min-reviews 1 3 10 --k 10
+
+Without --weights and --min-reviews, the default grid has 99 settings.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of CSC111 students, teaching staff,
+and the Department of Computer Science at the University of Toronto St. George campus.
+All forms of distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Iterable
+
+import numpy as np
+
+from classes import WeightedGraph
+import batch
+import main
+from movie_arrays import MovieArrays, similarity_columns, similarity_scores, top_rows, unranked_rows
+
+# The weights for the movie similarity and the minimum numbers of reviews of the default grid (11 x 9 settings).
+DEFAULT_WEIGHTS_FOR_MOVIE = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+DEFAULT_MIN_NUMBERS_OF_REVIEWS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# The setting of the 'similarity' ranking of main.recommend_movies, which the other settings are compared to.
+REFERENCE_SETTING = (0.5, 0.5, 3)
+
+# The relative slack of the bound that the candidates of sweep_top_rows must reach, so that the rounding
+# of the scores never leaves out a movie whose score is exactly the bound.
+_BOUND_SLACK = 1e-9
+
+
+def parameter_grid(weights_for_movie: Iterable[float],
+                   min_numbers_of_reviews: Iterable[int]) -> list[tuple[float, float, int]]:
+    """Returns every (weight_for_movie, weight_for_genres, min_number_of_reviews) setting of the given weights
+    for the movie similarity and minimum numbers of reviews, where weight_for_genres is 1 - weight_for_movie.
+
+    >>> parameter_grid([0.25, 1.0], [3, 5])
+    [(0.25, 0.75, 3), (0.25, 0.75, 5), (1.0, 0.0, 3), (1.0, 0.0, 5)]
+    """
+    minimums = list(min_numbers_of_reviews)
+    return [(weight, 1 - weight, minimum) for weight in weights_for_movie for minimum in minimums]
+
+
+def top_rows_grid(scores: np.ndarray, limit: int) -> list[list[int]]:
+    """Returns top_rows(scores[i], limit) for every row i of the 2-dimensional array scores, where the best
+    limit scores of all the rows are found by a single partition.
+
+    >>> top_rows_grid(np.array([[0.5, 0.1, 0.9, 0.5], [0.5, 0.4, 0.5, 0.5], [0.5, -np.inf, -np.inf, 0.5]]), 3)
+    [[2, 0, 3], [0, 2, 3], [0, 3]]
+    """
+    limit = min(limit, scores.shape[1])
+    if limit <= 0:
+        return [[] for _ in range(len(scores))]
+
+    # keep the scores above the limit-th best score of every row, then as many of the scores equal to it as
+    # needed, in column order like top_rows
+    cut = -np.partition(-scores, limit - 1, axis=1)[:, limit - 1:limit]
+    equal = scores == cut
+    needed = limit - np.count_nonzero(scores > cut, axis=1)
+    kept = (scores > cut) | (equal & (np.cumsum(equal, axis=1) <= needed[:, np.newaxis]))
+    columns = np.nonzero(kept)[1].reshape(len(scores), limit)
+
+    # sort the kept scores of every row by score, then by column
+    selected = np.take_along_axis(scores, columns, axis=1)
+    top = np.take_along_axis(columns, np.lexsort((columns, -selected), axis=-1), axis=1)
+
+    # top_rows skips -inf scores, which only make the cut if a row has fewer than limit other scores
+    return [top[i].tolist() if cut[i, 0] > -np.inf else top_rows(scores[i], limit) for i in range(len(scores))]
+
+
+def sweep_top_rows(arrays: MovieArrays, row: int, genres_mask: int, settings: list[tuple[float, float, int]],
+                   limit: int) -> list[list[int]]:
+    """Returns the rows of the top limit movies of the 'similarity' ranking under every setting of settings, for
+    the favourite movie in the given row and the preferred genres in genres_mask. These are the same rows as
+    top_rows(similarity_scores(arrays, row, genres_mask, ...), limit) with the parameters of each setting.
+
+    The settings with the same min_number_of_reviews are scored together, as one array of (settings, movies).
+    Only the movies that can reach the top limit of one of these settings are scored: the limit-th best score
+    of every setting is at least the limit-th best score of a few movies (the best by movie similarity, by genre
+    similarity and by both), and the score of a movie is at most weight_for_movie + weight_for_genres times its
+    strict average score times the larger of its two similarities.
+
+    Preconditions:
+        - 0 <= row < len(arrays.movies)
+        - limit > 0
+        - all(0 <= w1 <= 1 and 0 <= w2 <= 1 and minimum > 0 for w1, w2, minimum in settings)
+
+    >>> g = WeightedGraph()
+    >>> g.add_vertex("Alien", "Movie", {"Sci-fi"})
+    >>> g.add_vertex("Aliens", "Movie", {"Sci-fi", "Action"})
+    >>> g.add_vertex("Heat", "Movie", {"Action"})
+    >>> g.add_vertex("Up", "Movie", {"Animation"})
+    >>> for score in [0.4, 0.9, 0.95]:
+    ...     g.add_vertex(score, "Review")
+    ...     g.add_edge("Heat", score)
+    >>> g.add_edge("Aliens", 0.4)
+    >>> g.add_edge("Up", 0.9)
+    >>> arrays = MovieArrays(g)
+    >>> settings = [(1.0, 0.0, 1), (0.0, 1.0, 1), (0.0, 1.0, 3)]
+    >>> sweep_top_rows(arrays, 0, arrays.genre_mask({"Action"}), settings, 2)
+    [[1, 2], [2, 1], [2, 1]]
+    """
+    movie_similarity, genre_similarity = similarity_columns(arrays, row, genres_mask)
+    ranked = ~unranked_rows(arrays, row)
+    counts, totals = arrays.review_counts, arrays.review_totals
+    tops = [[] for _ in settings]
+
+    # the movies that can score above 0, with their average score and similarities, kept in row order
+    eligible = np.flatnonzero(ranked & (totals > 0))
+    averages, movie_eligible, genre_eligible = totals[eligible] / counts[eligible], \
+        movie_similarity[eligible], genre_similarity[eligible]
+
+    for minimum in sorted({setting[2] for setting in settings}):
+        members = [i for i, setting in enumerate(settings) if setting[2] == minimum]
+        weights = np.array([settings[i][:2] for i in members], dtype=float)
+
+        # the movies with enough reviews for this minimum, among those with enough reviews for the previous one
+        keep = counts[eligible] >= minimum
+        eligible, averages, movie_eligible, genre_eligible = \
+            eligible[keep], averages[keep], movie_eligible[keep], genre_eligible[keep]
+
+        # the limit-th best score of every setting among a few of the best movies, which bounds its top limit
+        bound = 0.0
+        if len(eligible) >= limit:
+            columns = np.stack([averages * movie_eligible, averages * genre_eligible,
+                                averages * (movie_eligible + genre_eligible)])
+            pool = np.unique(np.argpartition(-columns, limit - 1, axis=1)[:, :limit])
+            pool_scores = averages[pool] * (movie_eligible[pool] * weights[:, :1]
+                                            + genre_eligible[pool] * weights[:, 1:])
+            lowest = -np.partition(-pool_scores, limit - 1, axis=1)[:, limit - 1]
+            if np.all(lowest > 0) and np.all(weights.sum(axis=1) > 0):
+                bound = float(np.min(lowest / weights.sum(axis=1))) * (1 - _BOUND_SLACK)
+
+        # score the movies that can reach the bound in one operation. Without a bound, the movies without
+        # enough reviews can make the top too, but they all score 0, so only the limit lowest rows of them can
+        if bound > 0:
+            candidates = eligible[averages * np.maximum(movie_eligible, genre_eligible) >= bound]
+        else:
+            others = ranked.copy()
+            others[eligible] = False
+            candidates = np.union1d(eligible, np.flatnonzero(others)[:limit])
+        candidate_averages = np.divide(totals[candidates], counts[candidates], out=np.zeros(len(candidates)),
+                                       where=counts[candidates] >= minimum)
+        scores = candidate_averages * (movie_similarity[candidates] * weights[:, :1]
+                                       + genre_similarity[candidates] * weights[:, 1:])
+
+        for i, columns in zip(members, top_rows_grid(scores, limit)):
+            tops[i] = candidates[columns].tolist()
+    return tops
+
+
+def kendall_taus(scores: np.ndarray) -> np.ndarray:
+    """Returns the Kendall rank correlation (tau-b) between the rows of the 2-dimensional array scores: entry [i, j]
+    compares the order of the columns by scores[i] and by scores[j]. It is 0 if either row has only equal scores.
+
+    >>> kendall_taus(np.array([[0.1, 0.2, 0.3], [0.2, 0.4, 0.9], [0.3, 0.2, 0.1]])).tolist()
+    [[1.0, 1.0, -1.0], [1.0, 1.0, -1.0], [-1.0, -1.0, 1.0]]
+    >>> kendall_taus(np.array([[0.1, 0.2, 0.3], [0.5, 0.5, 0.5]])).tolist()
+    [[1.0, 0.0], [0.0, 0.0]]
+    """
+    num_rows, num_columns = scores.shape
+    concordance = np.zeros((num_rows, num_rows))
+    untied = np.zeros(num_rows)
+
+    # compare every column with the columns after it, for all the rows at once
+    for column in range(num_columns - 1):
+        signs = np.sign(scores[:, column + 1:] - scores[:, column:column + 1])
+        concordance += signs @ signs.T
+        untied += np.count_nonzero(signs, axis=1)
+
+    denominator = np.sqrt(np.outer(untied, untied))
+    return np.divide(concordance, denominator, out=np.zeros((num_rows, num_rows)), where=denominator > 0)
+
+
+def sweep(arrays: MovieArrays, row: int, genres_mask: int, settings: list[tuple[float, float, int]],
+          limit: int = 10) -> dict[str, Any]:
+    """Returns the report of the sweep of the 'similarity' ranking over settings, for the favourite movie in the
+    given row and the preferred genres in genres_mask. The report has:
+        - 'settings': the settings, as [weight_for_movie, weight_for_genres, min_number_of_reviews] lists
+        - 'top': the titles of the top limit movies under every setting
+        - 'overlap': overlap[i][j] is the proportion of the top limit movies of setting i also in the top of j
+        - 'kendall_tau': kendall_tau[i][j] is the Kendall rank correlation between the scores of settings i and j
+          of the movies in the top limit of any setting
+        - 'seconds': the time taken to find the top movies of every setting ('top'), to compare the settings
+          ('stability'), and to find the top movies of a single setting with similarity_scores ('single_ranking')
+
+    Preconditions:
+        - 0 <= row < len(arrays.movies)
+        - limit > 0
+        - settings != []
+        - all(0 <= w1 <= 1 and 0 <= w2 <= 1 and minimum > 0 for w1, w2, minimum in settings)
+    """
+    start = time.perf_counter()
+    tops = sweep_top_rows(arrays, row, genres_mask, settings, limit)
+    top_seconds = time.perf_counter() - start
+
+    # the scores of every movie in the top of any setting, under every setting
+    start = time.perf_counter()
+    union = np.unique(np.fromiter((r for top in tops for r in top), dtype=np.intp))
+    weights = np.array([setting[:2] for setting in settings], dtype=float)
+    minimums = np.array([setting[2] for setting in settings])[:, np.newaxis]
+    counts, totals = arrays.review_counts[union], arrays.review_totals[union]
+    averages = np.divide(totals, counts, out=np.zeros((len(settings), len(union))), where=counts >= minimums)
+    movie_similarity, genre_similarity = similarity_columns(arrays, row, genres_mask)
+    scores = averages * (movie_similarity[union] * weights[:, :1] + genre_similarity[union] * weights[:, 1:])
+
+    # the number of top movies that every pair of settings share
+    members = np.zeros((len(settings), len(union)))
+    for i, top in enumerate(tops):
+        members[i, np.searchsorted(union, top)] = 1
+    overlap = members @ members.T / limit
+    taus = kendall_taus(scores)
+    stability_seconds = time.perf_counter() - start
+
+    # a single ranking, for comparison
+    start = time.perf_counter()
+    top_rows(similarity_scores(arrays, row, genres_mask), limit)
+    single_seconds = time.perf_counter() - start
+
+    return {'settings': [list(setting) for setting in settings],
+            'top': [arrays.titles[top].tolist() for top in tops],
+            'overlap': overlap.round(4).tolist(),
+            'kendall_tau': taus.round(4).tolist(),
+            'seconds': {'top': top_seconds, 'stability': stability_seconds, 'single_ranking': single_seconds}}
+
+
+def format_sweep(report: dict[str, Any], reference: int = 0) -> str:
+    """Returns the summary of the given sweep report as a table with one row per setting, comparing every setting
+    to the setting with the given index.
+
+    >>> print(format_sweep({'settings': [[0.5, 0.5, 3], [1.0, 0.0, 3]], 'top': [['Up'], ['Heat']],
+    ...                     'overlap': [[1.0, 0.0], [0.0, 1.0]], 'kendall_tau': [[1.0, -1.0], [-1.0, 1.0]],
+    ...                     'seconds': {'top': 0.002, 'stability': 0.001, 'single_ranking': 0.001}}))
+    movie  genres  min reviews  overlap      tau  top
+    0.50   0.50              3   1.0000   1.0000  Up
+    1.00   0.00              3   0.0000  -1.0000  Heat
+    2 settings in 3.000 ms (3.0 single rankings of 1.000 ms)
+    """
+    lines = [f"{'movie':<5}  {'genres':<6}  {'min reviews':>11}  {'overlap':>7}  {'tau':>7}  top"]
+    for i, (weight_for_movie, weight_for_genres, minimum) in enumerate(report['settings']):
+        lines.append(f"{weight_for_movie:<5.2f}  {weight_for_genres:<6.2f}  {minimum:>11}  "
+                     f"{report['overlap'][reference][i]:>7.4f}  {report['kendall_tau'][reference][i]:>7.4f}  "
+                     f"{', '.join(report['top'][i][:3])}")
+
+    seconds = report['seconds']
+    total, single = seconds['top'] + seconds['stability'], seconds['single_ranking']
+    lines.append(f"{len(report['settings'])} settings in {total * 1000:.3f} ms "
+                 f"({total / single:.1f} single rankings of {single * 1000:.3f} ms)")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep the parameters of the 'similarity' ranking.")
+    parser.add_argument('movie', help="title of the favourite movie")
+    parser.add_argument('--genres', nargs='*', default=[], help="favourite genres")
+    parser.add_argument('--reviews', default="data/rotten_tomatoes_movie_reviews.csv")
+    parser.add_argument('--movies', default="data/rotten_tomatoes_movies.csv")
+    parser.add_argument('--weights', nargs='+', type=float, default=DEFAULT_WEIGHTS_FOR_MOVIE,
+                        help="weights for the movie similarity (the genres get the rest)")
+    parser.add_argument('--min-reviews', nargs='+', type=int, default=DEFAULT_MIN_NUMBERS_OF_REVIEWS,
+                        help="minimum numbers of reviews of the strict average score")
+    parser.add_argument('--k', type=int, default=10, help="number of top movies compared per setting")
+    parser.add_argument('--output', default='', help="JSON file that the full report is written to")
+    args = parser.parse_args()
+
+    full_graph = WeightedGraph()
+    movie_dicts, _ = main.load_movie_columns(args.movies, full_graph)
+    try:
+        _, title = batch.find_favourite_movie(movie_dicts, {'movie': args.movie})
+    except ValueError as error:
+        parser.error(str(error))
+    main.load_review_columns(args.reviews, [full_graph], movie_dicts)
+    movie_arrays = MovieArrays(full_graph)
+
+    grid = parameter_grid(args.weights, args.min_reviews)
+    report = sweep(movie_arrays, movie_arrays.index[title],
+                   movie_arrays.genre_mask({genre.strip().capitalize() for genre in args.genres}), grid, args.k)
+    print(format_sweep(report, grid.index(REFERENCE_SETTING) if REFERENCE_SETTING in grid else 0))
+    if args.output != '':
+        with open(args.output, 'w', encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
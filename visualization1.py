@@ -17,72 +17,93 @@ expressly prohibited.
 
 This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
 """
-from typing import List, Dict
-import networkx as nx
-from plotly.graph_objs import Scatter, Figure
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, List, Dict
+import numpy as np
 
 from classes import WeightedGraph
 
+# networkx and plotly are only imported by visualize_graph, since they are slow to import
+if TYPE_CHECKING:
+    import networkx as nx
+
 LINE_COLOUR = 'rgb(100, 100, 100)'
 VERTEX_BORDER_COLOUR = 'rgb(0, 0, 0)'
 CHOSEN_MOVIE_COLOUR = 'rgb(255, 255, 255)'
 REVIEW_COLOUR = 'rgb(105, 89, 205)'
 
 
-def assign_vertex_colors(graph_nx: nx.Graph, num_movies: int) -> List[str]:
-    """Generates a list of colors assigned to each vertex in a NetworkX graph based on vertex kind.
+def assign_vertex_colors(kinds: np.ndarray, num_movies: int) -> np.ndarray:
+    """Generates an array of colors assigned to each vertex based on its kind.
+
+    kinds[i] is the 'kind' attribute of the i-th vertex. This function creates a distinct color for each
+    'Movie' vertex using a rainbow color scheme, assigns a specific white color to 'Chosen Movie' vertices,
+    and a default purple color to all other kinds of vertices, presumably 'Review' vertices.
 
-    This function creates a distinct color for each 'Movie' vertex using a rainbow color scheme,
-    assigns a specific white color to 'Chosen Movie' vertices, and a default purple color to
-    all other kinds of vertices, presumably 'Review' vertices.
+    The colors are assigned with array masks rather than a loop over the vertices.
+
+    Preconditions:
+        - num_movies == the number of entries in kinds equal to 'Movie'
     """
-    # generate a list of rainbow colors, one for each movie
-    # the color space is divided evenly among all movies
-    rainbow_colours = [f'hsl({i * (360 / num_movies)}, 100%, 50%)' for i in range(num_movies)]
+    # start with every vertex coloured as a review, then overwrite the movie and chosen movie entries
+    colours = np.full(len(kinds), REVIEW_COLOUR, dtype=object)
+    colours[kinds == "Chosen Movie"] = CHOSEN_MOVIE_COLOUR
 
-    # initialize an empty list for storing the color assigned to each vertex and a counter for the rainbow colors
-    colours, rainbow_index = [], 0
+    # generate one rainbow color per movie, dividing the color space evenly among all movies
+    # the k-th movie vertex (in vertex order) receives the k-th color of the sequence
+    if num_movies > 0:
+        colours[kinds == "Movie"] = [f'hsl({i * (360 / num_movies)}, 100%, 50%)' for i in range(num_movies)]
 
-    # iterate over each vertex in the graph, checking its 'kind' attribute to determine the appropriate color
-    for kind in [graph_nx.nodes[k]['kind'] for k in graph_nx.nodes]:
-        if kind == "Chosen Movie":
+    # return the array of assigned colors
+    return colours
 
-            # assign the predefined white color to 'Chosen Movie' vertices
-            colours.append(CHOSEN_MOVIE_COLOUR)
-        elif kind == "Movie":
 
-            # assign the next color in the rainbow sequence to 'Movie' vertices
-            colours.append(rainbow_colours[rainbow_index])
+def calculate_vertex_positions(labels: List[Any], pos: Dict) -> np.ndarray:
+    """Returns a (len(labels), 2) array where row i holds the x and y coordinates of the vertex labels[i].
 
-            # move to the next color in the sequence, looping back to the start if necessary
-            rainbow_index = (rainbow_index + 1) % len(rainbow_colours)
-        else:
+    The row index of a vertex in this array is the index used by calculate_edge_indices.
+    """
+    # copy the layout coordinates into one preallocated array in vertex order
+    positions = np.empty((len(labels), 2), dtype=float)
+    for i, label in enumerate(labels):
+        positions[i] = pos[label]
 
-            # assign the predefined purple color to vertices of any other kind, assumed to be 'Review' vertices
-            colours.append(REVIEW_COLOUR)
+    return positions
 
-    # return the list of assigned colors.
-    return colours
 
+def calculate_edge_indices(graph_nx: nx.Graph, labels: List[Any]) -> np.ndarray:
+    """Returns a (number of edges, 2) integer array holding the indices (into labels) of the two endpoints
+    of every edge in graph_nx.
 
-def calculate_edge_positions(graph_nx: nx.Graph, pos: Dict) -> List[List[float]]:
+    Preconditions:
+        - labels contains every vertex of graph_nx exactly once
+    """
+    # map each vertex to its row in the position array
+    node_index = {label: i for i, label in enumerate(labels)}
+
+    # flatten the endpoints of every edge into one integer array, then pair them up
+    num_edges = graph_nx.number_of_edges()
+    endpoints = np.fromiter((node_index[v] for edge in graph_nx.edges for v in edge),
+                            dtype=np.intp, count=2 * num_edges)
+
+    return endpoints.reshape((num_edges, 2))
+
+
+def calculate_edge_positions(edge_indices: np.ndarray, vertex_positions: np.ndarray) -> np.ndarray:
     """Calculates the positions of edges in a graph for visualization.
 
-    Given a graph and a mapping of node positions, this function computes the start
-    and end positions of each edge in the graph. These positions are used for plotting
-    lines between nodes in a visual representation of the graph.
+    Given the endpoint indices of every edge and the coordinates of every vertex, this function returns a
+    (2, 3 * number of edges) array: row 0 holds x-coordinates and row 1 holds y-coordinates. Each edge takes
+    three consecutive columns (start point, end point, NaN), so that Plotly draws every edge as its own segment.
     """
-    # initialize a list to hold the x and y coordinates of the edges
-    position_edges = [[], []]
-
-    # iterate through each edge in the graph
-    for edge in graph_nx.edges:
+    # preallocate the line buffer, filled with NaN so every third column separates two edges
+    position_edges = np.full((2, 3 * len(edge_indices)), np.nan)
 
-        # append the x-coordinates of the start and end points of the edge, followed by None
-        position_edges[0] += [pos[edge[0]][0], pos[edge[1]][0], None]  # X-coordinates
-        position_edges[1] += [pos[edge[0]][1], pos[edge[1]][1], None]  # Y-coordinates
+    # gather the start and end coordinates of all edges at once
+    position_edges[:, 0::3] = vertex_positions[edge_indices[:, 0]].T
+    position_edges[:, 1::3] = vertex_positions[edge_indices[:, 1]].T
 
-    # return the list of x and y coordinates, ready for plotting
+    # return the x and y coordinates, ready for plotting
     return position_edges
 
 
@@ -94,24 +115,28 @@ def visualize_graph(graph: WeightedGraph, layout: str = 'spring_layout',
     applies a layout algorithm to position the nodes, assigns colors based on node
     type, and plots the graph using Plotly with custom formatting for nodes and edges.
     """
+    import networkx as nx
+    from plotly.graph_objs import Scatter, Figure
+
     # convert the custom graph into a NetworkX graph, limiting the number of vertices
     graph_nx = graph.to_networkx(max_vertices)
 
     # apply the specified layout to determine the positions of nodes in the graph
     pos = getattr(nx, layout)(graph_nx)
 
-    # extract node labels and count the number of movie nodes for color assignment
+    # extract node labels and kinds, and count the number of movie nodes for color assignment
     labels = list(graph_nx.nodes)
-    num_movies = [graph_nx.nodes[k]['kind'] for k in graph_nx.nodes].count("Movie")
+    kinds = np.array([kind for _, kind in graph_nx.nodes(data='kind')], dtype=object)
+    num_movies = int(np.count_nonzero(kinds == "Movie"))
 
     # assign colors to the nodes based on their type (movie, chosen movie, review)
-    colours = assign_vertex_colors(graph_nx, num_movies)
+    colours = assign_vertex_colors(kinds, num_movies)
 
-    # calculate the positions of the edges for plotting
-    position_edges = calculate_edge_positions(graph_nx, pos)
+    # organize node positions into one array indexed like labels
+    vertex_positions = calculate_vertex_positions(labels, pos)
 
-    # organize node positions into x and y coordinates for plotting
-    position_values = [[pos[k][0] for k in graph_nx.nodes], [pos[k][1] for k in graph_nx.nodes]]
+    # calculate the positions of the edges for plotting, using the node index of each edge endpoint
+    position_edges = calculate_edge_positions(calculate_edge_indices(graph_nx, labels), vertex_positions)
 
     # create Plotly traces for edges and nodes, configuring their appearance
     traces = [
@@ -127,8 +152,8 @@ def visualize_graph(graph: WeightedGraph, layout: str = 'spring_layout',
             hoverinfo='none'
         ),
         Scatter(
-            x=position_values[0],
-            y=position_values[1],
+            x=vertex_positions[:, 0],
+            y=vertex_positions[:, 1],
             mode='markers',
             name='nodes',
             marker={
@@ -154,9 +179,13 @@ def visualize_graph(graph: WeightedGraph, layout: str = 'spring_layout',
     fig.update_xaxes(showgrid=False, zeroline=False, visible=False)
     fig.update_yaxes(showgrid=False, zeroline=False, visible=False)
 
-    # display the figure interactively or save it as an image, based on 'output_file'
+    # display the figure interactively or save it to a file, based on 'output_file'
     if output_file == '':
         fig.show()
+    elif output_file.endswith('.html'):
+        fig.write_html(output_file, include_plotlyjs=True)  # Save a self-contained HTML page
+    elif output_file.endswith('.json'):
+        fig.write_json(output_file)  # Save the figure specification
     else:
         fig.write_image(output_file)
 
@@ -174,10 +203,7 @@ if __name__ == "__main__":
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ["csv", "networkx", "typing", "io", "time", "tkinter",
-                          "visualization1", "visualization2", "classes",
-                          "plotly.graph_objs", "pandas", "plotly.graph_objects"],
-        'allowed-io': ["get_favourite_movie", "get_favourite_genres", "load_weighted_review_graph",
-                       "print_recommended_movies", "display_recommendations"],
+        'extra-imports': ["typing", "numpy", "classes", "networkx", "plotly.graph_objs"],
+        'allowed-io': [],
         'max-line-length': 120
     })
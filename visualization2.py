@@ -17,95 +17,183 @@ expressly prohibited.
 
 This file is Copyright (c) Akram Klai, Reena Obmina, Edison Yao, Derek Lam.
 """
-from typing import Any
-import pandas as pd
-import plotly.graph_objects as go
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Collection, Optional
+import numpy as np
 
 from classes import WeightedGraph
 
+# pandas is only imported by load_data_with_graph, so that importing this module (and batch) stays fast
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The review thresholds offered by the slider of the quadrant plot. Every movie is plotted once, in the bucket of
+# the highest threshold it reaches, so that a threshold shows its own bucket and every bucket above it.
+REVIEW_THRESHOLDS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
 
-def load_data_with_graph(graph: WeightedGraph) -> Any:
+def load_data_with_graph(graph: WeightedGraph, candidates: Optional[Collection[str]] = None,
+                         score_quantile: Optional[float] = None) -> Any:
     """Extracts and computes necessary data from a WeightedGraph object for plotting movie recommendations.
 
     This function processes a graph of movies and their reviews to compute several metrics:
     average review scores, overall similarity scores with the preferred movie, and the number
     of reviews for each movie. It returns a pandas DataFrame containing these metrics along
-    with the titles of the movies.
+    with the titles and the (sorted) genres of the movies, indexed by title.
+
+    Every metric is computed once per movie, in a single pass over the preferred movie's neighbours,
+    and written into preallocated NumPy columns. If candidates is given (see movie_filters), only the
+    neighbours with these titles are visited. If score_quantile is given, the review score of each movie
+    is that quantile of its raw review scores (0.5 for the median, see _WeightedVertex.score_quantile)
+    instead of the average of its unique review scores.
     """
-    # get the preferred movie vertex and calculate scores for its neighbours
+    # get the preferred movie vertex and the neighbours to plot
     chosen_movie = graph.get_vertex(graph.preferred_movie)
-    review_scores = {v.item: v.average_score() for v in chosen_movie.neighbours}
-    similarity_scores = {v.item: v.overall_similarity_score(chosen_movie) for v in chosen_movie.neighbours}
-
-    # extract titles and prepare data series for plotting
-    titles = [v.item for v in chosen_movie.neighbours]
-    w1 = pd.Series(review_scores)  # Weighted average review score
-    w2 = pd.Series(similarity_scores)  # Overall similarity score
-    goodness_score = pd.Series({v.item: v.average_score() * v.overall_similarity_score(chosen_movie)
-                                for v in chosen_movie.neighbours})
-
-    # count of reviews for each movie
-    num_reviews = pd.Series({v.item: len(v.neighbours) - 1 for v in chosen_movie.neighbours})
+    neighbours = chosen_movie.neighbours
+    if candidates is not None:
+        neighbours = {v: neighbours[v] for v in (graph.get_vertex(title) for title in candidates if title in graph)
+                      if v in neighbours}
+
+    # only plot the other movies: the reviews and critics of the preferred movie are neighbours too, and the other
+    # favourite movies of a multi-seed query (see multi_seed) are not recommendations
+    neighbours = {v: weight for v, weight in neighbours.items() if v.kind == 'Movie' and not v.preferred}
+
+    # preallocate one column per metric
+    num_movies = len(neighbours)
+    titles = np.empty(num_movies, dtype=object)
+    w1 = np.empty(num_movies)  # Weighted average review score
+    w2 = np.empty(num_movies)  # Overall similarity score
+    num_reviews = np.empty(num_movies, dtype=np.int64)
+    genres = np.empty(num_movies, dtype=object)
+
+    # fill in the columns, computing the review statistics of each movie only once
+    for i, (v, weight) in enumerate(neighbours.items()):
+        average_score, average_similarity = v.review_statistics()
+        titles[i] = v.item
+        w1[i] = average_score if score_quantile is None else v.score_quantile(score_quantile)
+
+        # this is v.overall_similarity_score(chosen_movie) with its default weights
+        w2[i] = weight * 0.5 + average_similarity * 0.5
+
+        # count of reviews for each movie
+        num_reviews[i] = v.get_number_of_reviews()
+        genres[i] = tuple(sorted(v.genres or ()))
 
     # compile the data into a DataFrame for easy manipulation and visualization
+    import pandas as pd
+
     return pd.DataFrame({
-        'title': titles,
+        'title': pd.Categorical(titles),
         'w1': w1,
         'w2': w2,
-        'Color Value': goodness_score,
-        'num_reviews': num_reviews
-    })
+        'Color Value': w1 * w2,
+        'num_reviews': num_reviews,
+        'genres': genres
+    }, index=pd.Index(titles))
 
 
-def plot_movie_recommendations(df: pd.DataFrame, review_threshold: int, output_file: str = '') -> None:
+def plot_movie_recommendations(df: pd.DataFrame, review_threshold: int, output_file: str = '',
+                               thresholds: Collection[int] = REVIEW_THRESHOLDS) -> None:
     """Creates a scatter plot of movie recommendations based on computed review and similarity scores.
 
-    This function filters movies based on a minimum review threshold and plots them on a scatter plot
-    according to their average review scores and overall similarity scores. The color of each point
-    indicates the combination of these scores, providing an intuitive visual metric of recommendation
-    quality. The plot can be either displayed interactively or saved to a file.
+    This function plots the movies on a scatter plot according to their average review scores and overall
+    similarity scores. The color of each point indicates the combination of these scores, providing an intuitive
+    visual metric of recommendation quality. The plot can be either displayed interactively or saved to a file.
+
+    Every movie is written into the plot once, and the plot filters the movies in the browser: a slider sets the
+    minimum number of reviews (one of thresholds, starting at review_threshold), and a dropdown menu keeps the
+    movies of one genre, if df has a 'genres' column. The mean lines of every threshold and genre are computed
+    here, so that changing either never runs any Python code or redraws the figure from scratch.
     """
-    # apply review threshold filter to narrow down movies for visualization
-    filtered_df = df[df['num_reviews'] >= review_threshold]
+    import plotly.graph_objects as go
+
+    # the thresholds of the slider, and the movies in the bucket of each threshold
+    num_reviews = df['num_reviews'].to_numpy()
+    steps = sorted({t for t in thresholds if t <= num_reviews.max(initial=0)} | {0, review_threshold})
+    start = steps.index(review_threshold)
+    buckets = np.searchsorted(steps, num_reviews, side='right') - 1
+    bucket_rows = [np.flatnonzero(buckets == b) for b in range(len(steps))]
+
+    # the position of every movie in the trace of its bucket
+    positions = np.empty(len(df), dtype=np.int64)
+    for rows in bucket_rows:
+        positions[rows] = np.arange(len(rows))
+
+    # the movies of every genre
+    genre_rows = {}
+    for i, genres in enumerate(df['genres'] if 'genres' in df.columns else ()):
+        for genre in genres:
+            genre_rows.setdefault(genre, []).append(i)
+    options = {'All genres': np.ones(len(df), dtype=bool)}
+    for genre in sorted(genre for genre in genre_rows if genre != ''):
+        options[genre] = np.zeros(len(df), dtype=bool)
+        options[genre][genre_rows[genre]] = True
+
+    w1, w2, colours, titles = df['w1'].to_numpy(), df['w2'].to_numpy(), df['Color Value'].to_numpy(), \
+        df['title'].to_numpy()
+
+    def mean_lines(selected: np.ndarray) -> list[dict]:
+        """Returns the lines indicating the mean values for review and similarity scores of the selected movies."""
+        if not selected.any():
+            return []
+        x, y = w1[selected], w2[selected]
+        return [{'type': "line", 'x0': x.mean(), 'y0': y.min(), 'x1': x.mean(), 'y1': y.max(),
+                 'line': {'dash': "solid"}},
+                {'type': "line", 'x0': x.min(), 'y0': y.mean(), 'x1': x.max(), 'y1': y.mean(),
+                 'line': {'dash': "solid"}}]
+
+    def threshold_slider(genre_mask: np.ndarray) -> dict:
+        """Returns the slider of the thresholds, whose steps show the buckets and the mean lines of the movies
+        in genre_mask.
+        """
+        return {'active': start, 'currentvalue': {'prefix': "Minimum number of reviews: "}, 'pad': {'t': 60},
+                'steps': [{'label': str(threshold), 'method': 'update',
+                           'args': [{'visible': [b >= step for b in range(len(steps))]},
+                                    {'shapes': mean_lines(genre_mask & (num_reviews >= threshold))}]}
+                          for step, threshold in enumerate(steps)]}
 
     # initialize Plotly figure
     fig = go.Figure()
 
-    # scatter plot for visualizing movies
-    fig.add_trace(go.Scatter(
-        x=filtered_df['w1'],  # set x-axis data
-        y=filtered_df['w2'],  # set y-axis data
-        mode='markers',
-        marker={
-            'size': 10,
-            'color': filtered_df['Color Value'],  # set marker color based on 'Color Value'
-            'colorscale': 'Viridis',  # color scale for markers
-            'line': {'width': 1, 'color': 'DarkSlateGrey'},
-            'colorbar': {'title': 'Color Value'}
-        },
-        text=filtered_df['title'],  # hover text
-        hoverinfo='text',
-        hovertemplate="<b>%{text}</b><br>Average Review Score: %{x}<br>Overall Similarity Score: %{y}"
-    ))
-
-    # add lines indicating the mean values for review and similarity scores
-    fig.add_shape(go.layout.Shape(
-        type="line", x0=filtered_df['w1'].mean(), y0=filtered_df['w2'].min(),
-        x1=filtered_df['w1'].mean(), y1=filtered_df['w2'].max(),
-        line={'dash': "solid"}
-    ))
-    fig.add_shape(go.layout.Shape(
-        type="line", x0=filtered_df['w1'].min(), y0=filtered_df['w2'].mean(),
-        x1=filtered_df['w1'].max(), y1=filtered_df['w2'].mean(),
-        line={'dash': "solid"}
-    ))
-
-    # update figure layout with titles and axis labels
+    # scatter plot for visualizing movies, with one trace per bucket
+    for b, rows in enumerate(bucket_rows):
+        fig.add_trace(go.Scatter(
+            x=w1[rows],  # set x-axis data
+            y=w2[rows],  # set y-axis data
+            mode='markers',
+            visible=b >= start,  # only show the buckets above the threshold
+            marker={
+                'size': 10,
+                'color': colours[rows],  # set marker color based on 'Color Value'
+                'coloraxis': 'coloraxis',  # share one color scale between the buckets
+                'line': {'width': 1, 'color': 'DarkSlateGrey'}
+            },
+            unselected={'marker': {'opacity': 0}},  # hide the movies of the genres that are not selected
+            text=titles[rows],  # hover text
+            hoverinfo='text',
+            hovertemplate="<b>%{text}</b><br>Average Review Score: %{x}<br>Overall Similarity Score: %{y}"
+        ))
+
+    # the genre menu selects the movies of a genre in every bucket, and switches to the slider of that genre
+    buttons = [{'label': name, 'method': 'update',
+                'args': [{'selectedpoints': [None if name == 'All genres'
+                                             else positions[rows[genre_mask[rows]]].tolist() for rows in bucket_rows],
+                          'visible': [b >= start for b in range(len(steps))]},
+                         {'sliders': [threshold_slider(genre_mask)],
+                          'shapes': mean_lines(genre_mask & (num_reviews >= review_threshold))}]}
+               for name, genre_mask in options.items()]
+
+    # update figure layout with titles, axis labels, the controls and the mean lines of the first threshold
     fig.update_layout(
         title="Movie Recommendations Based on Genre Similarity and Review Scores",
         xaxis_title="Average Review Score",
         yaxis_title="Overall Similarity Score",
-        showlegend=False  # Hide legend
+        showlegend=False,  # Hide legend
+        coloraxis={'colorscale': 'Viridis', 'colorbar': {'title': 'Color Value'}},  # color scale for markers
+        sliders=[threshold_slider(options['All genres'])],
+        updatemenus=[{'buttons': buttons, 'direction': 'down', 'x': 1, 'xanchor': 'right', 'y': 1.12}],
+        shapes=mean_lines(num_reviews >= review_threshold)
     )
 
     # caption to explain color scale
@@ -115,6 +203,10 @@ def plot_movie_recommendations(df: pd.DataFrame, review_threshold: int, output_f
     # display or save the figure depending on 'output_file' parameter
     if output_file == '':
         fig.show()  # Display the plot
+    elif output_file.endswith('.html'):
+        fig.write_html(output_file, include_plotlyjs=True)  # Save a self-contained HTML page
+    elif output_file.endswith('.json'):
+        fig.write_json(output_file)  # Save the figure specification
     else:
         fig.write_image(output_file)  # Save the plot to a file
 
@@ -132,10 +224,7 @@ if __name__ == "__main__":
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ["csv", "networkx", "typing", "io", "time", "tkinter",
-                          "visualization1", "visualization2", "classes",
-                          "plotly.graph_objs", "pandas", "plotly.graph_objects"],
-        'allowed-io': ["get_favourite_movie", "get_favourite_genres", "load_weighted_review_graph",
-                       "print_recommended_movies", "display_recommendations"],
+        'extra-imports': ["typing", "numpy", "pandas", "classes", "plotly.graph_objects"],
+        'allowed-io': [],
         'max-line-length': 120
     })